@@ -4,6 +4,9 @@ from sqlalchemy import func, case
 from sqlalchemy.orm import Session
 
 from models.models import Player, Match, MatchPlayer
+from models.player_aggregate import PlayerAggregate
+from analytics.rating_source import RatingSource, rating_source
+from services.rating_engines import LIVE_ENGINE
 
 
 def get_leaderboard(
@@ -12,62 +15,39 @@ def get_leaderboard(
     map_filter: Optional[str] = None,
     min_matches: int = 3,
     limit: int = 50,
+    engine: Optional[str] = None,
 ) -> list[dict]:
 
-    rating_expr = MatchPlayer.impact_rating
+    src = rating_source(engine)
 
-    # ✅ ПРАВИЛЬНО: Применяем формулу к каждому матчу, потом берём среднее!
-    swing_formula = (
-        (MatchPlayer.swing * 50) 
-        - ((MatchPlayer.deaths - MatchPlayer.kills) * 1.2)
-    )
+    if not period_days and not map_filter and src.engine == LIVE_ENGINE:
+        # all-time, all maps, live rating: career sums (player_aggregates), one row per player
+        rows = _career_rows(db, min_matches, limit)
+    else:
+        rows = _window_rows(db, src, period_days, map_filter, min_matches, limit)
 
-    query = (
-        db.query(
-            Player.id,
-            Player.steam_id,
-            Player.nickname,
-            Player.avatar_url,
+    return format_leaderboard(rows)
 
-            func.count(MatchPlayer.id).label("matches"),
 
-            func.avg(rating_expr).label("avg_rating"),
+def dense_ranks(rows) -> list[int]:
+    """Dense rank on the rating the page shows (2 decimals): equal displayed ratings share a rank. Rows in rating order."""
+    ranks = []
+    rank, shown_prev = 0, None
+    for r in rows:
+        shown = round(float(r.avg_rating or 0), 2)
+        if shown != shown_prev:
+            rank, shown_prev = rank + 1, shown
+        ranks.append(rank)
+    return ranks
 
-            func.avg(MatchPlayer.adr).label("avg_adr"),
-            func.avg(MatchPlayer.hs_pct).label("avg_hs"),
-
-            func.sum(MatchPlayer.kills).label("kills"),
-            func.sum(MatchPlayer.deaths).label("deaths"),
-
-            func.sum(MatchPlayer.fk).label("fk"),
-            func.sum(MatchPlayer.fd).label("fd"),
-
-            func.avg(MatchPlayer.kast_pct).label("avg_kast"),
-            
-            # ✅ КЛЮЧЕВОЕ ИЗМЕНЕНИЕ: среднее от формулы по каждому матчу
-            func.avg(swing_formula).label("avg_swing_display"),
-        )
-        .join(MatchPlayer, MatchPlayer.player_id == Player.id)
-        .join(Match, Match.id == MatchPlayer.match_id)
-    )
-
-    if period_days:
-        since = datetime.utcnow() - timedelta(days=period_days)
-        query = query.filter(Match.played_at >= since)
-
-    if map_filter:
-        query = query.filter(Match.map == map_filter)
-
-    rows = (
-        query
-        .group_by(Player.id)
-        .having(func.count(MatchPlayer.id) >= min_matches)
-        .order_by(func.avg(rating_expr).desc())
-        .limit(limit)
-        .all()
-    )
 
+def format_leaderboard(rows, ranked: bool = False) -> list[dict]:
+    """
+    Leaderboard rows (rating order) -> response dicts. "rank" is always the dense rank:
+    computed here from the top of the board, or the rows' own stored rank with ranked=True (snapshots).
+    """
     leaderboard = []
+    ranks = None if ranked else dense_ranks(rows)
 
     for i, r in enumerate(rows):
 
@@ -78,7 +58,7 @@ def get_leaderboard(
         display_swing = float(r.avg_swing_display or 0)
 
         leaderboard.append({
-            "rank": i + 1,
+            "rank": r.rank if ranked else ranks[i],
             "player_id": r.id,
             "steam_id": r.steam_id,
             "nickname": r.nickname,
@@ -110,3 +90,97 @@ def get_leaderboard(
         })
 
     return leaderboard
+
+
+def _career_rows(db: Session, min_matches: int, limit: Optional[int]) -> list:
+    n = PlayerAggregate.matches
+    avg_rating = PlayerAggregate.sum_rating / n
+    return (
+        db.query(
+            Player.id,
+            Player.steam_id,
+            Player.nickname,
+            Player.avatar_url,
+            n.label("matches"),
+            avg_rating.label("avg_rating"),
+            (PlayerAggregate.sum_adr / n).label("avg_adr"),
+            (PlayerAggregate.sum_hs_pct / n).label("avg_hs"),
+            PlayerAggregate.kills,
+            PlayerAggregate.deaths,
+            PlayerAggregate.fk,
+            PlayerAggregate.fd,
+            (PlayerAggregate.sum_kast / n).label("avg_kast"),
+            # avg(swing * 50 - (deaths - kills) * 1.2) over matches, from the sums
+            (
+                (PlayerAggregate.sum_swing * 50 - (PlayerAggregate.deaths - PlayerAggregate.kills) * 1.2) / n
+            ).label("avg_swing_display"),
+        )
+        .join(PlayerAggregate, PlayerAggregate.player_id == Player.id)
+        .filter(n >= max(min_matches, 1))
+        .order_by(avg_rating.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def _window_rows(
+    db: Session,
+    src: RatingSource,
+    period_days: Optional[int],
+    map_filter: Optional[str],
+    min_matches: int,
+    limit: Optional[int],
+) -> list:
+    rating_expr = src.rating
+
+    # ✅ ПРАВИЛЬНО: Применяем формулу к каждому матчу, потом берём среднее!
+    swing_formula = (
+        (src.swing * 50)
+        - ((MatchPlayer.deaths - MatchPlayer.kills) * 1.2)
+    )
+
+    query = (
+        db.query(
+            Player.id,
+            Player.steam_id,
+            Player.nickname,
+            Player.avatar_url,
+
+            func.count(MatchPlayer.id).label("matches"),
+
+            func.avg(rating_expr).label("avg_rating"),
+
+            func.avg(MatchPlayer.adr).label("avg_adr"),
+            func.avg(MatchPlayer.hs_pct).label("avg_hs"),
+
+            func.sum(MatchPlayer.kills).label("kills"),
+            func.sum(MatchPlayer.deaths).label("deaths"),
+
+            func.sum(MatchPlayer.fk).label("fk"),
+            func.sum(MatchPlayer.fd).label("fd"),
+
+            func.avg(src.kast).label("avg_kast"),
+            
+            # ✅ КЛЮЧЕВОЕ ИЗМЕНЕНИЕ: среднее от формулы по каждому матчу
+            func.avg(swing_formula).label("avg_swing_display"),
+        )
+        .join(MatchPlayer, MatchPlayer.player_id == Player.id)
+        .join(Match, Match.id == MatchPlayer.match_id)
+    )
+    query = src.join(query)
+
+    if period_days:
+        since = datetime.utcnow() - timedelta(days=period_days)
+        query = query.filter(Match.played_at >= since)
+
+    if map_filter:
+        query = query.filter(Match.map == map_filter)
+
+    return (
+        query
+        .group_by(Player.id)
+        .having(func.count(MatchPlayer.id) >= min_matches)
+        .order_by(func.avg(rating_expr).desc())
+        .limit(limit)
+        .all()
+    )
@@ -0,0 +1,379 @@
+"""
+Player profile page (GET /api/players/{player_key}) from one load of the
+player's match rows.
+
+The player's match_players ⨝ matches rows are read once with just the columns
+the page needs and turned into numpy columns; every section (overview,
+progression, maps, MVPs, annual, monthly form) is computed from those arrays.
+Only two small extra reads remain: the MVP count (get_mvp_count, one window
+query over the player's matches) and the player's weapon_stats grouped by weapon.
+
+sections= picks what to build; data a section does not need is not loaded.
+Live overview comes from player_aggregates like before.
+"""
+import math
+import statistics
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models.models import Player, Match, MatchPlayer, WeaponStat
+from analytics.enhanced_player_stats import _overview, get_mvp_count, get_player_overview
+from analytics.rating_source import RatingSource, rating_source
+from services.rating_engines import LIVE_ENGINE
+
+
+PROFILE_SECTIONS = (
+    "overview",
+    "rating_progression",
+    "map_performance",
+    "best_worst",        # -> best_map, worst_map
+    "mvp_count",
+    "favorite_weapon",
+    "annual",
+    "monthly_form",
+    "weapons",
+)
+HEADER = "header"  # id / nickname / avatar only; always part of the response
+
+_ROW_SECTIONS = {"rating_progression", "map_performance", "best_worst", "annual", "monthly_form"}
+_WEAPON_SECTIONS = {"favorite_weapon", "weapons", "annual"}
+
+PROGRESSION_LIMIT = 50
+MONTHLY_FORM_MONTHS = 6
+
+
+def parse_sections(sections: Optional[str]) -> List[str]:
+    """'overview,annual' -> ['overview', 'annual']; None / '' -> every section. ValueError on unknown names."""
+    if not sections:
+        return list(PROFILE_SECTIONS)
+    names = [s.strip() for s in sections.split(",") if s.strip()]
+    unknown = [s for s in names if s != HEADER and s not in PROFILE_SECTIONS]
+    if unknown:
+        raise ValueError(
+            f"Unknown profile section(s) {', '.join(unknown)} (available: {', '.join((HEADER,) + PROFILE_SECTIONS)})"
+        )
+    return [s for s in PROFILE_SECTIONS if s in names]
+
+
+# ============================================================
+# Loads
+# ============================================================
+
+def _mean(x: np.ndarray) -> float:
+    # fsum: correctly rounded and order independent, like SQLite's compensated SUM / AVG
+    return math.fsum(x.tolist()) / len(x)
+
+
+def _group_means(inv: np.ndarray, x: np.ndarray, groups: int) -> List[float]:
+    return [_mean(x[inv == g]) for g in range(groups)]
+
+
+class _Rows:
+    """The player's match rows as columns; by_time = row indices ordered by played_at."""
+
+    def __init__(self, rows: List[Any]):
+        self.n = len(rows)
+        col = lambda i: [r[i] for r in rows]
+
+        self.match_id = np.asarray(col(0), dtype=np.int64)
+        self.played_at: List[Optional[datetime]] = col(1)
+        self.map: List[Optional[str]] = col(2)
+        t1 = np.asarray(col(3), dtype=np.int64)
+        t2 = np.asarray(col(4), dtype=np.int64)
+        team = np.asarray(col(5), dtype=object)
+        self.kills = np.asarray(col(6), dtype=np.int64)
+        self.deaths = np.asarray(col(7), dtype=np.int64)
+        self.assists = np.asarray(col(8), dtype=np.int64)
+        self.adr = np.asarray(col(9), dtype=np.float64)
+        self.hs_pct = np.asarray(col(10), dtype=np.float64)
+        self.fk = np.asarray(col(11), dtype=np.int64)
+        self.fd = np.asarray(col(12), dtype=np.int64)
+        self.legacy_rating = np.asarray(col(13), dtype=np.float64)
+        # engine rating / kast: NaN where the engine has not rated the match yet
+        self.rating = np.asarray([np.nan if v is None else v for v in col(14)], dtype=np.float64)
+        self.kast = np.asarray([np.nan if v is None else v for v in col(15)], dtype=np.float64)
+
+        self.rated = ~np.isnan(self.rating)
+        self.by_time = np.asarray(
+            sorted(range(self.n), key=lambda i: (self.played_at[i] or datetime.min, int(self.match_id[i]))),
+            dtype=np.intp,
+        )
+        self.won = ((team == "CT") & (t1 > t2)) | (((team == "T") | (team == "TERRORIST")) & (t2 > t1))
+
+
+def _load_rows(db: Session, player_id: int, src: RatingSource) -> _Rows:
+    query = db.query(
+        MatchPlayer.match_id,
+        Match.played_at,
+        Match.map,
+        Match.team1_score,
+        Match.team2_score,
+        MatchPlayer.team,
+        MatchPlayer.kills,
+        MatchPlayer.deaths,
+        MatchPlayer.assists,
+        MatchPlayer.adr,
+        MatchPlayer.hs_pct,
+        MatchPlayer.fk,
+        MatchPlayer.fd,
+        MatchPlayer.rating,
+        src.rating,
+        src.kast,
+    ).select_from(MatchPlayer).join(Match, Match.id == MatchPlayer.match_id)
+
+    rows = (
+        src.join(query, outer=True)
+        .filter(MatchPlayer.player_id == player_id)
+        .order_by(MatchPlayer.id)
+        .all()
+    )
+    return _Rows(rows)
+
+
+def _load_weapons(db: Session, player_id: int) -> List[Any]:
+    """weapon_stats per weapon, most kills first (first_id: the weapon's first row, for ties)."""
+    return (
+        db.query(
+            WeaponStat.weapon,
+            func.sum(WeaponStat.kills).label("kills"),
+            func.sum(WeaponStat.headshots).label("hs"),
+            func.sum(WeaponStat.damage).label("damage"),
+            func.count(WeaponStat.match_id).label("matches"),
+            func.min(WeaponStat.id).label("first_id"),
+        )
+        .filter(WeaponStat.player_id == player_id)
+        .group_by(WeaponStat.weapon)
+        .order_by(func.sum(WeaponStat.kills).desc())
+        .all()
+    )
+
+
+# ============================================================
+# Sections
+# ============================================================
+
+def _engine_overview(r: _Rows) -> Optional[dict]:
+    m = r.rated
+    n = int(m.sum())
+    if not n:
+        return None
+    return _overview(
+        n, _mean(r.rating[m]), _mean(r.kast[m]),
+        int(r.kills[m].sum()), int(r.deaths[m].sum()), int(r.assists[m].sum()),
+        _mean(r.adr[m]), _mean(r.hs_pct[m]),
+        int(r.fk[m].sum()), int(r.fd[m].sum()),
+        int(r.won.sum()),  # wins over every match, as get_player_overview counts them
+    )
+
+
+def _rating_progression(r: _Rows) -> List[dict]:
+    idx = r.by_time[r.rated[r.by_time]][-PROGRESSION_LIMIT:]
+    return [
+        {
+            "date": r.played_at[i].isoformat() if r.played_at[i] else None,
+            "rating": round(float(r.rating[i] or 0), 2),
+            "map": r.map[i],
+            "result": "W" if r.won[i] else "L",
+        }
+        for i in idx.tolist()
+    ]
+
+
+def _map_performance(r: _Rows) -> List[dict]:
+    m = r.rated
+    if not m.any():
+        return []
+    maps = np.asarray([x or "" for x in r.map], dtype=object)[m]
+    names, inv = np.unique(maps, return_inverse=True)
+
+    matches = np.bincount(inv)
+    avg_rating = _group_means(inv, r.rating[m], len(names))
+    kills = np.bincount(inv, weights=r.kills[m])
+    deaths = np.bincount(inv, weights=r.deaths[m])
+
+    map_stats = [
+        {
+            "map": name.replace("de_", "").title() if name else "Unknown",
+            "matches": int(matches[g]),
+            "avg_rating": round(float(avg_rating[g]), 2),
+            "kd_ratio": round(float(kills[g]) / max(float(deaths[g]) or 1, 1), 2),
+        }
+        for g, name in enumerate(names.tolist())
+    ]
+    return sorted(map_stats, key=lambda x: x["avg_rating"], reverse=True)
+
+
+def _best_worst(map_stats: List[dict]) -> dict:
+    if not map_stats:
+        return {"best_map": None, "worst_map": None}
+    best = max(map_stats, key=lambda x: x["avg_rating"])
+    worst = min(map_stats, key=lambda x: x["avg_rating"])
+    return {
+        "best_map": {"name": best["map"], "rating": best["avg_rating"], "matches": best["matches"]},
+        "worst_map": {"name": worst["map"], "rating": worst["avg_rating"], "matches": worst["matches"]},
+    }
+
+
+def _weapons(weapons: List[Any]) -> List[dict]:
+    return [
+        {
+            "weapon":   w.weapon,
+            "kills":    w.kills,
+            "hs_pct":   round(float(w.hs or 0) / max(float(w.kills or 1), 1) * 100, 1),
+            "damage":   w.damage,
+            "matches":  w.matches,
+        }
+        for w in weapons
+    ]
+
+
+def _annual(r: _Rows, weapons: List[Any], player_id: int) -> dict:
+    """Current calendar year: rating spread, totals, favourite map / weapon, best and worst match."""
+    year = datetime.utcnow().year
+    start, end = datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+    idx = np.asarray(
+        [i for i in r.by_time.tolist() if r.played_at[i] is not None and start <= r.played_at[i] < end],
+        dtype=np.intp,
+    )
+    if not len(idx):
+        return {"player_id": player_id, "year": year, "matches": 0}
+
+    ratings = r.legacy_rating[idx]
+    kills = int(r.kills[idx].sum())
+    deaths = int(r.deaths[idx].sum())
+    fk_total = int(r.fk[idx].sum())
+    fd_total = int(r.fd[idx].sum())
+
+    # Любимая карта: most matches, first played wins a tie
+    maps = np.asarray([r.map[i] or "" for i in idx.tolist()], dtype=object)
+    names, first, counts = np.unique(maps, return_index=True, return_counts=True)
+    top = np.flatnonzero(counts == counts.max())
+    fav_map = r.map[int(idx[first[top].min()])]
+
+    # Любимое оружие (по kills), earliest weapon row wins a tie
+    fav_weapon = None
+    if weapons:
+        fav_weapon = min(weapons, key=lambda w: (-(w.kills or 0), w.first_id)).weapon
+
+    def match_card(i: int) -> dict:
+        return {
+            "match_id": int(r.match_id[i]),
+            "map":      r.map[i],
+            "date":     r.played_at[i].isoformat(),
+            "rating":   round(float(r.legacy_rating[i]), 2),
+            "kda":      f"{r.kills[i]}/{r.deaths[i]}/{r.assists[i]}",
+        }
+
+    rating_list = ratings.tolist()
+    return {
+        "player_id":    player_id,
+        "year":         year,
+        "matches":      len(idx),
+        "avg_rating":   round(_mean(ratings), 3),
+        "median_rating":round(statistics.median(rating_list), 3),
+        "std_rating":   round(statistics.stdev(rating_list), 3) if len(rating_list) > 1 else 0,
+        "best_rating":  round(float(ratings.max()), 3),
+        "worst_rating": round(float(ratings.min()), 3),
+        "total_kills":  kills,
+        "total_deaths": deaths,
+        "total_assists":int(r.assists[idx].sum()),
+        "kd_ratio":     round(kills / max(deaths, 1), 2),
+        "avg_adr":      round(_mean(r.adr[idx]), 1),
+        "avg_hs_pct":   round(_mean(r.hs_pct[idx]), 1),
+        "fk_total":     fk_total,
+        "fd_total":     fd_total,
+        "entry_success_rate": round(fk_total / max(fk_total + fd_total, 1) * 100, 1),
+        "favorite_map":    fav_map,
+        "favorite_weapon": fav_weapon,
+        "best_match":  match_card(int(idx[np.argmax(ratings)])),
+        "worst_match": match_card(int(idx[np.argmin(ratings)])),
+    }
+
+
+def _monthly_form(r: _Rows) -> List[dict]:
+    """Per-month averages over the last MONTHLY_FORM_MONTHS months, oldest month first."""
+    since = datetime.utcnow() - timedelta(days=30 * MONTHLY_FORM_MONTHS)
+    idx = np.asarray([i for i, t in enumerate(r.played_at) if t is not None and t >= since], dtype=np.intp)
+    if not len(idx):
+        return []
+
+    keys = np.asarray([r.played_at[i].year * 100 + r.played_at[i].month for i in idx.tolist()], dtype=np.int64)
+    periods, inv = np.unique(keys, return_inverse=True)
+
+    matches = np.bincount(inv)
+    avg_rating = _group_means(inv, r.legacy_rating[idx], len(periods))
+    avg_adr = _group_means(inv, r.adr[idx], len(periods))
+    kills = np.bincount(inv, weights=r.kills[idx])
+    deaths = np.bincount(inv, weights=r.deaths[idx])
+
+    return [
+        {
+            "period":     f"{p // 100}-{p % 100:02d}",
+            "matches":    int(matches[g]),
+            "avg_rating": round(float(avg_rating[g]), 3),
+            "avg_adr":    round(float(avg_adr[g]), 1),
+            "kd_ratio":   round(float(kills[g]) / max(float(deaths[g] or 1), 1), 2),
+        }
+        for g, p in enumerate(periods.tolist())
+    ]
+
+
+# ============================================================
+# Builder
+# ============================================================
+
+def build_player_profile(
+    db: Session,
+    player: Player,
+    engine: Optional[str] = None,
+    sections: Optional[Iterable[str]] = None,
+) -> Dict[str, Any]:
+    """Profile response for the requested sections (None = all). ValueError for an unknown engine."""
+    src = rating_source(engine)
+    wanted = set(PROFILE_SECTIONS if sections is None else sections)
+
+    out: Dict[str, Any] = {
+        "id": player.id,
+        "steam_id": player.steam_id,
+        "nickname": player.nickname,
+        "avatar_url": player.avatar_url,
+        "engine": engine or "live",
+    }
+
+    live_overview = src.engine == LIVE_ENGINE
+    rows = None
+    if wanted & _ROW_SECTIONS or ("overview" in wanted and not live_overview):
+        rows = _load_rows(db, player.id, src)
+    weapons = _load_weapons(db, player.id) if wanted & _WEAPON_SECTIONS else []
+
+    if "overview" in wanted:
+        # live: career sums (player_aggregates), one row
+        out["overview"] = get_player_overview(db, player.id) if live_overview else _engine_overview(rows)
+    if "rating_progression" in wanted:
+        out["rating_progression"] = _rating_progression(rows)
+
+    if wanted & {"map_performance", "best_worst"}:
+        map_stats = _map_performance(rows)
+        if "map_performance" in wanted:
+            out["map_performance"] = map_stats
+        if "best_worst" in wanted:
+            out.update(_best_worst(map_stats))
+
+    if "mvp_count" in wanted:
+        out["mvp_count"] = get_mvp_count(db, player.id, engine=engine)
+    if "favorite_weapon" in wanted:
+        out["favorite_weapon"] = weapons[0].weapon if weapons else "ak47"
+
+    if "annual" in wanted:
+        out["annual"] = _annual(rows, weapons, player.id)
+    if "monthly_form" in wanted:
+        out["monthly_form"] = _monthly_form(rows)
+    if "weapons" in wanted:
+        out["weapons"] = _weapons(weapons)
+
+    return out
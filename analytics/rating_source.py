@@ -0,0 +1,42 @@
+"""
+Rating source for read queries: live match_players columns (default) or a
+stored engine version from match_player_ratings (engine= on leaderboard / profile).
+"""
+
+from typing import Any, NamedTuple, Optional
+from sqlalchemy import and_
+from sqlalchemy.orm import Query, aliased
+
+from models.models import MatchPlayer, MatchPlayerRating
+from services.rating_engines import LIVE_ENGINE, get_engine
+
+
+class RatingSource(NamedTuple):
+    engine: str
+    rating: Any
+    kast: Any
+    swing: Any
+    table: Any = None  # aliased MatchPlayerRating, None for live
+
+    def join(self, query: Query, outer: bool = False) -> Query:
+        """
+        Inner join of the engine's rows: matches it has not rated yet drop out.
+        outer=True keeps them, with NULL rating / kast / swing.
+        """
+        if self.table is None:
+            return query
+        join = query.outerjoin if outer else query.join
+        return join(
+            self.table,
+            and_(self.table.match_player_id == MatchPlayer.id, self.table.engine_version == self.engine),
+        )
+
+
+def rating_source(engine: Optional[str] = None) -> RatingSource:
+    """ValueError for an unknown engine."""
+    if not engine or engine == LIVE_ENGINE:
+        return RatingSource(LIVE_ENGINE, MatchPlayer.impact_rating, MatchPlayer.kast_pct, MatchPlayer.swing)
+
+    get_engine(engine)
+    mpr = aliased(MatchPlayerRating)
+    return RatingSource(engine, mpr.impact_rating, mpr.kast_pct, mpr.swing, mpr)
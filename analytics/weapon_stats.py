@@ -3,100 +3,143 @@ from sqlalchemy.orm import Session
 from models.models import Player, Match, WeaponStat, MatchPlayer
 
 
-def get_weapon_leaderboard(
-    db: Session,
-    limit: int = 20,
-    min_kills: int = 10,
-) -> list[dict]:
-    """Топ оружий по kills, HS%, и среднему импакту."""
-    rows = (
+def weapon_top_players(db: Session, top_n: int, min_kills: int = 0) -> list[dict]:
+    """
+    Every weapon with min_kills+ kills, its totals and its top_n players by kills,
+    ordered by total kills desc; a kills tie between players goes to the lower player id.
+
+    PostgreSQL: one ROW_NUMBER() query (_top_players_ranked). SQLite: totals + one indexed
+    range query per weapon (_top_players_per_weapon) — in-process there is no round trip
+    to save and its window pass over every (weapon, player) group costs more than the
+    per-weapon scans (benchmarks/bench_weapon_leaderboard.py).
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return _top_players_per_weapon(db, top_n, min_kills)
+    return _top_players_ranked(db, top_n, min_kills)
+
+
+def _weapon_totals(db: Session, min_kills: int):
+    return (
         db.query(
-            WeaponStat.weapon,
+            WeaponStat.weapon.label("weapon"),
             func.sum(WeaponStat.kills).label("total_kills"),
             func.sum(WeaponStat.headshots).label("total_hs"),
             func.sum(WeaponStat.damage).label("total_damage"),
-            func.count(WeaponStat.id).label("usage_count"),
+            func.count().label("usage_count"),
         )
         .group_by(WeaponStat.weapon)
         .having(func.sum(WeaponStat.kills) >= min_kills)
-        .order_by(func.sum(WeaponStat.kills).desc())
-        .limit(limit)
-        .all()
     )
 
-    result = []
 
+def _weapon_entry(r) -> dict:
+    return {
+        "weapon":       r.weapon,
+        "total_kills":  int(r.total_kills or 0),
+        "total_hs":     int(r.total_hs or 0),
+        "total_damage": int(r.total_damage or 0),
+        "usage_count":  int(r.usage_count or 0),
+        "top_players":  [],
+    }
+
+
+def _top_player(r) -> dict:
+    return {"nickname": r.nickname, "steam_id": r.steam_id, "kills": int(r.player_kills or 0)}
+
+
+def _top_players_ranked(db: Session, top_n: int, min_kills: int) -> list[dict]:
+    """
+    One query: per-weapon totals joined to the per-(weapon, player) kill sums ranked with
+    ROW_NUMBER() OVER (PARTITION BY weapon ORDER BY SUM(kills) DESC). The ranking only sums
+    kills, so both halves read idx_ws_weapon_player alone (index-only scans on PostgreSQL).
+    """
+    totals = _weapon_totals(db, min_kills).cte("weapon_totals")
+    ranked = (
+        db.query(
+            WeaponStat.weapon.label("weapon"),
+            WeaponStat.player_id.label("player_id"),
+            func.sum(WeaponStat.kills).label("player_kills"),
+            func.row_number().over(
+                partition_by=WeaponStat.weapon,
+                order_by=(func.sum(WeaponStat.kills).desc(), WeaponStat.player_id),
+            ).label("rn"),
+        )
+        .group_by(WeaponStat.weapon, WeaponStat.player_id)
+        .cte("weapon_player_kills")
+    )
+
+    rows = (
+        db.query(
+            totals.c.weapon,
+            totals.c.total_kills,
+            totals.c.total_hs,
+            totals.c.total_damage,
+            totals.c.usage_count,
+            ranked.c.player_kills,
+            Player.nickname,
+            Player.steam_id,
+        )
+        .join(ranked, ranked.c.weapon == totals.c.weapon)
+        .join(Player, Player.id == ranked.c.player_id)
+        .filter(ranked.c.rn <= top_n)
+        .order_by(totals.c.total_kills.desc(), totals.c.weapon, ranked.c.rn)
+        .all()
+    )
+
+    weapons: list[dict] = []
     for r in rows:
-        # Топ-3 игроков для этого оружия
-        top_players_query = (
-            db.query(
-                Player.nickname,
-                Player.steam_id,
-                func.sum(WeaponStat.kills).label("player_kills")
+        if not weapons or weapons[-1]["weapon"] != r.weapon:
+            weapons.append(_weapon_entry(r))
+        weapons[-1]["top_players"].append(_top_player(r))
+    return weapons
+
+
+def _top_players_per_weapon(db: Session, top_n: int, min_kills: int) -> list[dict]:
+    """Totals, then one top_n query per weapon (a range of idx_ws_weapon_player each)."""
+    weapons = []
+    for w in _weapon_totals(db, min_kills).order_by(func.sum(WeaponStat.kills).desc(), WeaponStat.weapon).all():
+        entry = _weapon_entry(w)
+        entry["top_players"] = [
+            _top_player(p)
+            for p in (
+                db.query(Player.nickname, Player.steam_id, func.sum(WeaponStat.kills).label("player_kills"))
+                .join(Player, Player.id == WeaponStat.player_id)
+                .filter(WeaponStat.weapon == w.weapon)
+                .group_by(Player.id)
+                .order_by(func.sum(WeaponStat.kills).desc(), Player.id)
+                .limit(top_n)
+                .all()
             )
-            .join(Player, Player.id == WeaponStat.player_id)
-            .filter(WeaponStat.weapon == r.weapon)
-            .group_by(Player.id)
-            .order_by(func.sum(WeaponStat.kills).desc())
-            .limit(3)
-            .all()
-        )
+        ]
+        weapons.append(entry)
+    return weapons
+
+
+def get_weapon_leaderboard(
+    db: Session,
+    limit: int = 20,
+    min_kills: int = 10,
+) -> list[dict]:
+    """Топ оружий по kills, HS%, и среднему импакту."""
+    result = []
 
-        top_player = None
-        top_player_steamid = None
-        top_players_list = []
-        if top_players_query:
-            top_player = top_players_query[0].nickname
-            top_player_steamid = top_players_query[0].steam_id
-            top_players_list = [
-                {"nickname": p.nickname, "steam_id": p.steam_id, "kills": int(p.player_kills or 0)}
-                for p in top_players_query
-            ]
+    # Топ-3 игроков для каждого оружия — в том же запросе (weapon_top_players)
+    for w in weapon_top_players(db, top_n=3, min_kills=min_kills)[:limit]:
+        top_players_list = w["top_players"]
 
         result.append({
-            "weapon":      r.weapon,
-            "total_kills": r.total_kills,
+            "weapon":      w["weapon"],
+            "total_kills": w["total_kills"],
             "hs_pct":      round(
-                float(r.total_hs or 0) / max(float(r.total_kills or 1), 1) * 100, 1
+                float(w["total_hs"] or 0) / max(float(w["total_kills"] or 1), 1) * 100, 1
             ),
             "kills_per_usage": round(
-                float(r.total_kills or 0) / max(float(r.usage_count or 1), 1), 2
+                float(w["total_kills"] or 0) / max(float(w["usage_count"] or 1), 1), 2
             ),
-            "usage_count": r.usage_count,
-            "top_player": top_player,
-            "top_player_steamid": top_player_steamid,
+            "usage_count": w["usage_count"],
+            "top_player": top_players_list[0]["nickname"] if top_players_list else None,
+            "top_player_steamid": top_players_list[0]["steam_id"] if top_players_list else None,
             "top_players": top_players_list,
         })
 
     return result
-
-
-def get_player_weapon_stats(
-    db: Session,
-    player_id: int,
-) -> list[dict]:
-    """Оружейная статистика для конкретного игрока."""
-    rows = (
-        db.query(
-            WeaponStat.weapon,
-            func.sum(WeaponStat.kills).label("kills"),
-            func.sum(WeaponStat.headshots).label("hs"),
-            func.sum(WeaponStat.damage).label("damage"),
-            func.count(WeaponStat.match_id).label("matches"),
-        )
-        .filter(WeaponStat.player_id == player_id)
-        .group_by(WeaponStat.weapon)
-        .order_by(func.sum(WeaponStat.kills).desc())
-        .all()
-    )
-
-    return [
-        {
-            "weapon":   r.weapon,
-            "kills":    r.kills,
-            "hs_pct":   round(float(r.hs or 0) / max(float(r.kills or 1), 1) * 100, 1),
-            "damage":   r.damage,
-            "matches":  r.matches,
-        }
-        for r in rows
-    ]
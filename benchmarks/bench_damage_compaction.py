@@ -0,0 +1,127 @@
+"""
+round_events damage compaction: per-hit rows vs one row per (round, attacker, victim).
+
+Synthetic matches with the per-hit shape the analyzer emits (bursts of
+player_hurt per engagement, capped at 100 per pair per round). Checks that
+both rating engines return identical breakdowns (ADR included) from either
+form (exit code 1 on any difference), then reports the row count and the
+per-match scan + rating time against a SQLite file.
+
+    python -m benchmarks.bench_damage_compaction
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.bench_round_events_load import STEAMIDS, synthetic_buffer
+from models.base import Base
+from models.round_event import RoundEvent
+from services.damage_compaction import compact_damage
+from services.event_loader import EVENT_COLUMNS, EventRow, build_event_rows, load_round_events
+from services.impact_rating_columnar import compute_impact_breakdown_columnar
+from services.impact_rating_v3 import compute_impact_breakdown_v3
+
+
+def per_hit_rows(rounds: int, seed: int):
+    """Synthetic match rows where every damage event becomes a burst of 1-6 capped hits."""
+    rnd = random.Random(seed)
+    steam_to_pid = {sid: i + 1 for i, sid in enumerate(STEAMIDS)}
+    rows = build_event_rows(synthetic_buffer(rounds, seed), 1, "de_mirage", steam_to_pid)
+
+    dealt = defaultdict(float)  # (round, attacker, victim) -> damage so far, capped at 100
+    out = []
+    for r in rows:
+        if r.event_type != "damage":
+            out.append(r)
+            continue
+        tick = r.tick
+        for _ in range(rnd.randint(1, 6)):
+            key = (r.round_number, r.attacker_id, r.victim_id)
+            real = min(float(rnd.randint(8, 40)), 100.0 - dealt[key])
+            if real <= 0:
+                break
+            dealt[key] += real
+            out.append(r._replace(tick=tick, damage=real, is_headshot=rnd.random() < 0.2))
+            tick += rnd.randint(4, 12)
+
+    out.sort(key=lambda e: (e.round_number, e.tick if e.tick is not None else 10**12))
+    return out
+
+
+def _best(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--matches", type=int, default=50, help="synthetic matches to compare")
+    ap.add_argument("--repeats", type=int, default=5)
+    args = ap.parse_args()
+
+    mismatches = 0
+    for seed in range(args.matches):
+        rounds = 16 + seed % 15
+        full = per_hit_rows(rounds, seed)
+        compact = compact_damage(full)
+        for engine in (compute_impact_breakdown_v3, compute_impact_breakdown_columnar):
+            if engine(full, total_rounds=rounds) != engine(compact, total_rounds=rounds):
+                mismatches += 1
+                print(f"  MISMATCH seed={seed} engine={engine.__name__}")
+
+    print(f"equivalence: {args.matches} matches x 2 engines, {mismatches} mismatches")
+
+    full = per_hit_rows(30, 1)
+    compact = compact_damage(full)
+    n_dmg_full = sum(1 for r in full if r.event_type == "damage")
+    n_dmg_compact = sum(1 for r in compact if r.event_type == "damage")
+    print(
+        f"30-round match: {len(full)} -> {len(compact)} rows ({len(full) / len(compact):.1f}x), "
+        f"damage {n_dmg_full} -> {n_dmg_compact} ({n_dmg_full / n_dmg_compact:.1f}x)"
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine, tables=[RoundEvent.__table__])
+        Session = sessionmaker(bind=engine, autoflush=False)
+        cols = [getattr(RoundEvent, c) for c in EVENT_COLUMNS]
+
+        with Session() as db:
+            load_round_events(db, full)
+            load_round_events(db, [r._replace(match_id=2) for r in compact])
+            db.commit()
+
+            def scan_and_rate(match_id: int):
+                rows = [
+                    EventRow(*r) for r in db.execute(
+                        select(*cols).where(RoundEvent.match_id == match_id).order_by(RoundEvent.id)
+                    )
+                ]
+                return compute_impact_breakdown_columnar(rows, total_rounds=30)
+
+            if scan_and_rate(1) != scan_and_rate(2):
+                mismatches += 1
+                print("  MISMATCH after database round trip")
+
+            print(f"scan + rate one match, best of {args.repeats}:")
+            for name, match_id in (("per-hit", 1), ("compacted", 2)):
+                print(f"  {name:<10} {_best(lambda: scan_and_rate(match_id), args.repeats) * 1000:8.2f} ms")
+
+        engine.dispose()
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+compute_impact_breakdown_v3: reference (python) vs columnar (numpy) engine.
+
+Checks that both return identical breakdowns on synthetic matches (exit code 1
+on any difference) and reports per-match time. "from rows" is what ingest and
+re-rate do (EventStream.from_rows: columns straight from the tuples).
+
+    python -m benchmarks.bench_impact_engines
+"""
+import argparse
+import sys
+import time
+
+from benchmarks.bench_round_events_load import STEAMIDS, synthetic_buffer
+from services.event_loader import build_event_rows
+from services.impact_rating_columnar import compute_impact_breakdown_columnar, event_columns, row_columns
+from services.impact_rating_v3 import compute_impact_breakdown_v3
+
+
+def _best(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--matches", type=int, default=50, help="synthetic matches to compare")
+    ap.add_argument("--repeats", type=int, default=5)
+    args = ap.parse_args()
+
+    steam_to_pid = {sid: i + 1 for i, sid in enumerate(STEAMIDS)}
+
+    mismatches = 0
+    for seed in range(args.matches):
+        rounds = 16 + seed % 15
+        rows = build_event_rows(synthetic_buffer(rounds, seed), 1, "de_mirage", steam_to_pid)
+        for total_rounds in (None, rounds):
+            ref = compute_impact_breakdown_v3(rows, total_rounds=total_rounds)
+            col = compute_impact_breakdown_columnar(rows, total_rounds=total_rounds)
+            from_rows = compute_impact_breakdown_columnar(columns=row_columns(rows), total_rounds=total_rounds)
+            if ref != col or ref != from_rows:
+                mismatches += 1
+                print(f"  MISMATCH seed={seed} total_rounds={total_rounds}")
+
+    print(f"equivalence: {args.matches} matches, {mismatches} mismatches")
+
+    rows = build_event_rows(synthetic_buffer(30, 1), 1, "de_mirage", steam_to_pid)
+    cols = event_columns(rows)
+    print(f"30-round match, {len(rows)} events, best of {args.repeats}:")
+    for name, fn in (
+        ("python (reference)", lambda: compute_impact_breakdown_v3(rows, total_rounds=30)),
+        ("numpy from objects", lambda: compute_impact_breakdown_columnar(rows, total_rounds=30)),
+        ("numpy from rows", lambda: compute_impact_breakdown_columnar(columns=row_columns(rows), total_rounds=30)),
+        ("numpy from columns", lambda: compute_impact_breakdown_columnar(columns=cols, total_rounds=30)),
+    ):
+        print(f"  {name:<20} {_best(fn, args.repeats) * 1000:8.2f} ms")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Round aggregation (played / KAST / trades / entries / multikills):
+previous nested-loop implementation vs the single-pass _aggregate_round.
+
+Deathmatch-style synthetic rounds (hundreds of kills packed into the trade
+window) are where the old O(kills^2) trade scan hurts. Exit code 1 if the two
+implementations disagree on any round.
+
+    python -m benchmarks.bench_round_aggregator
+    python -m benchmarks.bench_round_aggregator --kills 200 500 2000
+"""
+import argparse
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Dict
+
+from services.event_loader import EVENT_COLUMNS, EventRow
+from services.impact_rating_v3 import (
+    PlayerStats,
+    _compute_round_features,
+    _norm_side,
+    _safe_int,
+    _sorted_events,
+    _trade_window_ticks,
+)
+
+
+def _legacy_round_features(events, stats: Dict[int, PlayerStats]) -> None:
+    """Previous implementation (rescans + nested-loop trade scan), condensed; the baseline."""
+    trade_window = _trade_window_ticks()
+
+    events_by_round = defaultdict(list)
+    for e in events:
+        rnd = _safe_int(getattr(e, "round_number", 0), 0)
+        if rnd > 0:
+            events_by_round[rnd].append(e)
+
+    for rnd in sorted(events_by_round):
+        rnd_events = _sorted_events(events_by_round[rnd])
+
+        players_here = set()
+        dead_here = set()
+        for e in rnd_events:
+            a, v = getattr(e, "attacker_id", None), getattr(e, "victim_id", None)
+            if a is not None:
+                players_here.add(_safe_int(a))
+            if v is not None:
+                players_here.add(_safe_int(v))
+            if str(getattr(e, "event_type", "")).lower() == "kill" and v is not None:
+                dead_here.add(_safe_int(v))
+        players_here.discard(0)
+        dead_here.discard(0)
+
+        for pid in players_here:
+            stats[pid].played_rounds += 1
+            if pid not in dead_here:
+                stats[pid].survived_rounds += 1
+
+        kill_events = [
+            e for e in rnd_events
+            if str(getattr(e, "event_type", "")).lower() == "kill"
+            and getattr(e, "attacker_id", None) is not None
+            and getattr(e, "victim_id", None) is not None
+        ]
+        assist_events = [
+            e for e in rnd_events
+            if str(getattr(e, "event_type", "")).lower() == "assist"
+            and getattr(e, "attacker_id", None) is not None
+        ]
+
+        round_has_kill, round_has_assist = set(), set()
+        round_has_trade_kill, round_has_traded_death = set(), set()
+        round_has_survive = {pid for pid in players_here if pid not in dead_here}
+
+        kill_count_by_player = defaultdict(int)
+        for e in kill_events:
+            attacker = _safe_int(getattr(e, "attacker_id", 0), 0)
+            if attacker > 0:
+                round_has_kill.add(attacker)
+                kill_count_by_player[attacker] += 1
+
+        for e in assist_events:
+            assister = _safe_int(getattr(e, "attacker_id", 0), 0)
+            if assister > 0:
+                round_has_assist.add(assister)
+
+        if kill_events:
+            first_kill = min(kill_events, key=lambda e: _safe_int(getattr(e, "tick", 0), 0))
+            entry_attacker = _safe_int(getattr(first_kill, "attacker_id", 0), 0)
+            entry_victim = _safe_int(getattr(first_kill, "victim_id", 0), 0)
+            if entry_attacker > 0:
+                stats[entry_attacker].entry_kills += 1
+            if entry_victim > 0:
+                stats[entry_victim].entry_deaths += 1
+
+        for e in kill_events:
+            attacker = _safe_int(getattr(e, "attacker_id", 0), 0)
+            victim = _safe_int(getattr(e, "victim_id", 0), 0)
+            victim_side = _norm_side(getattr(e, "victim_side", None))
+            attacker_side = _norm_side(getattr(e, "attacker_side", None))
+            if attacker <= 0 or victim <= 0 or victim_side is None or attacker_side is None:
+                continue
+
+            death_tick = _safe_int(getattr(e, "tick", 0), 0)
+            for later in kill_events:
+                later_tick = _safe_int(getattr(later, "tick", 0), 0)
+                if later_tick < death_tick:
+                    continue
+                if later_tick - death_tick > trade_window:
+                    break
+                later_attacker = _safe_int(getattr(later, "attacker_id", 0), 0)
+                later_victim = _safe_int(getattr(later, "victim_id", 0), 0)
+                later_attacker_side = _norm_side(getattr(later, "attacker_side", None))
+                if later_attacker <= 0 or later_victim <= 0 or later_attacker_side is None:
+                    continue
+                if later_victim == attacker and later_attacker_side == victim_side:
+                    round_has_trade_kill.add(later_attacker)
+                    round_has_traded_death.add(victim)
+                    stats[later_attacker].trade_kills += 1
+                    stats[victim].traded_deaths += 1
+                    break
+
+        for pid in players_here:
+            if (pid in round_has_kill or pid in round_has_assist or pid in round_has_survive
+                    or pid in round_has_trade_kill or pid in round_has_traded_death):
+                stats[pid].kast_rounds += 1
+
+        for pid, kc in kill_count_by_player.items():
+            for n, field in ((2, "multikill_2"), (3, "multikill_3"), (4, "multikill_4"), (5, "multikill_5")):
+                if kc >= n:
+                    setattr(stats[pid], field, getattr(stats[pid], field) + 1)
+
+
+def deathmatch_round(kills: int, players: int = 20, seed: int = 1, rounds: int = 1):
+    """`kills` kills per round among `players` players, a few ticks apart (so most fall in one trade window)."""
+    rnd = random.Random(seed)
+    out = []
+    for rn in range(1, rounds + 1):
+        tick = rn * 1_000_000
+        for _ in range(kills):
+            tick += rnd.choice((0, 1, 2, 4, 8))
+            a, v = rnd.sample(range(1, players + 1), 2)
+            row = dict.fromkeys(EVENT_COLUMNS)
+            row.update(
+                match_id=1, round_number=rn, tick=tick, event_type=rnd.choice(("kill", "kill", "kill", "assist")),
+                attacker_id=a, victim_id=v,
+                attacker_side="T" if a % 2 else "CT", victim_side="T" if v % 2 else "CT",
+            )
+            out.append(EventRow(**row))
+    return _sorted_events(out)
+
+
+def _run(fn, events):
+    stats = defaultdict(PlayerStats)
+    t0 = time.perf_counter()
+    fn(events, stats)
+    return time.perf_counter() - t0, dict(stats)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--kills", type=int, nargs="+", default=[100, 500, 2000, 5000], help="kills per round")
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+
+    mismatches = 0
+    for kills in args.kills:
+        events = deathmatch_round(kills, rounds=args.rounds, seed=kills)
+        t_old, old = _run(_legacy_round_features, events)
+        t_new, new = _run(_compute_round_features, events)
+        same = old == new
+        mismatches += not same
+        print(
+            f"  {kills:>6} kills/round x {args.rounds}: nested {t_old * 1000:9.1f} ms"
+            f"   single-pass {t_new * 1000:7.1f} ms   x{t_old / max(t_new, 1e-9):6.1f}"
+            f"   {'same' if same else 'MISMATCH'}"
+        )
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
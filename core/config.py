@@ -18,6 +18,48 @@ class Settings(BaseSettings):
     # Upload
     MAX_DEMO_SIZE_MB: int = 2000
 
+    # Ingest jobs: spooled demos wait here until a worker picks them up
+    INGEST_SPOOL_DIR: str = "./ingest_spool"
+    INGEST_CONCURRENCY: int = 2  # jobs running parse/persist/rate at once (per app process)
+
+    # Demo parsing process pool (0 = parse in the thread pool, no subprocesses)
+    PARSE_WORKERS: int = 2
+
+    # Parse cache (analyzer results keyed by demo SHA-256)
+    PARSE_CACHE_DIR: str = "./parse_cache"
+    PARSE_CACHE_MAX_MB: int = 2048  # 0 disables the cache
+
+    # round_events damage rows: "full" (one per player_hurt) or "compact" (one per round/attacker/victim, opt-in)
+    DAMAGE_EVENTS: str = "full"
+    # Cold copy of the per-hit damage stream (<dir>/<match_id>.jsonl.gz); required for "compact"
+    DAMAGE_COLD_DIR: str = ""
+
+    # Impact rating engine: "numpy" (columnar, same output) or "python" (reference implementation)
+    RATING_BACKEND: str = "numpy"
+
+    # Archive re-rating (services.rerate): pool size (0 = rate in the job thread) and matches per checkpoint
+    RERATE_WORKERS: int = 2
+    RERATE_CHUNK_MATCHES: int = 200
+    # a running job whose heartbeat (one per chunk) is older than this lost its runner; resume may take it over
+    RERATE_STALE_SEC: int = 300
+
+    # Trial rating engine versions (services.rating_engines), comma separated, e.g. "v3_empirical";
+    # stored in match_player_ratings at ingest and by rerate jobs, live impact_rating is untouched
+    RATING_ENGINES: str = ""
+
+    # Win probability models (services.win_probability registry): ct_table | swing_logit | winprob_v1 | empirical
+    RATING_WINPROB_MODEL: str = "ct_table"   # kill swing inside the impact rating
+    SWING_WINPROB_MODEL: str = "swing_logit"  # /api/debug/swing state machine
+
+    # Leaderboard snapshots (7/30/90/365 days, all-time; per map and overall): minimum matches to be ranked,
+    # how old a rolling-window snapshot may get before a read rebuilds it (matches age out of the window)
+    LEADERBOARD_MIN_MATCHES: int = 3
+    LEADERBOARD_SNAPSHOT_TTL_SEC: int = 3600
+
+    # "empirical" model: Laplace pseudo-count per outcome, how often the counts are re-read from winprob_cells
+    WINPROB_LAPLACE_ALPHA: float = 1.0
+    WINPROB_EMPIRICAL_TTL_SEC: int = 60
+
     class Config:
         env_file = ".env"
         case_sensitive = True
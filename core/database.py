@@ -31,3 +31,15 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+def insert_for(db: Session):
+    """Dialect-specific INSERT (has on_conflict_do_update) or None if the backend has no upsert."""
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
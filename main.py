@@ -3,8 +3,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
+from starlette.concurrency import run_in_threadpool
 from starlette.responses import JSONResponse
 
+from core.config import settings
+
 from routes.upload import router as upload_router
 from routes.matches import matches_router, leaderboard_router
 from routes.players import router as players_router
@@ -12,6 +15,9 @@ from routes.weapons import router as weapons_router
 from routes.admin import router as admin_router
 from routes.stats import router as stats_router
 from routes.avatars import router as avatars_router  # ← ДОБАВЛЕНО
+from services.parse_pool import shutdown_parse_executor
+from services.ingest_jobs import ingest_runner
+from services.rerate import rerate_runner
 
 app = FastAPI(
     title="CS2 Analytics API",
@@ -19,8 +25,8 @@ app = FastAPI(
     description="Impact Rating v3 + KAST + SWING + Steam Avatars"
 )
 
-# Лимит загрузки 2GB
-MAX_UPLOAD_SIZE = 2 * 1024 * 1024 * 1024  # 2 GB в байтах
+# Лимит загрузки = MAX_DEMO_SIZE_MB (+1 MB на multipart-обвязку)
+MAX_UPLOAD_SIZE = (settings.MAX_DEMO_SIZE_MB + 1) * 1024 * 1024
 
 class LimitUploadSize(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
@@ -29,7 +35,7 @@ class LimitUploadSize(BaseHTTPMiddleware):
             if content_length and int(content_length) > MAX_UPLOAD_SIZE:
                 return JSONResponse(
                     status_code=413,
-                    content={"detail": "File too large (max 2 GB)"}
+                    content={"detail": f"File too large (max {settings.MAX_DEMO_SIZE_MB} MB)"}
                 )
         return await call_next(request)
 
@@ -54,6 +60,23 @@ app.include_router(stats_router)
 app.include_router(avatars_router)  # ← ДОБАВЛЕНО
 
 
+@app.on_event("startup")
+async def _resume_ingest_jobs():
+    resumed = await ingest_runner.resume_pending()
+    if resumed:
+        print(f"Resumed {resumed} ingest job(s)")
+    resumed = await run_in_threadpool(rerate_runner.resume_pending)
+    if resumed:
+        print(f"Resumed {resumed} rerate job(s)")
+
+
+@app.on_event("shutdown")
+async def _shutdown_workers():
+    await ingest_runner.shutdown()
+    rerate_runner.shutdown()
+    shutdown_parse_executor()
+
+
 # ✅ Health check endpoint (доступен по /api/health)
 @app.get("/api/health")
 def health_check():
@@ -1 +1,8 @@
 from .round_event import RoundEvent
+from .ingest_job import IngestJob
+from .winprob_cell import WinProbCell
+from .rerate_job import RerateJob
+from .match_document import MatchDocument
+from .round import Round
+from .player_aggregate import PlayerAggregate
+from .leaderboard_snapshot import LeaderboardSnapshot, LeaderboardEntry
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, Index
+from models.base import Base, TimestampMixin
+
+
+class IngestJob(Base, TimestampMixin):
+    __tablename__ = "ingest_jobs"
+    __table_args__ = (
+        Index("idx_ingest_jobs_status", "status"),
+    )
+
+    id = Column(Integer, primary_key=True)
+
+    # queued -> parsing -> persisting (persist + rate, one transaction) -> done | failed
+    status = Column(String(16), nullable=False, default="queued")
+
+    demo_filename = Column(String(256))
+    demo_hash = Column(String(64), index=True)
+    # spooled .dem waiting for the worker (removed once the job finishes)
+    demo_path = Column(String(512))
+
+    match_id = Column(Integer, nullable=True)
+    duplicate = Column(Boolean, nullable=False, default=False)
+    error = Column(String(1024), nullable=True)
+
+    # {"queue": s, "parse": s, "persist": s, "rate": s}
+    timings = Column(JSON, nullable=True)
+
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
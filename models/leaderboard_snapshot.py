@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Index, UniqueConstraint
+from models.base import Base
+
+
+class LeaderboardSnapshot(Base):
+    """
+    One precomputed leaderboard: a standard window (period_days, 0 = all-time)
+    for one map ("" = all maps). Marked stale by ingest / delete / live re-rate,
+    rebuilt by services.leaderboard_snapshots.
+    """
+    __tablename__ = "leaderboard_snapshots"
+    __table_args__ = (
+        UniqueConstraint("period_days", "map", name="uq_leaderboard_snapshot"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    period_days = Column(Integer, nullable=False)
+    map = Column(String(64), nullable=False, default="")
+    stale = Column(Boolean, nullable=False, default=True)
+    computed_at = Column(DateTime, nullable=True)
+
+
+class LeaderboardEntry(Base):
+    """A ranked player of a snapshot; nickname / avatar are joined from players at read time."""
+    __tablename__ = "leaderboard_entries"
+    __table_args__ = (
+        # top-N pages and rank neighbours: range scan on (snapshot, position)
+        Index("idx_lbe_snapshot_position", "snapshot_id", "position", unique=True),
+    )
+
+    snapshot_id = Column(Integer, ForeignKey("leaderboard_snapshots.id", ondelete="CASCADE"), primary_key=True)
+    player_id   = Column(Integer, ForeignKey("players.id", ondelete="CASCADE"), primary_key=True)
+
+    position = Column(Integer, nullable=False)  # 1..n by avg_rating desc, player_id
+    rank     = Column(Integer, nullable=False)  # dense rank of the displayed (2-decimal) avg_rating
+
+    matches           = Column(Integer, nullable=False)
+    avg_rating        = Column(Float, nullable=False)
+    avg_adr           = Column(Float, nullable=False)
+    avg_hs            = Column(Float, nullable=False)
+    kills             = Column(Integer, nullable=False)
+    deaths            = Column(Integer, nullable=False)
+    fk                = Column(Integer, nullable=False)
+    fd                = Column(Integer, nullable=False)
+    avg_kast          = Column(Float, nullable=False)
+    avg_swing_display = Column(Float, nullable=False)
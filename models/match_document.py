@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, func
+from models.base import Base
+
+
+class MatchDocument(Base):
+    """
+    Rendered GET /api/matches/{id} response (JSON text) + its ETag.
+    Built on first read, dropped when the match is deleted or re-rated
+    (services.match_documents).
+    """
+    __tablename__ = "match_documents"
+
+    match_id = Column(Integer, ForeignKey("matches.id", ondelete="CASCADE"), primary_key=True)
+    etag = Column(String(64), nullable=False)
+    body = Column(Text, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
@@ -26,6 +26,7 @@ class Match(Base, TimestampMixin):
 
     id            = Column(Integer, primary_key=True)
     demo_filename = Column(String(256))
+    demo_hash     = Column(String(64), unique=True, index=True)  # SHA-256 of the .dem, makes ingest idempotent
     played_at     = Column(DateTime, nullable=False, index=True)
     map           = Column(String(64), nullable=False, index=True)
     total_rounds  = Column(Integer, nullable=False)
@@ -74,12 +75,32 @@ class MatchPlayer(Base):
 
     match  = relationship("Match",  back_populates="match_players")
     player = relationship("Player", back_populates="match_players")
+    engine_ratings = relationship("MatchPlayerRating", back_populates="match_player", cascade="all, delete-orphan", passive_deletes=True)
+
+
+class MatchPlayerRating(Base):
+    """Rating of one match_player by a registered engine version (services.rating_engines); live rating stays on match_players."""
+    __tablename__ = "match_player_ratings"
+    __table_args__ = (
+        UniqueConstraint("match_player_id", "engine_version", name="uq_mp_engine_version"),
+        Index("idx_mpr_engine_rating", "engine_version", "impact_rating"),
+    )
+
+    id              = Column(Integer, primary_key=True)
+    match_player_id = Column(Integer, ForeignKey("match_players.id", ondelete="CASCADE"), nullable=False)
+    engine_version  = Column(String(32), nullable=False)
+    impact_rating   = Column(Float, nullable=False, default=1.0)
+    kast_pct        = Column(Float, nullable=False, default=0.0)
+    swing           = Column(Float, nullable=False, default=0.0)
+
+    match_player = relationship("MatchPlayer", back_populates="engine_ratings")
 
 
 class WeaponStat(Base):
     __tablename__ = "weapon_stats"
     __table_args__ = (
-        Index("idx_ws_weapon", "weapon"),
+        # covering: per-(weapon, player) sums for the weapon leaderboards scan the index in group order
+        Index("idx_ws_weapon_player", "weapon", "player_id", "kills", "headshots", "damage"),
     )
 
     id         = Column(Integer, primary_key=True)
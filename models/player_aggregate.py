@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey
+from models.base import Base, TimestampMixin
+
+
+class PlayerAggregate(Base, TimestampMixin):
+    """
+    Career running sums of one player's match_players rows (live rating).
+    Added at ingest, subtracted on match delete, adjusted by live re-rates
+    (services.player_aggregates); averages are sum / matches.
+    """
+    __tablename__ = "player_aggregates"
+
+    player_id = Column(Integer, ForeignKey("players.id", ondelete="CASCADE"), primary_key=True)
+
+    matches = Column(Integer, nullable=False, default=0)
+    wins    = Column(Integer, nullable=False, default=0)
+
+    kills   = Column(Integer, nullable=False, default=0)
+    deaths  = Column(Integer, nullable=False, default=0)
+    assists = Column(Integer, nullable=False, default=0)
+    fk      = Column(Integer, nullable=False, default=0)
+    fd      = Column(Integer, nullable=False, default=0)
+
+    sum_adr    = Column(Float, nullable=False, default=0.0)
+    sum_hs_pct = Column(Float, nullable=False, default=0.0)
+    sum_rating = Column(Float, nullable=False, default=0.0)  # impact_rating
+    sum_kast   = Column(Float, nullable=False, default=0.0)
+    sum_swing  = Column(Float, nullable=False, default=0.0)
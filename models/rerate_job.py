@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Index
+from models.base import Base, TimestampMixin
+
+
+class RerateJob(Base, TimestampMixin):
+    __tablename__ = "rerate_jobs"
+    __table_args__ = (
+        Index("idx_rerate_jobs_status", "status"),
+    )
+
+    id = Column(Integer, primary_key=True)
+
+    # queued -> running -> done | failed | interrupted (paused by a shutdown); failed / interrupted
+    # jobs resume from the checkpoint, so do running ones whose heartbeat (updated_at) went stale
+    status = Column(String(16), nullable=False, default="queued")
+
+    # engine versions to compute: "live" (match_players) and/or services.rating_engines names
+    engines = Column(JSON, nullable=True)
+
+    # checkpoint: every match with id <= last_match_id is re-rated (committed with the chunk's writes)
+    last_match_id = Column(Integer, nullable=False, default=0)
+    # matches with id > max_match_id were rated at ingest with the current code
+    max_match_id = Column(Integer, nullable=False, default=0)
+
+    total_matches = Column(Integer, nullable=False, default=0)
+    matches_done = Column(Integer, nullable=False, default=0)
+    players_updated = Column(Integer, nullable=False, default=0)
+    events_done = Column(Integer, nullable=False, default=0)
+
+    # seconds spent in this job across restarts
+    elapsed_sec = Column(Float, nullable=False, default=0.0)
+    # {"matches_per_sec": x, "events_per_sec": y, "engine": ..., "winprob_model": ...}
+    progress = Column(JSON, nullable=True)
+    error = Column(String(1024), nullable=True)
+
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
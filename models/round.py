@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, UniqueConstraint
+from models.base import Base
+
+
+class Round(Base):
+    """One row per played round: the round_result facts, without scanning round_events."""
+    __tablename__ = "rounds"
+    __table_args__ = (
+        # (match_id, round_number) leads the index -> per-match range scans in round order
+        UniqueConstraint("match_id", "round_number", name="uq_round_match_number"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    match_id = Column(Integer, ForeignKey("matches.id", ondelete="CASCADE"), nullable=False)
+    round_number = Column(Integer, nullable=False)
+
+    winner_side = Column(String, nullable=True)  # "T" / "CT"
+    win_reason = Column(String, nullable=True)
+    bomb_planted = Column(Boolean, nullable=False, default=False)
+
+    # score BEFORE the round
+    score_t = Column(Integer, nullable=True)
+    score_ct = Column(Integer, nullable=True)
+
+    # alive at the END of the round
+    alive_t = Column(Integer, nullable=True)
+    alive_ct = Column(Integer, nullable=True)
+
+    end_tick = Column(Integer, nullable=True)
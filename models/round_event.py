@@ -28,6 +28,12 @@ class RoundEvent(Base):
 
     damage = Column(Float, default=0.0)
 
+    # Compacted damage (services.damage_compaction): one row per (round, attacker, victim),
+    # damage = total capped damage, tick = first hit, last_tick = last hit.
+    # NULL hits = one per-hit row (matches stored before compaction / DAMAGE_EVENTS=full)
+    hits = Column(Integer, nullable=True)
+    last_tick = Column(Integer, nullable=True)
+
     # For kill/damage: alive BEFORE event
     # For round_result: alive at END of round
     alive_t = Column(Integer)
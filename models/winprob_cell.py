@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, Boolean, UniqueConstraint
+from models.base import Base, TimestampMixin
+
+
+class WinProbCell(Base, TimestampMixin):
+    """
+    Empirical win-probability counts: how often T / CT went on to win a round
+    that passed through this state. Filled incrementally at ingest
+    (services.winprob_empirical), read by the "empirical" win probability model.
+    """
+    __tablename__ = "winprob_cells"
+    __table_args__ = (
+        UniqueConstraint("alive_t", "alive_ct", "bomb_planted", "time_bucket", name="uq_winprob_cell"),
+    )
+
+    id = Column(Integer, primary_key=True)
+
+    # state just before a kill (round_events kill row)
+    alive_t = Column(Integer, nullable=False)
+    alive_ct = Column(Integer, nullable=False)
+    bomb_planted = Column(Boolean, nullable=False, default=False)
+    # time_in_round // TIME_BUCKET_SEC, capped; -1 = time unknown
+    time_bucket = Column(Integer, nullable=False)
+
+    t_wins = Column(Integer, nullable=False, default=0)
+    ct_wins = Column(Integer, nullable=False, default=0)
@@ -1,9 +1,31 @@
 # -*- coding: utf-8 -*-
 from demoparser2 import DemoParser
+import numpy as np
 import pandas as pd
 from collections import defaultdict
 from typing import Dict, Any, Optional, List
 
+from parser.event_buffer import RoundEventBuffer
+
+
+class _ColumnRow:
+    """
+    Read-only row view over column arrays.
+    Quacks like the Series rows from df.iterrows() for the _apply_* handlers
+    (only .get is used), without building a Series per event.
+    """
+    __slots__ = ("_cols", "_i")
+
+    def __init__(self, cols: Dict[str, np.ndarray], i: int):
+        self._cols = cols
+        self._i = i
+
+    def get(self, key: str, default: Any = None) -> Any:
+        col = self._cols.get(key)
+        if col is None:
+            return default
+        return col[self._i]
+
 
 class CS2DemoAnalyzer:
     KNIFE_KEYWORDS = (
@@ -20,6 +42,8 @@ class CS2DemoAnalyzer:
         "zeus"
     )
 
+    TICK_RATE = 64  # CS2 server ticks per second (time_in_round from ticks)
+
     BOMB_EVENT_NAMES = (
         "bomb_planted",
         "bomb_defused",
@@ -27,9 +51,40 @@ class CS2DemoAnalyzer:
         "bomb_explode",
     )
 
-    def __init__(self, demo_path: str, *, verbose: bool = False):
+    _VICTIM_PROPS = (
+        "steamid", "name", "team_name",
+        "user_steamid", "user_name", "user_team_name",
+        "tick",
+    )
+    _ATTACKER_PROPS = ("attacker_steamid", "attacker_name", "attacker_team_name")
+    _ASSISTER_PROPS = ("assister_steamid", "assister_name", "assister_team_name")
+    _BOMB_PROPS = (
+        "site", "bombsite", "has_defuse_kit", "has_kit", "kit",
+        "time_in_round", "time", "seconds", "tick",
+    )
+
+    # event -> (player props, other props): only what the _apply_* handler for it reads.
+    # Dict order is the concat order, which the stable tick sort relies on for ties.
+    EVENT_PROPS = {
+        "player_death": (_VICTIM_PROPS, _ATTACKER_PROPS + _ASSISTER_PROPS + ("weapon", "headshot", "tick")),
+        "player_hurt": (_VICTIM_PROPS, _ATTACKER_PROPS + ("weapon", "dmg_health", "tick")),
+        "round_end": ((), ("winner", "reason", "win_reason", "tick")),
+        "round_announce_match_start": ((), ("tick",)),
+        "round_freeze_end": ((), ("tick",)),
+        **dict.fromkeys(BOMB_EVENT_NAMES, (("steamid", "user_steamid", "tick"), _BOMB_PROPS)),
+    }
+
+    # native event fields the handlers fall back to (never requested as props, kept if present)
+    EVENT_EXTRA_FIELDS = dict.fromkeys(
+        BOMB_EVENT_NAMES,
+        ("bomb_site", "plant_site", "site_name", "hasKit", "defuser_has_kit", "round_time"),
+    )
+
+    def __init__(self, demo_path: str, *, verbose: bool = False, vectorized: bool = True):
         self.demo_path = demo_path
         self.verbose = verbose
+        # vectorized=False falls back to the legacy iterrows() segmentation
+        self.vectorized = vectorized
         self.parser = DemoParser(demo_path)
 
         self.players = defaultdict(lambda: {
@@ -54,8 +109,8 @@ class CS2DemoAnalyzer:
         self.t_score = 0
         self.round_winners = []  # "CT"/"T"
 
-        # round events saved for backend rating
-        self.round_events: List[Dict[str, Any]] = []
+        # round events saved for backend rating (columnar, see parser/event_buffer.py)
+        self.round_events = RoundEventBuffer()
 
     def _log(self, msg: str) -> None:
         if self.verbose:
@@ -228,41 +283,47 @@ class CS2DemoAnalyzer:
         except Exception:
             tick_i = None
 
-        self.round_events.append({
-            "event_type": event_type,
-            "round_number": int(round_number),
-            "tick": tick_i,
-
-            "attacker_id": str(attacker_id) if attacker_id else None,
-            "victim_id": str(victim_id) if victim_id else None,
-
-            # ✅ NEW: persist sides into events
-            "attacker_side": (str(attacker_side).strip().upper() if attacker_side else None),
-            "victim_side": (str(victim_side).strip().upper() if victim_side else None),
-
-            "weapon": (weapon or "").strip().lower(),
-            "headshot": bool(headshot),
-            "damage": float(damage) if damage is not None else 0.0,
-
-            "alive_t": int(alive_t_before),
-            "alive_ct": int(alive_ct_before),
-
-            "eco_t": bool(eco_t),
-            "eco_ct": bool(eco_ct),
-
-            "score_t": int(score_t_before_round),
-            "score_ct": int(score_ct_before_round),
+        self.round_events.append(
+            event_type=event_type,
+            round_number=round_number,
+            tick=tick_i,
+            attacker_id=attacker_id,
+            victim_id=victim_id,
+            attacker_side=attacker_side,
+            victim_side=victim_side,
+            weapon=weapon,
+            headshot=headshot,
+            damage=damage,
+            alive_t=alive_t_before,
+            alive_ct=alive_ct_before,
+            eco_t=eco_t,
+            eco_ct=eco_ct,
+            score_t=score_t_before_round,
+            score_ct=score_ct_before_round,
+            planter_id=planter_id,
+            defuser_id=defuser_id,
+            bombsite=bombsite,
+            has_defuse_kit=has_defuse_kit,
+            time_in_round=time_in_round,
+            winner_side=winner_side,
+            win_reason=win_reason,
+            bomb_planted=bomb_planted,
+        )
 
-            "planter_id": str(planter_id) if planter_id else None,
-            "defuser_id": str(defuser_id) if defuser_id else None,
-            "bombsite": (str(bombsite).strip().upper() if bombsite else None),
-            "has_defuse_kit": bool(has_defuse_kit),
-            "time_in_round": float(time_in_round) if time_in_round is not None else None,
+    @staticmethod
+    def _tick_int(tick: Any) -> Optional[int]:
+        try:
+            return int(tick)
+        except (TypeError, ValueError):
+            return None
 
-            "winner_side": (str(winner_side).strip().upper() if winner_side else None),
-            "win_reason": (str(win_reason).strip() if win_reason else None),
-            "bomb_planted": bool(bomb_planted) if bomb_planted is not None else None,
-        })
+    def _time_in_round(self, tick: Any, round_clock: Optional[Dict[str, Optional[int]]]) -> Optional[float]:
+        """Seconds since freeze time ended; None when the round has no round_freeze_end tick."""
+        live_tick = (round_clock or {}).get("live_tick")
+        tick_i = self._tick_int(tick)
+        if live_tick is None or tick_i is None:
+            return None
+        return max(0.0, (tick_i - live_tick) / self.TICK_RATE)
 
     def _extract_bombsite(self, row) -> Optional[str]:
         for k in ("site", "bombsite", "bomb_site", "plant_site", "site_name"):
@@ -299,6 +360,7 @@ class CS2DemoAnalyzer:
         score_t_before_round: int,
         score_ct_before_round: int,
         bomb_state: Dict[str, bool],
+        round_clock: Optional[Dict[str, Optional[int]]] = None,
     ):
         ev = row.get("event_name")
         tick = row.get("tick")
@@ -326,6 +388,8 @@ class CS2DemoAnalyzer:
                 break
             except Exception:
                 pass
+        if time_in_round is None:
+            time_in_round = self._time_in_round(tick, round_clock)
 
         if ev == "bomb_planted":
             bomb_state["planted"] = True
@@ -403,6 +467,7 @@ class CS2DemoAnalyzer:
         alive_state: Dict[str, int],
         score_t_before_round: int,
         score_ct_before_round: int,
+        round_clock: Optional[Dict[str, Optional[int]]] = None,
     ) -> bool:
         victim = row.get("user_steamid") or row.get("steamid")
         attacker = row.get("attacker_steamid")
@@ -470,6 +535,7 @@ class CS2DemoAnalyzer:
                         # ✅ NEW: persist sides
                         attacker_side=attacker_side,
                         victim_side=victim_side,
+                        time_in_round=self._time_in_round(tick, round_clock),
                     )
 
                     if victim_side in ("T", "CT"):
@@ -603,35 +669,7 @@ class CS2DemoAnalyzer:
             header = self.parser.parse_header()
             map_name = header.get("map_name", "Unknown")
 
-            events = ["player_death", "player_hurt", "round_end", "round_announce_match_start"]
-            events += list(self.BOMB_EVENT_NAMES)
-
-            dfs = []
-            for event in events:
-                try:
-                    df = self.parser.parse_event(
-                        event,
-                        player=[
-                            "steamid", "name", "team_name",
-                            "user_steamid", "user_name", "user_team_name",
-                            "tick"
-                        ],
-                        other=[
-                            "attacker_steamid", "attacker_name", "attacker_team_name",
-                            "assister_steamid", "assister_name", "assister_team_name",
-                            "weapon", "headshot", "dmg_health", "winner", "tick",
-                            "site", "bombsite", "has_defuse_kit", "has_kit", "kit",
-                            "time_in_round", "time", "seconds",
-                            "reason", "win_reason"
-                        ],
-                    )
-                except Exception:
-                    df = None
-
-                if isinstance(df, pd.DataFrame) and (not df.empty):
-                    df["event_name"] = event
-                    dfs.append(df)
-
+            dfs = self._parse_event_frames()
             if not dfs:
                 return self._error("No events found")
 
@@ -641,7 +679,10 @@ class CS2DemoAnalyzer:
                 df["_tick_sort"] = pd.to_numeric(df["tick"], errors="coerce")
                 df = df.sort_values(by=["_tick_sort"], kind="mergesort").drop(columns=["_tick_sort"])
 
-            self._process_rounds_v2(df)
+            if self.vectorized:
+                self._process_rounds_vectorized(df)
+            else:
+                self._process_rounds_v2(df)
             return self._build_result(map_name)
 
         except Exception as e:
@@ -649,6 +690,53 @@ class CS2DemoAnalyzer:
             traceback.print_exc()
             return self._error(str(e))
 
+    def _parse_event_frames(self) -> List[pd.DataFrame]:
+        """
+        Pull every event in one pass via parse_events() when the demoparser2 build has it,
+        falling back to one parse_event() call per event otherwise.
+        Each frame is trimmed to its own event's props before concat.
+        """
+        names = list(self.EVENT_PROPS)
+        frames: Dict[str, Any] = {}
+
+        parse_events = getattr(self.parser, "parse_events", None)
+        single_pass = False
+        if parse_events is not None:
+            player = list(dict.fromkeys(p for pl, _ in self.EVENT_PROPS.values() for p in pl))
+            other = list(dict.fromkeys(p for _, ot in self.EVENT_PROPS.values() for p in ot))
+            try:
+                for name, df in parse_events(names, player=player, other=other) or []:
+                    frames[name] = df
+                single_pass = True
+            except Exception as e:
+                self._log(f"parse_events failed, falling back to per-event parsing: {e}")
+                frames = {}
+
+        if not single_pass:
+            for name in names:
+                player, other = self.EVENT_PROPS[name]
+                try:
+                    frames[name] = self.parser.parse_event(name, player=list(player), other=list(other))
+                except Exception:
+                    frames[name] = None
+
+        dfs = []
+        for name in names:
+            df = frames.get(name)
+            if not isinstance(df, pd.DataFrame) or df.empty:
+                continue
+
+            player, other = self.EVENT_PROPS[name]
+            keep = set(player) | set(other) | set(self.EVENT_EXTRA_FIELDS.get(name, ()))
+            drop = [c for c in df.columns if c not in keep]
+            if drop:
+                df = df.drop(columns=drop)
+
+            df["event_name"] = name
+            dfs.append(df)
+
+        return dfs
+
     def _process_rounds_v2(self, df: pd.DataFrame):
         print("PROCESS ROUNDS CALLED")
 
@@ -664,7 +752,7 @@ class CS2DemoAnalyzer:
                 announce_ticks.append(tick)
                 continue
 
-            if ev in ("player_death", "player_hurt") or ev in self.BOMB_EVENT_NAMES:
+            if ev in ("player_death", "player_hurt", "round_freeze_end") or ev in self.BOMB_EVENT_NAMES:
                 buffer_events.append(row)
                 continue
 
@@ -692,6 +780,118 @@ class CS2DemoAnalyzer:
 
                 buffer_events = []
 
+        match_start_idx = self._find_match_start(all_rounds, announce_ticks)
+        self._play_rounds(all_rounds, match_start_idx)
+
+    def _process_rounds_vectorized(self, df: pd.DataFrame):
+        """
+        Same segmentation as _process_rounds_v2, but with column ops instead of iterrows().
+        Round ids come from searchsorted over round_end positions in the tick-sorted frame
+        (positions, not raw ticks, so same-tick ties keep the legacy buffer order).
+        """
+        if df.empty or "event_name" not in df.columns:
+            return
+
+        full = {c: df[c].to_numpy(dtype=object) for c in df.columns}
+        ev = full["event_name"]
+
+        buffered_names = ["player_death", "player_hurt", "round_freeze_end"] + list(self.BOMB_EVENT_NAMES)
+        end_pos = np.flatnonzero(ev == "round_end")
+        buf_pos = np.flatnonzero(np.isin(ev, buffered_names))
+
+        # round id per buffered row; == len(end_pos) means "after the last round_end" (dropped)
+        buf_round = np.searchsorted(end_pos, buf_pos, side="left")
+        n_ends = len(end_pos)
+
+        cols = {c: a[buf_pos] for c, a in full.items()}
+        bounds = np.searchsorted(buf_round, np.arange(n_ends + 1), side="left")
+
+        # knife-only detection: count deaths and knife deaths per round
+        is_death = cols["event_name"] == "player_death"
+        weapon_col = cols.get("weapon")
+        if weapon_col is not None:
+            knife = np.fromiter(
+                (self._is_knife_weapon(self._norm_str(w).lower()) for w in weapon_col[is_death]),
+                dtype=bool,
+            )
+        else:
+            knife = np.zeros(int(is_death.sum()), dtype=bool)
+
+        death_rounds = buf_round[is_death]
+        deaths_per_round = np.bincount(death_rounds, minlength=n_ends + 1)
+        knife_per_round = np.bincount(death_rounds[knife], minlength=n_ends + 1)
+        knife_only_per_round = (deaths_per_round > 0) & (knife_per_round == deaths_per_round)
+
+        end_rows = {c: a[end_pos] for c, a in full.items()}
+        all_rounds = []
+        for k in range(n_ends):
+            row = _ColumnRow(end_rows, k)
+            winner_side = self._winner_to_side(self._norm_str(row.get("winner")))
+            if not winner_side:
+                continue
+
+            lo, hi = int(bounds[k]), int(bounds[k + 1])
+            all_rounds.append({
+                "winner": winner_side,
+                "reason": self._norm_str(row.get("reason") or row.get("win_reason")),
+                "is_knife_only": bool(knife_only_per_round[k]),
+                "has_deaths": bool(deaths_per_round[k] > 0),
+                "events": self._iter_round_slice(cols, lo, hi),
+                "tick": row.get("tick"),
+            })
+
+        is_announce = ev == "round_announce_match_start"
+        tick_col = full.get("tick")
+        if tick_col is not None:
+            announce_ticks = list(tick_col[is_announce])
+        else:
+            announce_ticks = [None] * int(is_announce.sum())
+
+        match_start_idx = self._find_match_start_vectorized(all_rounds, announce_ticks)
+        self._play_rounds(all_rounds, match_start_idx)
+
+    @staticmethod
+    def _iter_round_slice(cols: Dict[str, np.ndarray], lo: int, hi: int):
+        sliced = {c: a[lo:hi] for c, a in cols.items()}
+        for i in range(hi - lo):
+            yield _ColumnRow(sliced, i)
+
+    @staticmethod
+    def _find_match_start_vectorized(all_rounds: List[Dict[str, Any]], announce_ticks: List[Any]) -> int:
+        n = len(all_rounds)
+        if n == 0:
+            return 0
+
+        knife = np.fromiter((r["is_knife_only"] for r in all_rounds), dtype=bool, count=n)
+        winners = np.array([r["winner"] for r in all_rounds], dtype=object)
+
+        match_start_idx = 0
+
+        if announce_ticks:
+            last_announce_tick = pd.to_numeric(pd.Series([announce_ticks[-1]]), errors="coerce").iloc[0]
+            ticks = pd.to_numeric(pd.Series([r["tick"] for r in all_rounds], dtype=object), errors="coerce").to_numpy(dtype=float)
+            with np.errstate(invalid="ignore"):
+                after = (ticks != 0) & (ticks > last_announce_tick)
+            hits = np.flatnonzero(after)
+            if hits.size:
+                i = int(hits[0])
+                match_start_idx = i + 1 if knife[i] else i
+
+        if match_start_idx == 0:
+            hits = np.flatnonzero(knife)
+            if hits.size:
+                match_start_idx = int(hits[0]) + 1
+
+        if match_start_idx == 0:
+            # first winner flip in rounds 1..4, never on the last round
+            flips = np.flatnonzero(winners[1:] != winners[:-1]) + 1
+            flips = flips[(flips < min(5, n)) & (flips < n - 1)]
+            if flips.size:
+                match_start_idx = int(flips[0])
+
+        return match_start_idx
+
+    def _find_match_start(self, all_rounds: List[Dict[str, Any]], announce_ticks: List[Any]) -> int:
         match_start_idx = 0
 
         if announce_ticks:
@@ -717,6 +917,9 @@ class CS2DemoAnalyzer:
                         match_start_idx = i
                         break
 
+        return match_start_idx
+
+    def _play_rounds(self, all_rounds: List[Dict[str, Any]], match_start_idx: int):
         for i in range(match_start_idx, len(all_rounds)):
             round_data = all_rounds[i]
             self.total_rounds += 1
@@ -735,18 +938,23 @@ class CS2DemoAnalyzer:
 
             alive_state = {"T": 5, "CT": 5}
             bomb_state = {"planted": False}
+            round_clock = {"live_tick": None}  # freeze time end, set by round_freeze_end
             first_kill_done = False
 
             for r in round_data["events"]:
                 ev = r.get("event_name")
 
-                if ev == "player_death":
+                if ev == "round_freeze_end":
+                    round_clock["live_tick"] = self._tick_int(r.get("tick"))
+
+                elif ev == "player_death":
                     first_kill_done = self._apply_death(
                         r, first_kill_done,
                         round_number=round_number,
                         alive_state=alive_state,
                         score_t_before_round=score_t_before_round,
-                        score_ct_before_round=score_ct_before_round
+                        score_ct_before_round=score_ct_before_round,
+                        round_clock=round_clock,
                     )
 
                 elif ev == "player_hurt":
@@ -765,7 +973,8 @@ class CS2DemoAnalyzer:
                         alive_state=alive_state,
                         score_t_before_round=score_t_before_round,
                         score_ct_before_round=score_ct_before_round,
-                        bomb_state=bomb_state
+                        bomb_state=bomb_state,
+                        round_clock=round_clock,
                     )
 
             self._finalize_round_damage()
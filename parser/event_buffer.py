@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+"""
+Struct-of-arrays buffer for parser round events.
+
+One typed array per field instead of one dict per event; steamids, weapons,
+bombsites and win reasons are interned, event_type and sides are small-int enums.
+Iterating the buffer still yields the legacy event dicts, so older callers keep working,
+while the ingest path reads the zero-copy numpy view().
+"""
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+
+EVENT_TYPES = (
+    "kill",
+    "assist",
+    "damage",
+    "bomb_planted",
+    "bomb_defused",
+    "bomb_exploded",
+    "round_result",
+)
+EVENT_TYPE_CODES: Dict[str, int] = {name: code for code, name in enumerate(EVENT_TYPES)}
+
+SIDES = (None, "T", "CT")
+SIDE_NONE, SIDE_T, SIDE_CT = 0, 1, 2
+SIDE_CODES: Dict[str, int] = {"T": SIDE_T, "CT": SIDE_CT}
+
+NO_ID = -1            # missing steamid / bombsite / win_reason
+NO_TICK = -1
+BOMB_PLANTED_NONE = -1
+
+# field -> array typecode; order is the legacy dict key order
+COLUMNS = (
+    ("event_type", "B"),
+    ("round_number", "i"),
+    ("tick", "q"),
+    ("attacker_id", "i"),
+    ("victim_id", "i"),
+    ("attacker_side", "b"),
+    ("victim_side", "b"),
+    ("weapon", "i"),
+    ("headshot", "B"),
+    ("damage", "d"),
+    ("alive_t", "h"),
+    ("alive_ct", "h"),
+    ("eco_t", "B"),
+    ("eco_ct", "B"),
+    ("score_t", "h"),
+    ("score_ct", "h"),
+    ("planter_id", "i"),
+    ("defuser_id", "i"),
+    ("bombsite", "i"),
+    ("has_defuse_kit", "B"),
+    ("time_in_round", "d"),
+    ("winner_side", "b"),
+    ("win_reason", "i"),
+    ("bomb_planted", "b"),
+)
+
+
+class InternTable:
+    """Append-only value <-> small int table."""
+
+    __slots__ = ("values", "_index")
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        idx = self._index.get(value)
+        if idx is None:
+            idx = len(self.values)
+            self.values.append(value)
+            self._index[value] = idx
+        return idx
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+@dataclass(frozen=True)
+class RoundEventView:
+    """
+    Zero-copy numpy columns over a RoundEventBuffer plus its lookup tables.
+    Id-like columns hold indexes into the tables (NO_ID for missing),
+    event_type/sides hold EVENT_TYPES/SIDES codes.
+    """
+    columns: Dict[str, np.ndarray]
+    steamids: Sequence[str]
+    weapons: Sequence[str]
+    bombsites: Sequence[str]
+    win_reasons: Sequence[str]
+
+    def __len__(self) -> int:
+        return len(self.columns["event_type"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def records(self, indices: Optional[Sequence[int]] = None) -> Iterator[Dict[str, Any]]:
+        """Yield legacy event dicts (same keys/values the parser used to append)."""
+        cols = self.columns
+        if indices is not None:
+            idx = np.asarray(indices, dtype=np.intp)
+            cols = {name: col[idx] for name, col in cols.items()}
+
+        lists = {name: col.tolist() for name, col in cols.items()}
+        steamids = self.steamids
+        weapons = self.weapons
+        bombsites = self.bombsites
+        reasons = self.win_reasons
+
+        def sid(i: int) -> Optional[str]:
+            return steamids[i] if i != NO_ID else None
+
+        for (
+            et, rn, tick, att, vic, a_side, v_side, weapon, hs, dmg,
+            alive_t, alive_ct, eco_t, eco_ct, score_t, score_ct,
+            planter, defuser, site, kit, t_ir, winner, reason, planted,
+        ) in zip(*(lists[name] for name, _ in COLUMNS)):
+            yield {
+                "event_type": EVENT_TYPES[et],
+                "round_number": rn,
+                "tick": tick if tick != NO_TICK else None,
+                "attacker_id": sid(att),
+                "victim_id": sid(vic),
+                "attacker_side": SIDES[a_side],
+                "victim_side": SIDES[v_side],
+                "weapon": weapons[weapon],
+                "headshot": bool(hs),
+                "damage": dmg,
+                "alive_t": alive_t,
+                "alive_ct": alive_ct,
+                "eco_t": bool(eco_t),
+                "eco_ct": bool(eco_ct),
+                "score_t": score_t,
+                "score_ct": score_ct,
+                "planter_id": sid(planter),
+                "defuser_id": sid(defuser),
+                "bombsite": bombsites[site] if site != NO_ID else None,
+                "has_defuse_kit": bool(kit),
+                "time_in_round": t_ir if t_ir == t_ir else None,
+                "winner_side": SIDES[winner],
+                "win_reason": reasons[reason] if reason != NO_ID else None,
+                "bomb_planted": bool(planted) if planted != BOMB_PLANTED_NONE else None,
+            }
+
+
+class RoundEventBuffer:
+    """
+    Columnar replacement for the old List[Dict] of round events.
+
+    Note: while a view() is alive its arrays export the underlying buffers,
+    so append() raises BufferError; take views once parsing is done.
+    """
+
+    def __init__(self):
+        self._cols: Dict[str, array] = {name: array(code) for name, code in COLUMNS}
+
+        self.steamids = InternTable()
+        self.weapons = InternTable()
+        self.bombsites = InternTable()
+        self.win_reasons = InternTable()
+
+        # raw value -> interned index, so normalization runs once per distinct value
+        self._weapon_raw: Dict[Any, int] = {}
+        self._bombsite_raw: Dict[Any, int] = {}
+        self._reason_raw: Dict[Any, int] = {}
+        self._side_raw: Dict[Any, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._cols["event_type"])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.view().records()
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("round event index out of range")
+        return next(self.view().records([i]))
+
+    # ---------------------------------------------------------
+    # normalization (cached per raw value)
+    # ---------------------------------------------------------
+
+    def _sid(self, x: Any) -> int:
+        return self.steamids.intern(str(x)) if x else NO_ID
+
+    def _side(self, x: Any) -> int:
+        if not x:
+            return SIDE_NONE
+        code = self._side_raw.get(x)
+        if code is None:
+            code = SIDE_CODES.get(str(x).strip().upper(), SIDE_NONE)
+            self._side_raw[x] = code
+        return code
+
+    def _weapon(self, x: Any) -> int:
+        idx = self._weapon_raw.get(x)
+        if idx is None:
+            idx = self.weapons.intern((x or "").strip().lower())
+            self._weapon_raw[x] = idx
+        return idx
+
+    def _bombsite(self, x: Any) -> int:
+        if not x:
+            return NO_ID
+        idx = self._bombsite_raw.get(x)
+        if idx is None:
+            idx = self.bombsites.intern(str(x).strip().upper())
+            self._bombsite_raw[x] = idx
+        return idx
+
+    def _reason(self, x: Any) -> int:
+        if not x:
+            return NO_ID
+        idx = self._reason_raw.get(x)
+        if idx is None:
+            idx = self.win_reasons.intern(str(x).strip())
+            self._reason_raw[x] = idx
+        return idx
+
+    # ---------------------------------------------------------
+    # write / read
+    # ---------------------------------------------------------
+
+    def append(
+        self,
+        *,
+        event_type: str,
+        round_number: int,
+        tick: Optional[int],
+        attacker_id: Optional[str],
+        victim_id: Optional[str],
+        attacker_side: Optional[str],
+        victim_side: Optional[str],
+        weapon: str,
+        headshot: bool,
+        damage: Optional[float],
+        alive_t: int,
+        alive_ct: int,
+        eco_t: bool,
+        eco_ct: bool,
+        score_t: int,
+        score_ct: int,
+        planter_id: Optional[str] = None,
+        defuser_id: Optional[str] = None,
+        bombsite: Optional[str] = None,
+        has_defuse_kit: bool = False,
+        time_in_round: Optional[float] = None,
+        winner_side: Optional[str] = None,
+        win_reason: Optional[str] = None,
+        bomb_planted: Optional[bool] = None,
+    ) -> None:
+        c = self._cols
+        c["event_type"].append(EVENT_TYPE_CODES[event_type])
+        c["round_number"].append(int(round_number))
+        c["tick"].append(NO_TICK if tick is None else int(tick))
+        c["attacker_id"].append(self._sid(attacker_id))
+        c["victim_id"].append(self._sid(victim_id))
+        c["attacker_side"].append(self._side(attacker_side))
+        c["victim_side"].append(self._side(victim_side))
+        c["weapon"].append(self._weapon(weapon))
+        c["headshot"].append(1 if headshot else 0)
+        c["damage"].append(float(damage) if damage is not None else 0.0)
+        c["alive_t"].append(int(alive_t))
+        c["alive_ct"].append(int(alive_ct))
+        c["eco_t"].append(1 if eco_t else 0)
+        c["eco_ct"].append(1 if eco_ct else 0)
+        c["score_t"].append(int(score_t))
+        c["score_ct"].append(int(score_ct))
+        c["planter_id"].append(self._sid(planter_id))
+        c["defuser_id"].append(self._sid(defuser_id))
+        c["bombsite"].append(self._bombsite(bombsite))
+        c["has_defuse_kit"].append(1 if has_defuse_kit else 0)
+        c["time_in_round"].append(float(time_in_round) if time_in_round is not None else float("nan"))
+        c["winner_side"].append(self._side(winner_side))
+        c["win_reason"].append(self._reason(win_reason))
+        c["bomb_planted"].append(BOMB_PLANTED_NONE if bomb_planted is None else (1 if bomb_planted else 0))
+
+    def view(self) -> RoundEventView:
+        columns = {
+            name: np.frombuffer(self._cols[name], dtype=np.dtype(code)) if len(self._cols[name])
+            else np.empty(0, dtype=np.dtype(code))
+            for name, code in COLUMNS
+        }
+        return RoundEventView(
+            columns=columns,
+            steamids=self.steamids.values,
+            weapons=self.weapons.values,
+            bombsites=self.bombsites.values,
+            win_reasons=self.win_reasons.values,
+        )
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return list(self)
+
+
+def dedupe_order(view: RoundEventView) -> np.ndarray:
+    """
+    Columnar twin of services.event_loader._dedupe_round_events: returns the row indexes to keep, in output order.
+    - one round_result per round (the latest tick wins, later rows win ties)
+    - bomb events deduped on (type, round, tick, planter/defuser, bombsite), first wins
+    - stable sort by (round_number, tick), missing ticks last
+    """
+    n = len(view)
+    if n == 0:
+        return np.empty(0, dtype=np.intp)
+
+    et = view["event_type"]
+    rn = view["round_number"].astype(np.int64)
+    tick = view["tick"]
+    tick_key = np.where(tick == NO_TICK, np.int64(10**12), tick.astype(np.int64))
+    pos = np.arange(n, dtype=np.intp)
+
+    rr_code = EVENT_TYPE_CODES["round_result"]
+    bomb_codes = [EVENT_TYPE_CODES[x] for x in ("bomb_planted", "bomb_defused", "bomb_exploded")]
+
+    is_rr = et == rr_code
+    is_bomb = np.isin(et, bomb_codes)
+
+    keep = ~(is_rr | is_bomb)
+
+    bomb_idx = pos[is_bomb]
+    if bomb_idx.size:
+        planter = view["planter_id"][bomb_idx].astype(np.int64)
+        defuser = view["defuser_id"][bomb_idx].astype(np.int64)
+        actor = np.where(planter != NO_ID, planter, defuser)
+        key = np.stack([
+            et[bomb_idx].astype(np.int64),
+            rn[bomb_idx],
+            tick_key[bomb_idx],
+            actor,
+            view["bombsite"][bomb_idx].astype(np.int64),
+        ], axis=1)
+        _, first = np.unique(key, axis=0, return_index=True)
+        keep[bomb_idx[first]] = True
+
+    rr_idx = pos[is_rr]
+    if rr_idx.size:
+        # last row per round after ordering by (round, tick, position)
+        order = np.lexsort((rr_idx, tick_key[rr_idx], rn[rr_idx]))
+        rr_sorted = rr_idx[order]
+        rr_rounds = rn[rr_sorted]
+        last = np.r_[rr_rounds[1:] != rr_rounds[:-1], True]
+        rr_keep = rr_sorted[last]
+    else:
+        rr_keep = rr_idx
+
+    seq = np.concatenate([pos[keep], rr_keep])
+    order = np.lexsort((np.arange(len(seq)), tick_key[seq], rn[seq]))
+    return seq[order]
@@ -1,8 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from core.database import get_db
 from core.security import require_api_key
 from models.models import Match, MatchPlayer, WeaponStat
+from models.rerate_job import RerateJob
+from models.round import Round
+from services.leaderboard_snapshots import mark_snapshots_stale
+from services.match_documents import invalidate_match_documents
+from services.player_aggregates import apply_match_aggregates
+from services.winprob_empirical import apply_match_winprob_counts
+from services.rerate import (
+    DONE,
+    QUEUED,
+    RerateJobConflict,
+    create_rerate_job,
+    requeue_rerate_job,
+    rerate_job_to_dict,
+    rerate_runner,
+)
 
 router = APIRouter(prefix="/api", tags=["admin"])
 
@@ -15,10 +32,55 @@ def delete_match(match_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Match not found")
 
     # Удаляем связанные данные
+    apply_match_aggregates(db, [match_id], -1)
+    apply_match_winprob_counts(db, [match_id], -1)
+    mark_snapshots_stale(db, [match.map])
+    invalidate_match_documents(db, [match_id])
     db.query(WeaponStat).filter(WeaponStat.match_id == match_id).delete()
+    db.query(Round).filter(Round.match_id == match_id).delete()
     db.query(MatchPlayer).filter(MatchPlayer.match_id == match_id).delete()
     db.delete(match)
 
     db.commit()
 
     return {"status": "deleted", "match_id": match_id}
+
+
+# ── Re-rating ────────────────────────────────────────────────────────────────
+
+@router.post("/rerate", status_code=202, dependencies=[Depends(require_api_key)])
+def start_rerate(
+    db: Session = Depends(get_db),
+    engine: Optional[List[str]] = Query(None, description="live and/or engine versions; default live + RATING_ENGINES"),
+):
+    """Re-rate every stored match; returns the job (or the one already active for the same engines, 409 otherwise)."""
+    try:
+        job = create_rerate_job(db, engine)
+    except RerateJobConflict as e:
+        raise HTTPException(status_code=409, detail={"error": str(e), "active_job": rerate_job_to_dict(e.active)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rerate_runner.submit(job.id)
+    return rerate_job_to_dict(job)
+
+
+@router.get("/rerate/{job_id}")
+def get_rerate_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.get(RerateJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return rerate_job_to_dict(job)
+
+
+@router.post("/rerate/{job_id}/resume", status_code=202, dependencies=[Depends(require_api_key)])
+def resume_rerate_job(job_id: int, db: Session = Depends(get_db)):
+    job = db.get(RerateJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == DONE:
+        raise HTTPException(status_code=409, detail="Job already finished")
+    if not requeue_rerate_job(db, job) and job.status != QUEUED:
+        # running with a live heartbeat: a second runner would walk the same chunks
+        raise HTTPException(status_code=409, detail={"error": "Job is running", "job": rerate_job_to_dict(job)})
+    rerate_runner.submit(job.id)
+    return rerate_job_to_dict(job)
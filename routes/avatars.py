@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from core.database import get_db
 from models.models import Player
 from services.steam_avatar import get_steam_avatar, update_player_avatar
+from services.match_documents import invalidate_player_documents
 
 router = APIRouter(prefix="/api/avatars", tags=["avatars"])
 
@@ -46,7 +47,9 @@ def sync_player_avatar(steam_id: str, db: Session = Depends(get_db)):
     avatar_url = get_steam_avatar(steam_id)
     
     if avatar_url:
-        player.avatar_url = avatar_url
+        if player.avatar_url != avatar_url:
+            player.avatar_url = avatar_url
+            invalidate_player_documents(db, [player.id])  # cached match pages show the avatar
         db.commit()
         return {"steam_id": steam_id, "avatar_url": avatar_url}
     else:
@@ -72,7 +75,9 @@ def get_player_avatar(steam_id: str, db: Session = Depends(get_db)):
     avatar_url = get_steam_avatar(steam_id)
     
     if avatar_url:
-        player.avatar_url = avatar_url
+        if player.avatar_url != avatar_url:
+            player.avatar_url = avatar_url
+            invalidate_player_documents(db, [player.id])  # cached match pages show the avatar
         db.commit()
         return {"steam_id": steam_id, "avatar_url": avatar_url}
     
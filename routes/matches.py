@@ -1,9 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import Optional
+from core.config import settings
 from core.database import get_db
-from models.models import Match, MatchPlayer, Player
-from models.round_event import RoundEvent
+from models.models import Match, Player
+from models.round import Round
+from services.match_documents import etag_matches, get_match_document, invalidate_match_documents
+from services.leaderboard_snapshots import (
+    SNAPSHOT_WINDOWS,
+    get_snapshot,
+    is_snapshot_window,
+    mark_snapshots_stale,
+    player_rank,
+    snapshot_leaderboard,
+)
+from services.player_aggregates import apply_match_aggregates
+from services.winprob_empirical import apply_match_winprob_counts
+from services.rating_engines import LIVE_ENGINE
 from analytics.leaderboard import get_leaderboard
 from analytics.weapon_stats import get_weapon_leaderboard
 
@@ -37,89 +50,49 @@ def list_matches(
 
 
 @matches_router.get("/{match_id}")
-def get_match(match_id: int, db: Session = Depends(get_db)):
-    match = db.query(Match).filter(Match.id == match_id).first()
-    if not match:
+def get_match(match_id: int, request: Request, db: Session = Depends(get_db)):
+    # pre-rendered at first read, dropped on delete / re-rate (services.match_documents)
+    doc = get_match_document(db, match_id)
+    if doc is None:
         raise HTTPException(status_code=404, detail="Match not found")
 
-    rows = (
-        db.query(MatchPlayer, Player)
-        .join(Player, Player.id == MatchPlayer.player_id)
-        .filter(MatchPlayer.match_id == match_id)
-        .order_by(MatchPlayer.impact_rating.desc())
-        .all()
-    )
+    headers = {"ETag": doc.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), doc.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=doc.body, media_type="application/json", headers=headers)
 
-    players = [
+
+@matches_router.get("/{match_id}/rounds")
+def match_rounds(match_id: int, db: Session = Depends(get_db)):
+    """Round-by-round timeline (rounds table, one range scan)."""
+    if db.get(Match, match_id) is None:
+        raise HTTPException(status_code=404, detail="Match not found")
+
+    rounds = db.query(Round).filter(Round.match_id == match_id).order_by(Round.round_number).all()
+    return [
         {
-            "steam_id": p.steam_id,
-            "nickname": p.nickname,
-            "avatar_url": p.avatar_url,
-            "team":     mp.team,
-            "K":        mp.kills,
-            "D":        mp.deaths,
-            "A":        mp.assists,
-            "ADR":      mp.adr,
-            "HS":       mp.hs_pct,
-            "FK":       mp.fk,
-            "FD":       mp.fd,
-            
-            "kast_pct": mp.kast_pct,
-            
-            # ✅ АГРЕССИВНЫЙ штраф: коэффициент 1.2
-            "swing": round(
-                (float(mp.swing or 0) * 50)
-                - ((float(mp.deaths or 0) - float(mp.kills or 0)) * 1.2),
-                2
-            ),
-            
-            "rating":   float(mp.impact_rating) if mp.impact_rating is not None else None,
+            "round":        r.round_number,
+            "winner":       r.winner_side,
+            "reason":       r.win_reason,
+            "bomb_planted": bool(r.bomb_planted),
+            "score_t":      r.score_t,
+            "score_ct":     r.score_ct,
+            "alive_t":      r.alive_t,
+            "alive_ct":     r.alive_ct,
         }
-        for mp, p in rows
+        for r in rounds
     ]
 
-    # Round winners для timeline
-    round_events = (
-        db.query(RoundEvent)
-        .filter(
-            RoundEvent.match_id == match_id,
-            RoundEvent.event_type == 'round_result'
-        )
-        .order_by(RoundEvent.round_number)
-        .all()
-    )
-    round_winners = [e.winner_side for e in round_events if e.winner_side]
-
-    # Счёт по половинам
-    halftime = 12
-    first_half = round_winners[:halftime]
-    second_half = round_winners[halftime:24]
-
-    first_half_ct = sum(1 for r in first_half if r == 'CT')
-    first_half_t = len(first_half) - first_half_ct
-    second_half_ct = sum(1 for r in second_half if r == 'CT')
-    second_half_t = len(second_half) - second_half_ct
-
-    return {
-        "id":           match.id,
-        "played_at":    match.played_at.isoformat(),
-        "map":          match.map,
-        "team1_score":  match.team1_score,
-        "team2_score":  match.team2_score,
-        "total_rounds": match.total_rounds,
-        "total_kills":  match.total_kills,
-        "players":      players,
-        "round_winners": round_winners,
-        "first_half":  {"ct": first_half_ct, "t": first_half_t},
-        "second_half": {"ct": second_half_ct, "t": second_half_t},
-    }
-
 
 @matches_router.delete("/{match_id}", dependencies=[])
 def delete_match(match_id: int, db: Session = Depends(get_db)):
     match = db.query(Match).filter(Match.id == match_id).first()
     if not match:
         raise HTTPException(status_code=404, detail="Match not found")
+    apply_match_aggregates(db, [match_id], -1)
+    apply_match_winprob_counts(db, [match_id], -1)
+    mark_snapshots_stale(db, [match.map])
+    invalidate_match_documents(db, [match_id])
     db.delete(match)
     db.commit()
     return {"deleted": match_id}
@@ -136,8 +109,40 @@ def leaderboard(
     map: Optional[str] = None,
     min_matches: int = 3,
     limit: int = 50,
+    engine: Optional[str] = Query(None, description="Версия рейтинга (live по умолчанию)"),
+):
+    # standard window, live rating, default cut-off: precomputed snapshot (services.leaderboard_snapshots)
+    if is_snapshot_window(period_days) and engine in (None, LIVE_ENGINE) and min_matches == settings.LEADERBOARD_MIN_MATCHES:
+        snap = get_snapshot(db, period_days, map)
+        return snapshot_leaderboard(db, snap, limit) if snap else []
+
+    try:
+        return get_leaderboard(db, period_days, map, min_matches, limit, engine=engine)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@leaderboard_router.get("/rank/{steam_id}")
+def leaderboard_rank(
+    steam_id: str,
+    db: Session = Depends(get_db),
+    period_days: int = Query(365, description="Период в днях: 7, 30, 90, 365 или 0 (всё время)"),
+    map: Optional[str] = None,
+    neighbours: int = Query(5, ge=0, le=50),
 ):
-    return get_leaderboard(db, period_days, map, min_matches, limit)
+    """Dense rank of a player in a leaderboard snapshot + the players around them."""
+    if not is_snapshot_window(period_days):
+        raise HTTPException(status_code=400, detail=f"period_days must be one of {', '.join(str(d) for d in SNAPSHOT_WINDOWS)}")
+
+    player = db.query(Player).filter(Player.steam_id == steam_id).first()
+    if not player:
+        raise HTTPException(status_code=404, detail="Player not found")
+
+    snap = get_snapshot(db, period_days, map)
+    result = player_rank(db, snap, player.id, neighbours) if snap else None
+    if result is None:
+        raise HTTPException(status_code=404, detail="Player not ranked")
+    return {"steam_id": steam_id, **result}
 
 
 @leaderboard_router.get("/weapons")
@@ -1,23 +1,26 @@
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 
 from core.database import get_db
 
 from models.models import Player, MatchPlayer, Match
-from analytics.player_stats import get_player_annual_stats, get_player_monthly_form
-from analytics.weapon_stats import get_player_weapon_stats
-from analytics.enhanced_player_stats import (
-    get_player_overview,
-    get_rating_progression,
-    get_map_performance,
-    get_best_and_worst_maps,
-    get_mvp_count,
-    get_weapon_preference,
-)
+from models.player_aggregate import PlayerAggregate
+from analytics.player_profile import build_player_profile, parse_sections
+from analytics.rating_source import rating_source
 
 router = APIRouter(prefix="/api/players", tags=["players"])
 
+ENGINE_QUERY = Query(None, description="Версия рейтинга (live по умолчанию)")
+
+
+def _rating_source_or_400(engine: Optional[str]):
+    try:
+        return rating_source(engine)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
 @router.get("")
 def list_players(
@@ -25,18 +28,19 @@ def list_players(
     limit: int = Query(50, le=200),
     offset: int = 0,
 ):
+    # career sums (player_aggregates): one row per player, no GROUP BY over match_players
+    avg_rating = PlayerAggregate.sum_rating / PlayerAggregate.matches
     rows = (
         db.query(
             Player,
-            func.count(MatchPlayer.id).label("matches"),
-            func.avg(MatchPlayer.impact_rating).label("rating"),
-            func.avg(MatchPlayer.kast_pct).label("kast"),
-            func.avg(MatchPlayer.swing).label("swing"),
+            PlayerAggregate.matches,
+            avg_rating.label("rating"),
+            (PlayerAggregate.sum_kast / PlayerAggregate.matches).label("kast"),
+            (PlayerAggregate.sum_swing / PlayerAggregate.matches).label("swing"),
         )
-        .join(MatchPlayer, MatchPlayer.player_id == Player.id)
-        .group_by(Player.id)
-        .having(func.count(MatchPlayer.id) > 0)
-        .order_by(func.avg(MatchPlayer.impact_rating).desc())
+        .join(PlayerAggregate, PlayerAggregate.player_id == Player.id)
+        .filter(PlayerAggregate.matches > 0)
+        .order_by(avg_rating.desc())
         .offset(offset)
         .limit(limit)
         .all()
@@ -58,7 +62,21 @@ def list_players(
 
 
 @router.get("/{player_key}")
-def get_player(player_key: str, db: Session = Depends(get_db)):
+def get_player(
+    player_key: str,
+    db: Session = Depends(get_db),
+    engine: Optional[str] = ENGINE_QUERY,
+    sections: Optional[str] = Query(
+        None,
+        description="Секции через запятую (header, overview, rating_progression, map_performance, best_worst, "
+                    "mvp_count, favorite_weapon, annual, monthly_form, weapons); по умолчанию все",
+    ),
+):
+    _rating_source_or_400(engine)
+    try:
+        wanted = parse_sections(sections)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     # 🔍 сначала пробуем найти по steam_id
     player = db.query(Player).filter(Player.steam_id == player_key).first()
@@ -70,37 +88,8 @@ def get_player(player_key: str, db: Session = Depends(get_db)):
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
 
-    # Enhanced statistics
-    overview = get_player_overview(db, player.id)
-    rating_progress = get_rating_progression(db, player.id, limit=50)
-    map_performance = get_map_performance(db, player.id)
-    best_worst = get_best_and_worst_maps(db, player.id)
-    mvp_count = get_mvp_count(db, player.id)
-    fav_weapon = get_weapon_preference(db, player.id)
-
-    # Legacy stats
-    annual = get_player_annual_stats(db, player.id)
-    monthly = get_player_monthly_form(db, player.id)
-    weapons = get_player_weapon_stats(db, player.id)
-
-    return {
-        "id": player.id,
-        "steam_id": player.steam_id,
-        "nickname": player.nickname,
-        "avatar_url": player.avatar_url,  # ← ДОБАВЛЕНО
-
-        "overview": overview,
-        "rating_progression": rating_progress,
-        "map_performance": map_performance,
-        "best_map": best_worst.get("best_map"),
-        "worst_map": best_worst.get("worst_map"),
-        "mvp_count": mvp_count,
-        "favorite_weapon": fav_weapon,
-
-        "annual": annual,
-        "monthly_form": monthly,
-        "weapons": weapons,
-    }
+    # one load of the player's match rows, every section computed from it
+    return build_player_profile(db, player, engine=engine, sections=wanted)
 
 
 @router.get("/{player_key}/matches")
@@ -109,7 +98,9 @@ def player_matches(
     db: Session = Depends(get_db),
     limit: int = Query(20, le=100),
     offset: int = 0,
+    engine: Optional[str] = ENGINE_QUERY,
 ):
+    src = _rating_source_or_400(engine)
 
     # 🔍 ищем игрока
     player = db.query(Player).filter(Player.steam_id == player_key).first()
@@ -121,8 +112,10 @@ def player_matches(
         raise HTTPException(status_code=404, detail="Player not found")
 
     rows = (
-        db.query(MatchPlayer, Match)
-        .join(Match, Match.id == MatchPlayer.match_id)
+        src.join(
+            db.query(MatchPlayer, Match, src.rating, src.kast, src.swing)
+            .join(Match, Match.id == MatchPlayer.match_id)
+        )
         .filter(MatchPlayer.player_id == player.id)
         .order_by(Match.played_at.desc())
         .offset(offset)
@@ -143,15 +136,15 @@ def player_matches(
             "HS": mp.hs_pct,
             "FK": mp.fk,
 
-            "kast_pct": mp.kast_pct,
+            "kast_pct": kast,
 
             "swing": round(
-                (float(mp.swing or 0) * 50)
+                (float(swing or 0) * 50)
                 - ((float(mp.deaths or 0) - float(mp.kills or 0)) * 1.2),
                 2
             ),
 
-            "rating": float(mp.impact_rating) if mp.impact_rating is not None else None,
+            "rating": float(rating) if rating is not None else None,
         }
-        for mp, match in rows
+        for mp, match, rating, kast, swing in rows
     ]
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func
 from core.database import get_db
 from models.models import WeaponStat, Player
+from analytics.weapon_stats import weapon_top_players
 
 router = APIRouter(prefix="/api", tags=["weapons"])
 
@@ -12,56 +13,26 @@ router = APIRouter(prefix="/api", tags=["weapons"])
 # ==============================
 @router.get("/weapons")
 def get_weapons(db: Session = Depends(get_db)):
-    stats = (
-        db.query(
-            WeaponStat.weapon,
-            func.sum(WeaponStat.kills).label("kills"),
-            func.sum(WeaponStat.headshots).label("headshots"),
-            func.sum(WeaponStat.damage).label("damage"),
-        )
-        .group_by(WeaponStat.weapon)
-        .order_by(func.sum(WeaponStat.kills).desc())
-        .all()
-    )
-
     result = []
 
-    for w in stats:
-        kills = w.kills or 0
-        headshots = w.headshots or 0
-        damage = w.damage or 0
-
-        # ✅ НОВОЕ: Находим лучшего игрока для этого оружия
-        top_player_query = (
-            db.query(
-                Player.nickname,
-                Player.steam_id,
-                func.sum(WeaponStat.kills).label("player_kills")
-            )
-            .join(Player, Player.id == WeaponStat.player_id)
-            .filter(WeaponStat.weapon == w.weapon)
-            .group_by(Player.id)
-            .order_by(func.sum(WeaponStat.kills).desc())
-            .first()
-        )
+    # ✅ Лучший игрок для каждого оружия — одним запросом вместе с тоталами (ROW_NUMBER по оружию)
+    for w in weapon_top_players(db, top_n=1):
+        kills = w["total_kills"]
+        headshots = w["total_hs"]
+        damage = w["total_damage"]
 
-        # Если нашли топ игрока
-        top_player = None
-        top_player_steamid = None
-        if top_player_query:
-            top_player = top_player_query.nickname
-            top_player_steamid = top_player_query.steam_id
+        top = w["top_players"][0] if w["top_players"] else None
 
         result.append({
-            "weapon": w.weapon,
+            "weapon": w["weapon"],
             "total_kills": kills,
             "hs_pct": round((headshots / kills * 100), 1) if kills > 0 else 0,
             "avg_damage_per_kill": round((damage / kills), 1) if kills > 0 else 0,
             "usage_count": kills,
             
             # ✅ НОВОЕ: Добавили MVP колонку
-            "top_player": top_player,
-            "top_player_steamid": top_player_steamid,
+            "top_player": top["nickname"] if top else None,
+            "top_player_steamid": top["steam_id"] if top else None,
         })
 
     return result
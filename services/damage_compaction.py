@@ -0,0 +1,178 @@
+# services/damage_compaction.py
+"""
+Compacted damage rows for round_events.
+
+The analyzer emits a `damage` event for every player_hurt, so damage is most
+of round_events, while the rating only reads it as a per-attacker sum (ADR)
+plus "took part in the round". Compaction keeps one row per
+(round, attacker, victim):
+
+    hits       number of player_hurt hits
+    damage     total capped damage (the analyzer caps at 100 per pair per round)
+    tick       first hit, last_tick = last hit
+    context    alive counts / sides / score / eco of the first hit,
+               weapon only if every hit used the same one, headshot if any hit was
+
+Hit damage is whole HP, so the per-attacker sum is exact in any grouping and
+both rating engines give identical ADR / ratings from either form.
+
+Compaction is opt-in (DAMAGE_EVENTS=compact) and only runs with cold storage
+configured, so the per-hit stream is never dropped: settings.DAMAGE_COLD_DIR,
+<dir>/<match_id>.jsonl.gz with one EventRow per line.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from models.round_event import RoundEvent
+from services.event_loader import EVENT_COLUMNS, EventRow, load_round_events
+
+
+DAMAGE_COMPACT = "compact"
+DAMAGE_FULL = "full"
+
+
+def compact_damage(rows: List[EventRow]) -> List[EventRow]:
+    """
+    One damage row per (round_number, attacker_id, victim_id), at the position of its first hit;
+    every other event passes through. Rows must be in (round, tick) order, as build_event_rows
+    returns them. Already compacted rows merge too (hits add up), so it is idempotent.
+    """
+    out: List[EventRow] = []
+    # key -> [index in out, hits, damage, last_tick, weapon, headshot]
+    acc: Dict[Tuple, list] = {}
+
+    for r in rows:
+        if r.event_type != "damage":
+            out.append(r)
+            continue
+
+        hits = r.hits or 1
+        last = r.last_tick if r.last_tick is not None else r.tick
+        key = (r.round_number, r.attacker_id, r.victim_id)
+        a = acc.get(key)
+        if a is None:
+            acc[key] = [len(out), hits, r.damage or 0.0, last, r.weapon, r.is_headshot]
+            out.append(r)
+            continue
+
+        a[1] += hits
+        a[2] += r.damage or 0.0
+        if last is not None:
+            a[3] = last
+        if a[4] != r.weapon:
+            a[4] = ""
+        a[5] = a[5] or r.is_headshot
+
+    for i, hits, damage, last, weapon, headshot in acc.values():
+        out[i] = out[i]._replace(hits=hits, damage=damage, last_tick=last, weapon=weapon, is_headshot=headshot)
+    return out
+
+
+def check_damage_settings() -> str:
+    """settings.DAMAGE_EVENTS, validated: compact needs DAMAGE_COLD_DIR (the per-hit rows go there)."""
+    mode = settings.DAMAGE_EVENTS
+    if mode not in (DAMAGE_COMPACT, DAMAGE_FULL):
+        raise ValueError(f"DAMAGE_EVENTS must be '{DAMAGE_COMPACT}' or '{DAMAGE_FULL}', got '{mode}'")
+    if mode == DAMAGE_COMPACT and not settings.DAMAGE_COLD_DIR:
+        raise ValueError("DAMAGE_EVENTS=compact needs DAMAGE_COLD_DIR for the per-hit damage rows")
+    return mode
+
+
+def store_damage_rows(match_id: int, rows: List[EventRow]) -> List[EventRow]:
+    """
+    The rows round_events gets for this match under settings.DAMAGE_EVENTS.
+    When compacting, the per-hit damage rows go to cold storage first.
+    """
+    if check_damage_settings() == DAMAGE_FULL:
+        return rows
+
+    write_damage_hits(match_id, [r for r in rows if r.event_type == "damage" and not r.hits])
+    return compact_damage(rows)
+
+
+# ============================================================
+# Cold storage of the per-hit stream
+# ============================================================
+
+def _cold_path(match_id: int) -> str:
+    return os.path.join(settings.DAMAGE_COLD_DIR, f"{match_id}.jsonl.gz")
+
+
+def write_damage_hits(match_id: int, rows: List[EventRow]) -> None:
+    if not rows:
+        return
+    os.makedirs(settings.DAMAGE_COLD_DIR, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=settings.DAMAGE_COLD_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            for r in rows:
+                f.write(json.dumps(r._asdict(), ensure_ascii=False).encode("utf-8"))
+                f.write(b"\n")
+        os.replace(tmp, _cold_path(match_id))
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def read_damage_hits(match_id: int) -> Optional[List[EventRow]]:
+    """Per-hit damage rows of a match from cold storage, None if not kept."""
+    if not settings.DAMAGE_COLD_DIR:
+        return None
+    try:
+        with gzip.open(_cold_path(match_id), "rt", encoding="utf-8") as f:
+            return [EventRow(**json.loads(line)) for line in f]
+    except FileNotFoundError:
+        return None
+
+
+# ============================================================
+# Stored matches
+# ============================================================
+
+def compact_stored_damage(db: Session) -> int:
+    """
+    One-off: compact the per-hit damage rows of matches ingested before compaction
+    (or with DAMAGE_EVENTS=full), keeping them in DAMAGE_COLD_DIR. Commits per match; returns rows removed.
+    """
+    if not settings.DAMAGE_COLD_DIR:
+        raise ValueError("damage compaction needs DAMAGE_COLD_DIR for the per-hit damage rows")
+
+    pending = db.execute(
+        select(RoundEvent.match_id)
+        .where(RoundEvent.event_type == "damage", RoundEvent.hits.is_(None))
+        .distinct()
+        .order_by(RoundEvent.match_id)
+    ).scalars().all()
+
+    cols = [getattr(RoundEvent, c) for c in EVENT_COLUMNS]
+    removed = 0
+    for match_id in pending:
+        stored = db.execute(
+            select(RoundEvent.id, *cols)
+            .where(RoundEvent.match_id == match_id, RoundEvent.event_type == "damage")
+            .order_by(RoundEvent.round_number, RoundEvent.tick, RoundEvent.id)
+        ).all()
+        ids = [r[0] for r in stored]
+        hits = [EventRow(*r[1:]) for r in stored]
+
+        write_damage_hits(match_id, [r for r in hits if not r.hits])
+        compacted = compact_damage(hits)
+
+        for i in range(0, len(ids), 5000):
+            db.query(RoundEvent).filter(RoundEvent.id.in_(ids[i:i + 5000])).delete(synchronize_session=False)
+        load_round_events(db, compacted)
+        db.commit()
+        removed += len(hits) - len(compacted)
+
+    print(f"damage compacted: {len(pending)} matches, {removed} rows removed")
+    return removed
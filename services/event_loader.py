@@ -0,0 +1,362 @@
+# services/event_loader.py
+"""
+Bulk loader for round_events.
+
+Parser events (RoundEventBuffer or legacy dicts) are deduped and turned into
+plain EventRow tuples, then written without building ORM objects:
+COPY ... FROM STDIN on PostgreSQL (psycopg2), a Core executemany INSERT elsewhere.
+The same rows feed the rating engine, which only reads attributes.
+"""
+import io
+from collections import namedtuple
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import String, cast, select, update
+from sqlalchemy.orm import Session
+
+from models.models import Player
+from models.round_event import RoundEvent
+from parser.event_buffer import (
+    EVENT_TYPES,
+    NO_ID,
+    NO_TICK,
+    SIDES,
+    RoundEventBuffer,
+    dedupe_order,
+)
+
+
+# round_events columns in COPY / INSERT order (everything but the serial id)
+EVENT_COLUMNS = (
+    "match_id",
+    "map_name",
+    "round_number",
+    "tick",
+    "event_type",
+    "attacker_id",
+    "victim_id",
+    "attacker_side",
+    "victim_side",
+    "weapon",
+    "is_headshot",
+    "damage",
+    "alive_t",
+    "alive_ct",
+    "eco_t",
+    "eco_ct",
+    "score_t",
+    "score_ct",
+    "planter_id",
+    "defuser_id",
+    "bombsite",
+    "has_defuse_kit",
+    "time_in_round",
+    "winner_side",
+    "win_reason",
+    "bomb_planted",
+    # damage rows compacted per (round, attacker, victim): hit count and last hit tick
+    # (tick = first hit); both None on per-hit rows and on every other event type
+    "hits",
+    "last_tick",
+)
+
+EventRow = namedtuple("EventRow", EVENT_COLUMNS, defaults=(None, None))
+
+
+# ============================================================
+# Dedupe helpers
+# ============================================================
+
+def _safe_int(x, default: Optional[int] = None) -> Optional[int]:
+    try:
+        if x is None:
+            return default
+        return int(x)
+    except Exception:
+        return default
+
+
+def _safe_float(x, default: float = 0.0) -> float:
+    try:
+        if x is None:
+            return default
+        return float(x)
+    except Exception:
+        return default
+
+
+def _norm_event_type(t: Optional[str]) -> str:
+    t0 = (t or "").strip().lower()
+    if t0 in ("round_end", "round_result"):
+        return "round_result"
+    return t0
+
+
+def _tick_sort_key(tick: Any) -> int:
+    ti = _safe_int(tick, None)
+    return ti if ti is not None else 10**12
+
+
+def _dedupe_round_events(events: Iterable[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+    # columnar buffer from the analyzer: dedupe on the numpy view, materialize rows lazily
+    if isinstance(events, RoundEventBuffer):
+        view = events.view()
+        return view.records(dedupe_order(view))
+
+    round_result_by_round: Dict[int, Dict[str, Any]] = {}
+    seen_bomb: set = set()
+    out: List[Dict[str, Any]] = []
+
+    for e in events:
+        et = _norm_event_type(e.get("event_type"))
+        rn = _safe_int(e.get("round_number"), None)
+        if rn is None:
+            continue
+
+        e = dict(e)
+        e["event_type"] = et
+
+        if et == "round_result":
+            prev = round_result_by_round.get(rn)
+            if prev is None:
+                round_result_by_round[rn] = e
+            else:
+                if _tick_sort_key(e.get("tick")) >= _tick_sort_key(prev.get("tick")):
+                    round_result_by_round[rn] = e
+            continue
+
+        if et in ("bomb_planted", "bomb_defused", "bomb_exploded"):
+            key = (
+                et,
+                rn,
+                _tick_sort_key(e.get("tick")),
+                str(e.get("planter_id") or e.get("defuser_id") or ""),
+                str(e.get("bombsite") or ""),
+            )
+            if key in seen_bomb:
+                continue
+            seen_bomb.add(key)
+            out.append(e)
+            continue
+
+        out.append(e)
+
+    for _rn, e in round_result_by_round.items():
+        out.append(e)
+
+    out.sort(key=lambda x: (_safe_int(x.get("round_number"), 0), _tick_sort_key(x.get("tick"))))
+    return out
+
+
+# ============================================================
+# Parser events -> EventRow
+# ============================================================
+
+def build_event_rows(
+    events: Iterable[Dict[str, Any]],
+    match_id: int,
+    map_name: Optional[str],
+    steam_to_pid: Dict[str, int],
+) -> List[EventRow]:
+    """
+    Dedupe once and map steamids to players.id. attacker/victim/planter/defuser
+    without a known player become None.
+    """
+    if isinstance(events, RoundEventBuffer):
+        return _rows_from_buffer(events, match_id, map_name, steam_to_pid)
+
+    def pid(steam_id: Any) -> Optional[int]:
+        return steam_to_pid.get(str(steam_id)) if steam_id else None
+
+    return [
+        EventRow(
+            match_id=match_id,
+            map_name=map_name,
+            round_number=_safe_int(e.get("round_number"), 0),
+            tick=_safe_int(e.get("tick"), None),
+            event_type=_norm_event_type(e.get("event_type")),
+            attacker_id=pid(e.get("attacker_id")),
+            victim_id=pid(e.get("victim_id")),
+            attacker_side=e.get("attacker_side"),
+            victim_side=e.get("victim_side"),
+            weapon=(e.get("weapon") or ""),
+            is_headshot=bool(e.get("headshot", False)),
+            damage=_safe_float(e.get("damage", 0.0), 0.0),
+            alive_t=_safe_int(e.get("alive_t"), None),
+            alive_ct=_safe_int(e.get("alive_ct"), None),
+            eco_t=bool(e.get("eco_t", False)),
+            eco_ct=bool(e.get("eco_ct", False)),
+            score_t=_safe_int(e.get("score_t"), 0),
+            score_ct=_safe_int(e.get("score_ct"), 0),
+            # planter/defuser are player ids like attacker/victim. Deliberate rating change:
+            # the old upload path stored the raw steamid here, which never matched a player,
+            # so bomb plant/defuse swing went to nobody. Older matches: remap_stored_bomb_actors,
+            # then re-rate (make bomb-actors-backfill && make rerate).
+            planter_id=pid(e.get("planter_id")),
+            defuser_id=pid(e.get("defuser_id")),
+            bombsite=e.get("bombsite"),
+            has_defuse_kit=bool(e.get("has_defuse_kit", False)),
+            time_in_round=e.get("time_in_round"),
+            winner_side=e.get("winner_side"),
+            win_reason=e.get("win_reason"),
+            bomb_planted=bool(e.get("bomb_planted") or False),
+        )
+        for e in _dedupe_round_events(events)
+    ]
+
+
+def _rows_from_buffer(
+    buf: RoundEventBuffer,
+    match_id: int,
+    map_name: Optional[str],
+    steam_to_pid: Dict[str, int],
+) -> List[EventRow]:
+    """Columnar fast path: gather the kept rows per column, translate codes with lookup arrays, zip."""
+    view = buf.view()
+    idx = dedupe_order(view)
+    n = len(idx)
+    if n == 0:
+        return []
+
+    cols = {name: col[idx] for name, col in view.columns.items()}
+
+    # interned steamid index -> players.id (None for unknown / NO_ID, which lands on the extra last slot)
+    pid_lut = [steam_to_pid.get(sid) for sid in view.steamids] + [None]
+
+    def ids(name: str) -> List[Optional[int]]:
+        codes = cols[name].astype(np.intp)
+        codes[codes == NO_ID] = len(pid_lut) - 1
+        return [pid_lut[c] for c in codes.tolist()]
+
+    def lookup(name: str, table) -> List[Optional[str]]:
+        tbl = list(table) + [None]
+        codes = cols[name].astype(np.intp)
+        codes[codes == NO_ID] = len(tbl) - 1
+        return [tbl[c] for c in codes.tolist()]
+
+    weapons = list(view.weapons)
+
+    return [
+        EventRow(*r)
+        for r in zip(
+            [match_id] * n,
+            [map_name] * n,
+            cols["round_number"].tolist(),
+            [None if t == NO_TICK else t for t in cols["tick"].tolist()],
+            [EVENT_TYPES[c] for c in cols["event_type"].tolist()],
+            ids("attacker_id"),
+            ids("victim_id"),
+            [SIDES[c] for c in cols["attacker_side"].tolist()],
+            [SIDES[c] for c in cols["victim_side"].tolist()],
+            [weapons[c] or "" for c in cols["weapon"].tolist()],
+            cols["headshot"].astype(bool).tolist(),
+            cols["damage"].tolist(),
+            cols["alive_t"].tolist(),
+            cols["alive_ct"].tolist(),
+            cols["eco_t"].astype(bool).tolist(),
+            cols["eco_ct"].astype(bool).tolist(),
+            cols["score_t"].tolist(),
+            cols["score_ct"].tolist(),
+            ids("planter_id"),
+            ids("defuser_id"),
+            lookup("bombsite", view.bombsites),
+            cols["has_defuse_kit"].astype(bool).tolist(),
+            [None if v != v else v for v in cols["time_in_round"].tolist()],  # NaN -> None
+            [SIDES[c] for c in cols["winner_side"].tolist()],
+            lookup("win_reason", view.win_reasons),
+            (cols["bomb_planted"] > 0).tolist(),  # BOMB_PLANTED_NONE / 0 -> False
+        )
+    ]
+
+
+# Stored steamids are 17-digit numbers, player ids never get this large
+_STEAMID_MIN = 2 ** 31
+
+
+def remap_stored_bomb_actors(db: Session) -> int:
+    """
+    One-off for matches stored by the old upload path, which kept raw steamids in
+    planter_id/defuser_id. Maps them to players.id (None when the steamid has no
+    player) and commits; returns rows changed. Re-rate afterwards so the stored
+    ratings pick up the bomb swing.
+    """
+    changed = 0
+    for col in (RoundEvent.planter_id, RoundEvent.defuser_id):
+        player_id = (
+            select(Player.id)
+            .where(Player.steam_id == cast(col, String))
+            .scalar_subquery()
+        )
+        res = db.execute(
+            update(RoundEvent)
+            .where(col >= _STEAMID_MIN)
+            .values({col.key: player_id})
+            .execution_options(synchronize_session=False)
+        )
+        changed += res.rowcount
+    db.commit()
+    print(f"bomb actors remapped: {changed} round_events rows")
+    return changed
+
+
+# ============================================================
+# Writers
+# ============================================================
+
+def load_round_events(db: Session, rows: List[EventRow]) -> int:
+    """Write rows inside the session's transaction. Returns the row count."""
+    if not rows:
+        return 0
+
+    if db.get_bind().dialect.name == "postgresql" and _copy_rows(db, rows):
+        return len(rows)
+
+    # Core executemany; the dicts are only the bind parameters, no ORM state
+    db.execute(RoundEvent.__table__.insert(), [r._asdict() for r in rows])
+    return len(rows)
+
+
+def _copy_rows(db: Session, rows: List[EventRow]) -> bool:
+    """COPY FROM STDIN through the session's own connection. False if the driver has no copy_expert."""
+    dbapi_conn = db.connection().connection.dbapi_connection
+    cursor = dbapi_conn.cursor()
+    try:
+        if not hasattr(cursor, "copy_expert"):
+            return False
+
+        buf = io.StringIO()
+        write = buf.write
+        for r in rows:
+            write("\t".join(map(_copy_value, r)))
+            write("\n")
+        buf.seek(0)
+
+        cursor.copy_expert(
+            f"COPY {RoundEvent.__tablename__} ({', '.join(EVENT_COLUMNS)}) FROM STDIN",
+            buf,
+        )
+        return True
+    finally:
+        cursor.close()
+
+
+def _copy_value(v: Any) -> str:
+    """One field in COPY text format."""
+    if v is None:
+        return "\\N"
+    if v is True:
+        return "t"
+    if v is False:
+        return "f"
+    if isinstance(v, float):
+        return repr(v)
+    if isinstance(v, int):
+        return str(v)
+    return (
+        str(v)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
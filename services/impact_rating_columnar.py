@@ -0,0 +1,393 @@
+# services/impact_rating_columnar.py
+"""
+NumPy backend for compute_impact_breakdown_v3.
+
+Same PlayerStats as impact_rating_v3._compute_raw, computed with grouped array
+reductions instead of per-event getattr loops:
+
+- events are sorted once (np.lexsort is stable, like sorted());
+- per-player sums use np.bincount, which accumulates in array order, so float
+  sums match the reference += loop bit for bit;
+- per-round sets (played / dead / KAST) are (round, player) pair codes;
+- trades: first matching kill in the [tick, tick + window] slice of the same round,
+  found with one searchsorted over (round, victim, side, position) codes.
+
+Columns (all 1-D, same length; missing ids are NO_ID):
+    round_number, tick, event_type (EV_* codes), event_order (rank of the raw
+    event_type string, the reference sort tie-breaker), attacker_id, victim_id,
+    planter_id, defuser_id, attacker_side / victim_side (SIDE_* codes),
+    alive_t, alive_ct, damage.
+Optional round context for the win-probability model (defaults when absent):
+    score_t, score_ct, bomb_planted, time_in_round (NaN = missing), eco_t / eco_ct (ECO_* codes).
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+from core.config import settings
+from services.event_loader import EVENT_COLUMNS
+from services.impact_rating_v3 import (
+    PlayerStats,
+    _norm_side,
+    _safe_float,
+    _safe_int,
+    _trade_window_ticks,
+    breakdown_from_stats,
+)
+from services.win_probability import ECO_UNKNOWN, WinProbBatch, get_model
+
+
+EV_KILL, EV_ASSIST, EV_DAMAGE, EV_BOMB_PLANTED, EV_BOMB_DEFUSED, EV_BOMB_EXPLODED, EV_OTHER = range(7)
+EVENT_CODES = {
+    "kill": EV_KILL,
+    "assist": EV_ASSIST,
+    "damage": EV_DAMAGE,
+    "bomb_planted": EV_BOMB_PLANTED,
+    "bomb_defused": EV_BOMB_DEFUSED,
+    "bomb_exploded": EV_BOMB_EXPLODED,
+}
+
+SIDE_NONE, SIDE_T, SIDE_CT = 0, 1, 2
+SIDE_CODES = {None: SIDE_NONE, "T": SIDE_T, "CT": SIDE_CT}
+
+NO_ID = -1
+
+# bomb event code -> swing credited to the actor (impact_rating_v3._bomb_swing)
+_BOMB_SWING = np.zeros(7, dtype=np.float64)
+_BOMB_SWING[EV_BOMB_PLANTED] = 0.12
+_BOMB_SWING[EV_BOMB_DEFUSED] = 0.18
+_BOMB_SWING[EV_BOMB_EXPLODED] = 0.10
+
+_TICK_BITS = 40  # (round << 40) + tick keeps (round, tick) ordered in one int64
+
+
+# =========================================================
+# INPUT
+# =========================================================
+
+def event_columns(events: Iterable[Any]) -> Dict[str, np.ndarray]:
+    """
+    Objects with RoundEvent attributes (ORM rows, EventRow, engine Event) -> columns.
+    Applies the same coercions the reference engine does on every access.
+    """
+    events = list(events)
+
+    def values(name: str, default: Any = None) -> Sequence[Any]:
+        return [getattr(e, name, default) for e in events]
+
+    return _columns(values, len(events))
+
+
+def row_columns(rows: Sequence[tuple]) -> Dict[str, np.ndarray]:
+    """
+    Plain tuples in EVENT_COLUMNS order (fetched round_events rows, EventRow) -> columns.
+    Same result as event_columns, but one zip(*rows) transpose instead of a getattr per field.
+    """
+    if not rows:
+        return _columns(lambda name, default=None: (), 0)
+    by_name = dict(zip(EVENT_COLUMNS, zip(*rows)))
+    return _columns(lambda name, default=None: by_name[name], len(rows))
+
+
+def _coded(raw: Sequence[Any], fn: Callable[[Any], Any], dtype) -> np.ndarray:
+    """fn applied once per distinct value, then one C-level map over the column."""
+    lut = {x: fn(x) for x in set(raw)}
+    try:
+        return np.fromiter(map(lut.__getitem__, raw), dtype=dtype, count=len(raw))
+    except KeyError:  # NaN keys never match themselves
+        return np.asarray([fn(x) for x in raw], dtype=dtype)
+
+
+_INT = {int}
+_INT_OR_NONE = {int, type(None)}
+_NUMBER = {int, float}
+_NUMBER_OR_NONE = {int, float, type(None)}
+
+
+def _columns(values: Callable[..., Sequence[Any]], n: int) -> Dict[str, np.ndarray]:
+    """
+    Column at a time: a plain int / float column converts in one np.asarray call,
+    anything odd (strings, bools) goes through _safe_int / _safe_float like the reference.
+    """
+    def ints(name: str, default: int, missing: int) -> np.ndarray:
+        raw = values(name, default)
+        types = set(map(type, raw))
+        try:
+            if types <= _INT:
+                return np.asarray(raw, dtype=np.int64)
+            if types <= _INT_OR_NONE:
+                return np.asarray([missing if x is None else x for x in raw], dtype=np.int64)
+        except OverflowError:
+            pass
+        return np.asarray([missing if x is None else _safe_int(x, default) for x in raw], dtype=np.int64)
+
+    def floats(name: str, default: float, missing_ok: bool) -> np.ndarray:
+        # np.asarray turns None into NaN, which is only the reference result when default is NaN
+        raw = values(name, default)
+        if set(map(type, raw)) <= (_NUMBER_OR_NONE if missing_ok else _NUMBER):
+            return np.asarray(raw, dtype=np.float64)
+        return np.asarray([_safe_float(x, default) for x in raw], dtype=np.float64)
+
+    def sides(name: str) -> np.ndarray:
+        return _coded(values(name), lambda x: SIDE_CODES[_norm_side(x)], np.int8)
+
+    def eco(name: str) -> np.ndarray:
+        return _coded(values(name), lambda x: ECO_UNKNOWN if x is None else int(bool(x)), np.int8)
+
+    raw_types = values("event_type", "")
+    sort_names = {x: str(x or "") for x in set(raw_types)}
+    ranks = {name: i for i, name in enumerate(sorted(set(sort_names.values())))}
+
+    return {
+        "round_number": ints("round_number", 0, 0),
+        "tick": ints("tick", 0, 0),
+        "event_type": _coded(raw_types, lambda x: EVENT_CODES.get(str(x).lower(), EV_OTHER), np.int8),
+        "event_order": _coded(raw_types, lambda x: ranks[sort_names[x]], np.int32),
+        "attacker_id": ints("attacker_id", 0, NO_ID),
+        "victim_id": ints("victim_id", 0, NO_ID),
+        "planter_id": ints("planter_id", 0, NO_ID),
+        "defuser_id": ints("defuser_id", 0, NO_ID),
+        "attacker_side": sides("attacker_side"),
+        "victim_side": sides("victim_side"),
+        "alive_t": ints("alive_t", 5, 5),
+        "alive_ct": ints("alive_ct", 5, 5),
+        "damage": floats("damage", 0.0, missing_ok=False),
+        # round context, only read by the win-probability model
+        "score_t": ints("score_t", 0, 0),
+        "score_ct": ints("score_ct", 0, 0),
+        "bomb_planted": _coded(values("bomb_planted", False), bool, bool),
+        "time_in_round": floats("time_in_round", np.nan, missing_ok=True),
+        "eco_t": eco("eco_t"),
+        "eco_ct": eco("eco_ct"),
+    }
+
+
+# =========================================================
+# ENGINE
+# =========================================================
+
+def compute_impact_breakdown_columnar(
+    events=None,
+    total_rounds=None,
+    columns=None,
+    winprob_model: Optional[str] = None,
+) -> Dict[int, Dict[str, float]]:
+    """Drop-in for compute_impact_breakdown_v3: pass event objects or prebuilt columns."""
+    if columns is None:
+        if not events:
+            return {}
+        columns = event_columns(events)
+
+    if len(columns["round_number"]) == 0:
+        return {}
+
+    if total_rounds is None:
+        rounds = np.unique(columns["round_number"])
+        total_rounds = max(int(np.count_nonzero(rounds != 0)), 1)
+
+    return breakdown_from_stats(compute_raw_columnar(columns, winprob_model), total_rounds)
+
+
+def _kill_swings(c: Dict[str, np.ndarray], m: np.ndarray, winprob_model: Optional[str] = None) -> np.ndarray:
+    """Vectorized impact_rating_v3._kill_swings over the kills selected by mask m (one model batch)."""
+    attacker_side = c["attacker_side"][m]
+    victim_side = c["victim_side"][m]
+    n = len(attacker_side)
+
+    t_after = np.clip(c["alive_t"][m], 1, 5)
+    ct_after = np.clip(c["alive_ct"][m], 1, 5)
+    victim_t = victim_side == SIDE_T
+    t_before = np.where(victim_t, np.minimum(t_after + 1, 5), t_after)
+    ct_before = np.where(victim_t, ct_after, np.minimum(ct_after + 1, 5))
+
+    def twice(name: str, default, dtype) -> np.ndarray:
+        col = c.get(name)
+        col = np.full(n, default, dtype=dtype) if col is None else col[m].astype(dtype)
+        return np.concatenate([col, col])
+
+    batch = WinProbBatch(
+        alive_t=np.concatenate([t_before, t_after]),
+        alive_ct=np.concatenate([ct_before, ct_after]),
+        score_t=twice("score_t", 0, np.int64),
+        score_ct=twice("score_ct", 0, np.int64),
+        bomb_planted=twice("bomb_planted", False, bool),
+        time_in_round=twice("time_in_round", np.nan, np.float64),
+        tick=np.concatenate([c["tick"][m], c["tick"][m]]).astype(np.float64),
+        eco_t=twice("eco_t", ECO_UNKNOWN, np.int8),
+        eco_ct=twice("eco_ct", ECO_UNKNOWN, np.int8),
+    )
+    p_t, p_ct = get_model(winprob_model or settings.RATING_WINPROB_MODEL).predict_sides(batch)
+
+    p = np.where(attacker_side == SIDE_CT, p_ct[n:] - p_ct[:n], p_t[n:] - p_t[:n])
+    return np.where((attacker_side == SIDE_NONE) | (victim_side == SIDE_NONE), 0.0, p)
+
+
+def compute_raw_columnar(columns: Dict[str, np.ndarray], winprob_model: Optional[str] = None) -> Dict[int, PlayerStats]:
+    """Columnar twin of impact_rating_v3._compute_raw."""
+    order = np.lexsort((columns["event_order"], columns["tick"], columns["round_number"]))
+    c = {name: np.asarray(col)[order] for name, col in columns.items()}
+
+    et = c["event_type"]
+    rn = c["round_number"].astype(np.int64)
+    tick = c["tick"].astype(np.int64)
+    att = c["attacker_id"].astype(np.int64)
+    vic = c["victim_id"].astype(np.int64)
+
+    # dense player index over every id that occurs
+    ids = np.concatenate([att, vic, c["planter_id"], c["defuser_id"]]).astype(np.int64)
+    pids = np.unique(ids[ids != NO_ID])
+    n_players = len(pids)
+    if n_players == 0:
+        return {}
+
+    def dense(x: np.ndarray) -> np.ndarray:
+        return np.searchsorted(pids, x)
+
+    def per_player(idx: np.ndarray, weights=None) -> np.ndarray:
+        return np.bincount(dense(idx), weights=weights, minlength=n_players)
+
+    touched = np.zeros(n_players, dtype=bool)
+
+    def touch(idx: np.ndarray) -> None:
+        touched[dense(idx)] = True
+
+    is_kill = et == EV_KILL
+    is_assist = et == EV_ASSIST
+
+    # ---------------- raw counters (every round, event order) ----------------
+    m = is_kill & (att > 0)
+    kills = per_player(att[m])
+    swing_sum = per_player(att[m], _kill_swings(c, m, winprob_model))
+    touch(att[m])
+
+    m = is_kill & (vic > 0)
+    deaths = per_player(vic[m])
+    touch(vic[m])
+
+    m = is_assist & (att > 0)
+    assists = per_player(att[m])
+    touch(att[m])
+
+    m = (et == EV_DAMAGE) & (att > 0)
+    damage_given = per_player(att[m], c["damage"][m])
+    touch(att[m])
+
+    is_bomb = (et == EV_BOMB_PLANTED) | (et == EV_BOMB_DEFUSED) | (et == EV_BOMB_EXPLODED)
+    actor = np.where(att != NO_ID, att, np.where(c["planter_id"] != NO_ID, c["planter_id"], c["defuser_id"]))
+    m = is_bomb & (actor > 0)
+    bomb_swing_sum = per_player(actor[m], _BOMB_SWING[et[m]])
+    touch(actor[m])
+
+    # ---------------- round features (rounds > 0) ----------------
+    in_round = rn > 0
+    rounds_u, r_dense = np.unique(rn, return_inverse=True)
+    r_dense = r_dense.reshape(-1)
+
+    def pair(r_idx: np.ndarray, p: np.ndarray) -> np.ndarray:
+        return r_idx.astype(np.int64) * n_players + dense(p)
+
+    def pair_player(codes: np.ndarray) -> np.ndarray:
+        return codes % n_players
+
+    # players_here: any attacker / victim id except None and 0
+    m_att = in_round & (att != NO_ID) & (att != 0)
+    m_vic = in_round & (vic != NO_ID) & (vic != 0)
+    here = np.unique(np.concatenate([pair(r_dense[m_att], att[m_att]), pair(r_dense[m_vic], vic[m_vic])]))
+    touched[pair_player(here)] = True
+
+    m = in_round & is_kill & (vic != NO_ID) & (vic != 0)
+    dead = np.unique(pair(r_dense[m], vic[m]))
+    alive_pairs = here[~np.isin(here, dead, assume_unique=True)]
+
+    played_rounds = np.bincount(pair_player(here), minlength=n_players)
+    survived_rounds = np.bincount(pair_player(alive_pairs), minlength=n_players)
+
+    # kill_events: kills with both ids present, in event order
+    k = np.flatnonzero(in_round & is_kill & (att != NO_ID) & (vic != NO_ID))
+    k_r, k_att, k_vic = r_dense[k], att[k], vic[k]
+    k_aside, k_vside = c["attacker_side"][k], c["victim_side"][k]
+
+    m = k_att > 0
+    kill_pairs, kill_counts = np.unique(pair(k_r[m], k_att[m]), return_counts=True)
+
+    m = in_round & is_assist & (att > 0)
+    assist_pairs = np.unique(pair(r_dense[m], att[m]))
+
+    # entry: first kill_event of each round
+    entry_kills = np.zeros(n_players, dtype=np.int64)
+    entry_deaths = np.zeros(n_players, dtype=np.int64)
+    if len(k):
+        first = np.r_[True, k_r[1:] != k_r[:-1]]
+        e_att, e_vic = k_att[first], k_vic[first]
+        entry_kills = per_player(e_att[e_att > 0])
+        entry_deaths = per_player(e_vic[e_vic > 0])
+
+    # trades
+    trade_kills = np.zeros(n_players, dtype=np.int64)
+    traded_deaths = np.zeros(n_players, dtype=np.int64)
+    trade_pairs = np.empty(0, dtype=np.int64)
+    traded_pairs = np.empty(0, dtype=np.int64)
+
+    n_k = len(k)
+    if n_k:
+        window = _trade_window_ticks()
+        key = (rn[k] << _TICK_BITS) + tick[k]
+        lo = np.searchsorted(key, key, side="left")
+        hi = np.searchsorted(key, key + window, side="right")
+
+        def side_key(r_idx, p, side):
+            return (r_idx.astype(np.int64) * n_players + dense(p)) * 3 + side
+
+        # candidates: the kill's victim + attacker side, indexed by position
+        cand = (k_att > 0) & (k_vic > 0) & (k_aside != SIDE_NONE)
+        cand_pos = np.flatnonzero(cand)
+        codes = np.sort(side_key(k_r[cand], k_vic[cand], k_aside[cand]) * (n_k + 1) + cand_pos)
+
+        # queries: "who killed my killer, from my side" starting at my tick
+        q = np.flatnonzero((k_att > 0) & (k_vic > 0) & (k_aside != SIDE_NONE) & (k_vside != SIDE_NONE))
+        q_key = side_key(k_r[q], k_att[q], k_vside[q])
+        at = np.searchsorted(codes, q_key * (n_k + 1) + lo[q], side="left")
+        hit_code = codes[np.minimum(at, len(codes) - 1)] if len(codes) else np.zeros(len(q), dtype=np.int64)
+        hit_pos = hit_code % (n_k + 1)
+        found = (at < len(codes)) & (hit_code // (n_k + 1) == q_key) & (hit_pos < hi[q])
+
+        traders = k_att[hit_pos[found]]
+        victims = k_vic[q[found]]
+        trade_kills = per_player(traders)
+        traded_deaths = per_player(victims)
+        trade_pairs = pair(k_r[q[found]], traders)
+        traded_pairs = pair(k_r[q[found]], victims)
+
+    kast_pairs = np.unique(np.concatenate([kill_pairs, assist_pairs, alive_pairs, trade_pairs, traded_pairs]))
+    kast_rounds = np.bincount(pair_player(here[np.isin(here, kast_pairs)]), minlength=n_players)
+
+    kill_player = pair_player(kill_pairs)
+    multikill = {
+        n: np.bincount(kill_player[kill_counts >= n], minlength=n_players)
+        for n in (2, 3, 4, 5)
+    }
+
+    out: Dict[int, PlayerStats] = {}
+    for i in np.flatnonzero(touched).tolist():
+        out[int(pids[i])] = PlayerStats(
+            kills=int(kills[i]),
+            deaths=int(deaths[i]),
+            assists=int(assists[i]),
+            damage_given=float(damage_given[i]),
+            played_rounds=int(played_rounds[i]),
+            survived_rounds=int(survived_rounds[i]),
+            kast_rounds=int(kast_rounds[i]),
+            trade_kills=int(trade_kills[i]),
+            traded_deaths=int(traded_deaths[i]),
+            swing_sum=float(swing_sum[i]),
+            bomb_swing_sum=float(bomb_swing_sum[i]),
+            entry_kills=int(entry_kills[i]),
+            entry_deaths=int(entry_deaths[i]),
+            multikill_2=int(multikill[2][i]),
+            multikill_3=int(multikill[3][i]),
+            multikill_4=int(multikill[4][i]),
+            multikill_5=int(multikill[5][i]),
+        )
+    return out
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple, Set
-from collections import defaultdict
+from typing import Deque, Dict, List, Optional, Tuple, Set
+from collections import defaultdict, deque
+
+from core.config import settings
+from services.win_probability import WinProbBatch, get_model
 
 
 # =========================================================
@@ -117,34 +120,6 @@ def _infer_total_rounds(events) -> int:
     return max(len(rounds), 1)
 
 
-def _players_in_round(events, rnd: int) -> Set[int]:
-    out = set()
-    for e in events:
-        if _safe_int(getattr(e, "round_number", 0), 0) != rnd:
-            continue
-        attacker_id = getattr(e, "attacker_id", None)
-        victim_id = getattr(e, "victim_id", None)
-        if attacker_id is not None:
-            out.add(_safe_int(attacker_id))
-        if victim_id is not None:
-            out.add(_safe_int(victim_id))
-    out.discard(0)
-    return out
-
-
-def _dead_players_in_round(events, rnd: int) -> Set[int]:
-    dead = set()
-    for e in events:
-        if _safe_int(getattr(e, "round_number", 0), 0) != rnd:
-            continue
-        if str(getattr(e, "event_type", "")).lower() == "kill":
-            victim_id = getattr(e, "victim_id", None)
-            if victim_id is not None:
-                dead.add(_safe_int(victim_id))
-    dead.discard(0)
-    return dead
-
-
 def _trade_window_ticks() -> int:
     return 320
 
@@ -190,45 +165,62 @@ def _clamp_alive(n) -> int:
     return max(1, min(5, _safe_int(n, 5)))
 
 
-def _ct_prob(ct_alive: int, t_alive: int) -> float:
-    return _CT_WIN_PROB_TABLE.get((_clamp_alive(ct_alive), _clamp_alive(t_alive)), 0.5)
-
-
-def _side_prob(side: str, ct_alive: int, t_alive: int) -> float:
-    ct_p = _ct_prob(ct_alive, t_alive)
-    if side == "CT":
-        return ct_p
-    if side == "T":
-        return 1.0 - ct_p
-    return 0.5
-
-
-# =========================================================
-# SWING / CONTEXT
-# =========================================================
-
-def _kill_swing(ev) -> float:
-    attacker_side = _norm_side(getattr(ev, "attacker_side", None))
-    victim_side = _norm_side(getattr(ev, "victim_side", None))
-
-    if attacker_side is None or victim_side is None:
-        return 0.0
-
-    alive_t_after = _clamp_alive(getattr(ev, "alive_t", 5))
-    alive_ct_after = _clamp_alive(getattr(ev, "alive_ct", 5))
-
-    # Parser stores AFTER state for kill events
-    if victim_side == "T":
-        alive_t_before = _clamp_alive(alive_t_after + 1)
-        alive_ct_before = alive_ct_after
-    else:
-        alive_ct_before = _clamp_alive(alive_ct_after + 1)
-        alive_t_before = alive_t_after
-
-    p_before = _side_prob(attacker_side, alive_ct_before, alive_t_before)
-    p_after = _side_prob(attacker_side, alive_ct_after, alive_t_after)
-
-    return p_after - p_before
+def _kill_swings(kill_events, winprob_model: Optional[str] = None) -> List[float]:
+    """
+    Win-probability swing for the attacker of each kill, one model batch for the whole list.
+    Parser stores AFTER state for kill events; the victim's side had one more player before.
+    Model: winprob_model, else settings.RATING_WINPROB_MODEL (default "ct_table", the table above).
+    """
+    if not kill_events:
+        return []
+
+    attacker_sides = []
+    before_t, before_ct, after_t, after_ct = [], [], [], []
+    for ev in kill_events:
+        attacker_side = _norm_side(getattr(ev, "attacker_side", None))
+        victim_side = _norm_side(getattr(ev, "victim_side", None))
+        attacker_sides.append(attacker_side if victim_side is not None else None)
+
+        alive_t_after = _clamp_alive(getattr(ev, "alive_t", 5))
+        alive_ct_after = _clamp_alive(getattr(ev, "alive_ct", 5))
+        after_t.append(alive_t_after)
+        after_ct.append(alive_ct_after)
+
+        if victim_side == "T":
+            before_t.append(_clamp_alive(alive_t_after + 1))
+            before_ct.append(alive_ct_after)
+        else:
+            before_ct.append(_clamp_alive(alive_ct_after + 1))
+            before_t.append(alive_t_after)
+
+    def twice(name: str, default=None) -> List:
+        vals = [getattr(ev, name, default) for ev in kill_events]
+        return vals + vals
+
+    batch = WinProbBatch.from_lists(
+        alive_t=before_t + after_t,
+        alive_ct=before_ct + after_ct,
+        score_t=[_safe_int(x, 0) for x in twice("score_t", 0)],
+        score_ct=[_safe_int(x, 0) for x in twice("score_ct", 0)],
+        bomb_planted=[bool(x) for x in twice("bomb_planted", False)],
+        time_in_round=[_safe_float(x, None) for x in twice("time_in_round")],
+        tick=[_safe_int(x, 0) for x in twice("tick", 0)],
+        eco_t=twice("eco_t"),
+        eco_ct=twice("eco_ct"),
+    )
+    p_t, p_ct = get_model(winprob_model or settings.RATING_WINPROB_MODEL).predict_sides(batch)
+    p_t, p_ct = p_t.tolist(), p_ct.tolist()
+
+    n = len(kill_events)
+    out = []
+    for i, side in enumerate(attacker_sides):
+        if side == "CT":
+            out.append(p_ct[n + i] - p_ct[i])
+        elif side == "T":
+            out.append(p_t[n + i] - p_t[i])
+        else:
+            out.append(0.0)
+    return out
 
 
 def _bomb_swing(ev) -> Tuple[Optional[str], float]:
@@ -261,134 +253,153 @@ def _compute_round_features(events, stats: Dict[int, PlayerStats]) -> None:
             events_by_round[rnd].append(e)
 
     for rnd in rounds:
-        rnd_events = _sorted_events(events_by_round[rnd])
-
-        players_here = _players_in_round(rnd_events, rnd)
-        dead_here = _dead_players_in_round(rnd_events, rnd)
-
-        # played/survived
-        for pid in players_here:
-            stats[pid].played_rounds += 1
-            if pid not in dead_here:
-                stats[pid].survived_rounds += 1
-
-        kill_events = [
-            e for e in rnd_events
-            if str(getattr(e, "event_type", "")).lower() == "kill"
-            and getattr(e, "attacker_id", None) is not None
-            and getattr(e, "victim_id", None) is not None
-        ]
-
-        assist_events = [
-            e for e in rnd_events
-            if str(getattr(e, "event_type", "")).lower() == "assist"
-            and getattr(e, "attacker_id", None) is not None
-        ]
-
-        round_has_kill = set()
-        round_has_assist = set()
-        round_has_survive = set()
-        round_has_trade_kill = set()
-        round_has_traded_death = set()
-
-        for pid in players_here:
-            if pid not in dead_here:
-                round_has_survive.add(pid)
-
-        # kills
-        kill_count_by_player = defaultdict(int)
-        for e in kill_events:
-            attacker = _safe_int(getattr(e, "attacker_id", 0), 0)
+        _aggregate_round(_sorted_events(events_by_round[rnd]), stats, trade_window)
+
+
+def _aggregate_round(rnd_events, stats: Dict[int, PlayerStats], trade_window: int) -> None:
+    """
+    One pass over a tick-sorted round: played / survived / KAST / entry / multikill / trades.
+
+    Trades: every valid kill opens a pending entry under (killer, victim side).
+    When that killer later dies to someone on the victim's side within
+    trade_window ticks, all open entries under that key are traded by this kill
+    (each kill is traded by the first such kill only). Entries are appended in
+    tick order, so expired ones are dropped from the front: O(kills) per round.
+    Kills sharing a tick can trade each other either way, so a tick group is
+    registered before any of its kills is matched.
+    """
+    players_here: Set[int] = set()
+    dead_here: Set[int] = set()
+    round_has_kill: Set[int] = set()
+    round_has_assist: Set[int] = set()
+    round_has_trade_kill: Set[int] = set()
+    round_has_traded_death: Set[int] = set()
+    kill_count_by_player: Dict[int, int] = defaultdict(int)
+
+    # (tick, attacker, victim, attacker_side, victim_side) of kills with both ids present
+    kills: List[Tuple[int, int, int, Optional[str], Optional[str]]] = []
+
+    for e in rnd_events:
+        attacker_id = getattr(e, "attacker_id", None)
+        victim_id = getattr(e, "victim_id", None)
+        if attacker_id is not None:
+            players_here.add(_safe_int(attacker_id))
+        if victim_id is not None:
+            players_here.add(_safe_int(victim_id))
+
+        et = str(getattr(e, "event_type", "")).lower()
+
+        if et == "kill":
+            if victim_id is not None:
+                dead_here.add(_safe_int(victim_id))
+            if attacker_id is None or victim_id is None:
+                continue
+
+            attacker = _safe_int(attacker_id, 0)
+            kills.append((
+                _safe_int(getattr(e, "tick", 0), 0),
+                attacker,
+                _safe_int(victim_id, 0),
+                _norm_side(getattr(e, "attacker_side", None)),
+                _norm_side(getattr(e, "victim_side", None)),
+            ))
             if attacker > 0:
                 round_has_kill.add(attacker)
                 kill_count_by_player[attacker] += 1
 
-        # assists
-        for e in assist_events:
-            assister = _safe_int(getattr(e, "attacker_id", 0), 0)
+        elif et == "assist" and attacker_id is not None:
+            assister = _safe_int(attacker_id, 0)
             if assister > 0:
                 round_has_assist.add(assister)
 
-        # entry kill / entry death
-        if kill_events:
-            first_kill = min(kill_events, key=lambda e: _safe_int(getattr(e, "tick", 0), 0))
-            entry_attacker = _safe_int(getattr(first_kill, "attacker_id", 0), 0)
-            entry_victim = _safe_int(getattr(first_kill, "victim_id", 0), 0)
-
-            if entry_attacker > 0:
-                stats[entry_attacker].entry_kills += 1
-            if entry_victim > 0:
-                stats[entry_victim].entry_deaths += 1
-
-        # trade logic
-        for e in kill_events:
-            attacker = _safe_int(getattr(e, "attacker_id", 0), 0)
-            victim = _safe_int(getattr(e, "victim_id", 0), 0)
-            victim_side = _norm_side(getattr(e, "victim_side", None))
-            attacker_side = _norm_side(getattr(e, "attacker_side", None))
-
-            if attacker <= 0 or victim <= 0:
+    players_here.discard(0)
+    dead_here.discard(0)
+
+    # played/survived
+    for pid in players_here:
+        stats[pid].played_rounds += 1
+        if pid not in dead_here:
+            stats[pid].survived_rounds += 1
+
+    # entry kill / entry death (kills are tick-sorted: the first one is the earliest)
+    if kills:
+        _tick, entry_attacker, entry_victim, _a_side, _v_side = kills[0]
+        if entry_attacker > 0:
+            stats[entry_attacker].entry_kills += 1
+        if entry_victim > 0:
+            stats[entry_victim].entry_deaths += 1
+
+    # trade logic: sliding window, pending deaths indexed by (killer, side that can avenge)
+    pending: Dict[Tuple[int, str], Deque[Tuple[int, int]]] = defaultdict(deque)
+    i = 0
+    while i < len(kills):
+        group_tick = kills[i][0]
+        j = i
+        while j < len(kills) and kills[j][0] == group_tick:
+            j += 1
+
+        for tick, attacker, victim, a_side, v_side in kills[i:j]:
+            if attacker > 0 and victim > 0 and a_side is not None and v_side is not None:
+                pending[(attacker, v_side)].append((tick, victim))
+
+        for tick, attacker, victim, a_side, _v_side in kills[i:j]:
+            if attacker <= 0 or victim <= 0 or a_side is None:
                 continue
-            if victim_side is None or attacker_side is None:
+            queue = pending.get((victim, a_side))
+            if not queue:
                 continue
+            while queue:
+                death_tick, traded_victim = queue.popleft()
+                if tick - death_tick > trade_window:
+                    continue  # expired
+                round_has_trade_kill.add(attacker)
+                round_has_traded_death.add(traded_victim)
+                stats[attacker].trade_kills += 1
+                stats[traded_victim].traded_deaths += 1
+
+        i = j
+
+    # real KAST
+    for pid in players_here:
+        kast = (
+            pid in round_has_kill
+            or pid in round_has_assist
+            or pid not in dead_here
+            or pid in round_has_trade_kill
+            or pid in round_has_traded_death
+        )
+        if kast:
+            stats[pid].kast_rounds += 1
 
-            death_tick = _safe_int(getattr(e, "tick", 0), 0)
-
-            for later in kill_events:
-                later_tick = _safe_int(getattr(later, "tick", 0), 0)
-
-                if later_tick < death_tick:
-                    continue
-                if later_tick - death_tick > trade_window:
-                    break
-
-                later_attacker = _safe_int(getattr(later, "attacker_id", 0), 0)
-                later_victim = _safe_int(getattr(later, "victim_id", 0), 0)
-                later_attacker_side = _norm_side(getattr(later, "attacker_side", None))
-
-                if later_attacker <= 0 or later_victim <= 0:
-                    continue
-                if later_attacker_side is None:
-                    continue
-
-                if later_victim == attacker and later_attacker_side == victim_side:
-                    round_has_trade_kill.add(later_attacker)
-                    round_has_traded_death.add(victim)
-                    stats[later_attacker].trade_kills += 1
-                    stats[victim].traded_deaths += 1
-                    break
-
-        # real KAST
-        for pid in players_here:
-            kast = (
-                pid in round_has_kill
-                or pid in round_has_assist
-                or pid in round_has_survive
-                or pid in round_has_trade_kill
-                or pid in round_has_traded_death
-            )
-            if kast:
-                stats[pid].kast_rounds += 1
-
-        # multikill bonuses
-        for pid, kc in kill_count_by_player.items():
-            if kc >= 2:
-                stats[pid].multikill_2 += 1
-            if kc >= 3:
-                stats[pid].multikill_3 += 1
-            if kc >= 4:
-                stats[pid].multikill_4 += 1
-            if kc >= 5:
-                stats[pid].multikill_5 += 1
+    # multikill bonuses
+    for pid, kc in kill_count_by_player.items():
+        if kc >= 2:
+            stats[pid].multikill_2 += 1
+        if kc >= 3:
+            stats[pid].multikill_3 += 1
+        if kc >= 4:
+            stats[pid].multikill_4 += 1
+        if kc >= 5:
+            stats[pid].multikill_5 += 1
 
 
 # =========================================================
 # RAW STATS
 # =========================================================
 
-def _compute_raw(events):
+def _is_scored_kill(ev) -> bool:
+    if str(getattr(ev, "event_type", "")).lower() != "kill":
+        return False
+    attacker = getattr(ev, "attacker_id", None)
+    return attacker is not None and _safe_int(attacker, 0) > 0
+
+
+def _compute_raw(events, winprob_model: Optional[str] = None):
     stats = defaultdict(PlayerStats)
 
+    # swings of all scored kills in one win-probability batch, consumed in event order below
+    kill_swings = iter(_kill_swings([ev for ev in events if _is_scored_kill(ev)], winprob_model))
+
     for ev in events:
         et = str(getattr(ev, "event_type", "")).lower()
 
@@ -400,7 +411,7 @@ def _compute_raw(events):
                 pid = _safe_int(attacker, 0)
                 if pid > 0:
                     stats[pid].kills += 1
-                    stats[pid].swing_sum += _kill_swing(ev)
+                    stats[pid].swing_sum += next(kill_swings)
 
             if victim is not None:
                 vid = _safe_int(victim, 0)
@@ -566,66 +577,70 @@ def compute_impact_breakdown_v3(
     if total_rounds is None:
         total_rounds = _infer_total_rounds(events)
 
-    raw_stats = _compute_raw(events)
-    out = {}
-
-    for pid, ps in raw_stats.items():
-        rounds = max(_safe_int(total_rounds, 1), 1)
-
-        kpr = ps.kills / rounds
-        dpr = ps.deaths / rounds
-        apr = ps.assists / rounds
-        adr = ps.damage_given / rounds
-        kast = (ps.kast_rounds / rounds) * 100.0
-
-        swing = ps.swing_sum / rounds
-        bomb = ps.bomb_swing_sum / rounds
-        entry_score = (ps.entry_kills - ps.entry_deaths) / rounds
-        multikill_score = (
-            0.12 * ps.multikill_2 +
-            0.20 * ps.multikill_3 +
-            0.28 * ps.multikill_4 +
-            0.35 * ps.multikill_5
-        ) / rounds
-
-        base_impact = 2.13 * kpr + 0.42 * apr - 0.41
-        contextual_impact = (
-            base_impact
-            + (0.55 * swing)
-            + (0.08 * bomb)
-            + (0.35 * entry_score)
-            + (0.18 * multikill_score)
-        )
+    raw_stats = _compute_raw(events, kwargs.get("winprob_model"))
+    return breakdown_from_stats(raw_stats, total_rounds)
+
+
+def breakdown_from_stats(raw_stats: Dict[int, PlayerStats], total_rounds) -> Dict[int, Dict[str, float]]:
+    """Per-player breakdown dicts from aggregated PlayerStats (shared by every engine backend)."""
+    return {pid: _breakdown(ps, total_rounds) for pid, ps in raw_stats.items()}
 
-        out[pid] = {
-            "rating": round(_rating(ps, total_rounds), 2),
-            "rounds": float(rounds),
-
-            "kills": float(ps.kills),
-            "deaths": float(ps.deaths),
-            "assists": float(ps.assists),
-
-            "kpr": round(kpr, 3),
-            "dpr": round(dpr, 3),
-            "apr": round(apr, 3),
-            "adr": round(adr, 2),
-            "kast_pct": round(kast, 1),
-
-            "base_impact": round(base_impact, 3),
-            "swing_per_round": round(swing, 4),
-            "bomb_per_round": round(bomb, 4),
-            "entry_per_round": round(entry_score, 4),
-            "multikill_per_round": round(multikill_score, 4),
-            "contextual_impact": round(contextual_impact, 3),
-
-            "entry_kills": float(ps.entry_kills),
-            "entry_deaths": float(ps.entry_deaths),
-            "multikill_2": float(ps.multikill_2),
-            "multikill_3": float(ps.multikill_3),
-            "multikill_4": float(ps.multikill_4),
-            "multikill_5": float(ps.multikill_5),
-            "trade_kills": float(ps.trade_kills),
-            "traded_deaths": float(ps.traded_deaths),
-        }
-
-    return out
\ No newline at end of file
+
+def _breakdown(ps: PlayerStats, total_rounds: int) -> Dict[str, float]:
+    rounds = max(_safe_int(total_rounds, 1), 1)
+
+    kpr = ps.kills / rounds
+    dpr = ps.deaths / rounds
+    apr = ps.assists / rounds
+    adr = ps.damage_given / rounds
+    kast = (ps.kast_rounds / rounds) * 100.0
+
+    swing = ps.swing_sum / rounds
+    bomb = ps.bomb_swing_sum / rounds
+    entry_score = (ps.entry_kills - ps.entry_deaths) / rounds
+    multikill_score = (
+        0.12 * ps.multikill_2 +
+        0.20 * ps.multikill_3 +
+        0.28 * ps.multikill_4 +
+        0.35 * ps.multikill_5
+    ) / rounds
+
+    base_impact = 2.13 * kpr + 0.42 * apr - 0.41
+    contextual_impact = (
+        base_impact
+        + (0.55 * swing)
+        + (0.08 * bomb)
+        + (0.35 * entry_score)
+        + (0.18 * multikill_score)
+    )
+
+    return {
+        "rating": round(_rating(ps, total_rounds), 2),
+        "rounds": float(rounds),
+
+        "kills": float(ps.kills),
+        "deaths": float(ps.deaths),
+        "assists": float(ps.assists),
+
+        "kpr": round(kpr, 3),
+        "dpr": round(dpr, 3),
+        "apr": round(apr, 3),
+        "adr": round(adr, 2),
+        "kast_pct": round(kast, 1),
+
+        "base_impact": round(base_impact, 3),
+        "swing_per_round": round(swing, 4),
+        "bomb_per_round": round(bomb, 4),
+        "entry_per_round": round(entry_score, 4),
+        "multikill_per_round": round(multikill_score, 4),
+        "contextual_impact": round(contextual_impact, 3),
+
+        "entry_kills": float(ps.entry_kills),
+        "entry_deaths": float(ps.entry_deaths),
+        "multikill_2": float(ps.multikill_2),
+        "multikill_3": float(ps.multikill_3),
+        "multikill_4": float(ps.multikill_4),
+        "multikill_5": float(ps.multikill_5),
+        "trade_kills": float(ps.trade_kills),
+        "traded_deaths": float(ps.traded_deaths),
+    }
@@ -0,0 +1,100 @@
+# services/ingest.py
+"""
+Demo ingest pipeline stages: parse -> persist -> rate.
+Driven by the ingest job runner (services.ingest_jobs); POST /api/upload only spools the demo and queues a job.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from services.event_loader import EventRow
+from services.match_service import persist_match_rows, rate_match, find_match_by_hash
+from services.leaderboard_snapshots import mark_snapshots_stale
+from services.player_aggregates import apply_match_aggregates
+from services.parse_cache import parse_cache
+from services.parse_pool import parse_demo_async
+
+from models.models import Match
+
+
+class IngestError(Exception):
+    """Pipeline failure tagged with the stage it happened in and an HTTP-ish status."""
+
+    def __init__(self, stage: str, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.stage = stage
+        self.message = message
+        self.status_code = status_code
+
+
+# ============================================================
+# Stages
+# ============================================================
+
+async def parse_stage(demo_path: str, demo_hash: str) -> Dict[str, Any]:
+    """Parse cache lookup, else parse in the process pool (and fill the cache)."""
+    raw = await run_in_threadpool(parse_cache.get, demo_hash)
+    if raw is not None:
+        print("PARSE CACHE HIT:", demo_hash)
+    else:
+        try:
+            raw = await parse_demo_async(demo_path)
+        except Exception as e:
+            raise IngestError("parse", f"Analyzer crash: {str(e)}")
+
+        if raw and "error" not in raw:
+            try:
+                await run_in_threadpool(parse_cache.put, demo_hash, raw)
+            except Exception as e:
+                print("PARSE CACHE WRITE FAILED:", str(e))
+
+    if not raw:
+        raise IngestError("parse", "Empty parser result", 422)
+
+    if "error" in raw and not raw.get("players"):
+        raise IngestError("parse", raw["error"], 422)
+
+    return raw
+
+
+def persist_stage(
+    db: Session,
+    raw: Dict[str, Any],
+    demo_filename: Optional[str],
+    demo_hash: Optional[str],
+) -> Tuple[Match, List[EventRow], bool]:
+    """
+    Writes (flushes) every row of the match once. Nothing is committed until rate_stage.
+    Returns (match, events, duplicate). duplicate=True means another upload of the same demo
+    won the unique demo_hash race and nothing was written.
+    """
+    try:
+        match, events = persist_match_rows(db, raw, demo_filename=demo_filename, demo_hash=demo_hash)
+    except IntegrityError:
+        db.rollback()
+        existing = find_match_by_hash(db, demo_hash)
+        if existing is None:
+            raise IngestError("persist", "Save crash: demo_hash conflict")
+        return existing, [], True
+    except Exception as e:
+        db.rollback()
+        raise IngestError("persist", f"Save crash: {str(e)}")
+
+    print("MATCH SAVED:", match.id)
+    return match, events, False
+
+
+def rate_stage(db: Session, match: Match, events: List[EventRow]) -> None:
+    """Rating + KAST + swing from the in-memory events, then commit the whole ingest."""
+    try:
+        rate_match(db, match, events)
+        apply_match_aggregates(db, [match.id])
+        mark_snapshots_stale(db, [match.map])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print("HLTV BLOCK ERROR:", str(e))
+        raise IngestError("rate", f"Impact rating crash: {str(e)}")
+
@@ -0,0 +1,244 @@
+# services/ingest_jobs.py
+"""
+Asynchronous demo ingestion jobs.
+
+POST /api/upload only spools the demo and creates an IngestJob row; the runner
+then drives parse -> persist -> rate in the background, recording the stage and
+per-stage timings on the row. Jobs live in the DB, so anything not finished when
+the process stops is picked up again on the next startup.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from core.config import settings
+from core.database import SessionLocal
+from models.ingest_job import IngestJob
+from services.ingest import IngestError, parse_stage, persist_stage, rate_stage
+
+
+QUEUED = "queued"
+PARSING = "parsing"
+PERSISTING = "persisting"
+DONE = "done"
+FAILED = "failed"
+
+ACTIVE_STATUSES = (QUEUED, PARSING, PERSISTING)
+
+
+# ============================================================
+# Job rows
+# ============================================================
+
+def create_job(
+    db: Session,
+    demo_path: str,
+    demo_filename: Optional[str],
+    demo_hash: str,
+) -> IngestJob:
+    job = IngestJob(
+        status=QUEUED,
+        demo_filename=demo_filename,
+        demo_hash=demo_hash,
+        demo_path=demo_path,
+        timings={},
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def find_active_job(db: Session, demo_hash: str) -> Optional[IngestJob]:
+    return (
+        db.query(IngestJob)
+        .filter(IngestJob.demo_hash == demo_hash, IngestJob.status.in_(ACTIVE_STATUSES))
+        .order_by(IngestJob.id.asc())
+        .first()
+    )
+
+
+def job_to_dict(job: IngestJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "demo_filename": job.demo_filename,
+        "demo_hash": job.demo_hash,
+        "match_id": job.match_id,
+        "duplicate": bool(job.duplicate),
+        "error": job.error,
+        "timings": job.timings or {},
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def _claim(db: Session, job_id: int) -> bool:
+    """QUEUED -> PARSING, atomically, so a job never runs twice."""
+    n = (
+        db.query(IngestJob)
+        .filter(IngestJob.id == job_id, IngestJob.status == QUEUED)
+        .update({"status": PARSING, "started_at": datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    return n == 1
+
+
+def _set_stage(db: Session, job: IngestJob, status: str, **fields) -> None:
+    job.status = status
+    for k, v in fields.items():
+        setattr(job, k, v)
+    db.commit()
+
+
+def _record_timing(job: IngestJob, stage: str, seconds: float) -> None:
+    timings = dict(job.timings or {})
+    timings[stage] = round(seconds, 3)
+    job.timings = timings  # reassign: plain JSON column, no mutation tracking
+
+
+def _discard_demo(job: IngestJob) -> None:
+    if job.demo_path:
+        try:
+            os.unlink(job.demo_path)
+        except OSError:
+            pass
+
+
+# ============================================================
+# Pipeline
+# ============================================================
+
+async def run_job(job_id: int) -> None:
+    # two sessions: job bookkeeping commits on every stage change,
+    # the match itself is one transaction (persist + rate) committed at the end
+    jobs_db = SessionLocal()
+    db = SessionLocal()
+    try:
+        claimed = await run_in_threadpool(_claim, jobs_db, job_id)
+        if not claimed:
+            return
+
+        job = await run_in_threadpool(jobs_db.get, IngestJob, job_id)
+        if job.created_at and job.started_at:
+            _record_timing(job, "queue", (job.started_at - job.created_at).total_seconds())
+
+        try:
+            t0 = time.perf_counter()
+            raw = await parse_stage(job.demo_path, job.demo_hash)
+            _record_timing(job, "parse", time.perf_counter() - t0)
+
+            await run_in_threadpool(_set_stage, jobs_db, job, PERSISTING)
+            t0 = time.perf_counter()
+            match, events, duplicate = await run_in_threadpool(
+                persist_stage, db, raw, job.demo_filename, job.demo_hash
+            )
+            _record_timing(job, "persist", time.perf_counter() - t0)
+
+            if duplicate:
+                await run_in_threadpool(
+                    _finish, jobs_db, db, job, DONE, match_id=match.id, duplicate=True
+                )
+                return
+
+            # persist + rate are one transaction: no stage write in between (on SQLite a second
+            # writer would block on it); the job stays "persisting" until commit, timings["rate"] has the split
+            t0 = time.perf_counter()
+            await run_in_threadpool(rate_stage, db, match, events)
+            _record_timing(job, "rate", time.perf_counter() - t0)
+
+            await run_in_threadpool(_finish, jobs_db, db, job, DONE, match_id=match.id)
+            print(f"=== INGEST JOB {job_id} DONE: match {match.id} ===")
+
+        except IngestError as e:
+            await run_in_threadpool(_finish, jobs_db, db, job, FAILED, error=f"{e.stage}: {e.message}")
+        except Exception as e:
+            await run_in_threadpool(_finish, jobs_db, db, job, FAILED, error=f"internal: {str(e)}")
+    finally:
+        db.close()
+        jobs_db.close()
+
+
+def _finish(jobs_db: Session, db: Session, job: IngestJob, status: str, **fields) -> None:
+    db.rollback()  # no-op after a committed ingest; drops a failed stage's half-done rows
+    fields.setdefault("error", None)
+    fields["finished_at"] = datetime.utcnow()
+    fields["timings"] = dict(job.timings or {})
+    _set_stage(jobs_db, job, status, **fields)
+    _discard_demo(job)
+    print(f"INGEST JOB {job.id}: {status}" + (f" ({job.error})" if job.error else ""))
+
+
+# ============================================================
+# Runner
+# ============================================================
+
+class IngestRunner:
+    """Runs jobs as event-loop tasks, at most `concurrency` at a time."""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = max(1, int(concurrency))
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def submit(self, job_id: int) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        task = asyncio.get_running_loop().create_task(self._run(job_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job_id: int) -> None:
+        async with self._semaphore:
+            try:
+                await run_job(job_id)
+            except Exception as e:
+                print(f"INGEST JOB {job_id} CRASHED:", str(e))
+
+    async def resume_pending(self) -> int:
+        """Requeue jobs interrupted by a restart and submit everything queued."""
+        job_ids = await run_in_threadpool(_requeue_interrupted)
+        for job_id in job_ids:
+            self.submit(job_id)
+        return len(job_ids)
+
+    async def shutdown(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def _requeue_interrupted() -> list[int]:
+    db = SessionLocal()
+    try:
+        jobs = (
+            db.query(IngestJob)
+            .filter(IngestJob.status.in_(ACTIVE_STATUSES))
+            .order_by(IngestJob.id.asc())
+            .all()
+        )
+        out = []
+        for job in jobs:
+            if not job.demo_path or not os.path.exists(job.demo_path):
+                job.status = FAILED
+                job.error = "restart: spooled demo file is gone"
+                job.finished_at = datetime.utcnow()
+                continue
+            job.status = QUEUED
+            out.append(job.id)
+        db.commit()
+        return out
+    finally:
+        db.close()
+
+
+ingest_runner = IngestRunner(settings.INGEST_CONCURRENCY)
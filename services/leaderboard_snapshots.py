@@ -0,0 +1,207 @@
+# services/leaderboard_snapshots.py
+"""
+Precomputed leaderboards for the standard windows (7/30/90/365 days, 0 = all-time),
+per map and over all maps ("" map), live rating, min LEADERBOARD_MIN_MATCHES.
+
+Each snapshot stores its ranked players in leaderboard_entries with a position
+(row order) and a dense rank, so a page is a range scan on (snapshot, position)
+and a player's rank + neighbours is a primary key lookup plus a short range scan.
+
+Freshness (writers only mark, the rebuild happens on read, off the ingest path):
+    ingest / match delete      mark the all-maps + that map's snapshots stale
+    live re-rate               marks every snapshot stale
+    on read                    missing / stale snapshots are rebuilt; rolling windows
+                               also after LEADERBOARD_SNAPSHOT_TTL_SEC (matches age out)
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from analytics.leaderboard import _career_rows, _window_rows, dense_ranks, format_leaderboard
+from analytics.rating_source import rating_source
+from core.config import settings
+from core.database import insert_for
+from models.leaderboard_snapshot import LeaderboardEntry, LeaderboardSnapshot
+from models.models import Match, Player
+
+
+SNAPSHOT_WINDOWS = (7, 30, 90, 365, 0)
+ALL_MAPS = ""
+
+
+def is_snapshot_window(period_days: Optional[int]) -> bool:
+    return (period_days or 0) in SNAPSHOT_WINDOWS
+
+
+def mark_snapshots_stale(db: Session, maps: Optional[Iterable[str]] = None) -> None:
+    """maps=None: every snapshot. Otherwise the all-maps snapshots and those maps'. Flush only."""
+    stmt = update(LeaderboardSnapshot).values(stale=True)
+    if maps is not None:
+        stmt = stmt.where(LeaderboardSnapshot.map.in_([ALL_MAPS, *(m for m in maps if m)]))
+    db.execute(stmt.execution_options(synchronize_session=False))
+
+
+# ============================================================
+# Build
+# ============================================================
+
+def _snapshot_row(db: Session, period_days: int, map_name: str) -> LeaderboardSnapshot:
+    """Get or create the snapshot row, locked for the rebuild (PG: concurrent rebuilds queue up)."""
+    dialect_insert = insert_for(db)
+    if dialect_insert is not None:
+        db.execute(
+            dialect_insert(LeaderboardSnapshot)
+            .values(period_days=period_days, map=map_name, stale=True)
+            .on_conflict_do_nothing(index_elements=[LeaderboardSnapshot.period_days, LeaderboardSnapshot.map])
+        )
+    elif db.query(LeaderboardSnapshot.id).filter_by(period_days=period_days, map=map_name).first() is None:
+        db.add(LeaderboardSnapshot(period_days=period_days, map=map_name, stale=True))
+        db.flush()
+
+    return (
+        db.query(LeaderboardSnapshot)
+        .filter_by(period_days=period_days, map=map_name)
+        .with_for_update()
+        .one()
+    )
+
+
+def _ranked_rows(db: Session, period_days: int, map_name: str) -> list:
+    min_matches = settings.LEADERBOARD_MIN_MATCHES
+    if not period_days and not map_name:
+        return _career_rows(db, min_matches, None)  # all-time overall: player_aggregates
+    return _window_rows(db, rating_source(None), period_days, map_name or None, min_matches, None)
+
+
+def refresh_snapshot(db: Session, period_days: int, map_name: str = ALL_MAPS) -> LeaderboardSnapshot:
+    """Rebuild one snapshot's entries. Flush only, the caller commits."""
+    snap = _snapshot_row(db, period_days, map_name)
+
+    rows = sorted(_ranked_rows(db, period_days, map_name), key=lambda r: (-float(r.avg_rating or 0), r.id))
+
+    entries = []
+    for position, (r, rank) in enumerate(zip(rows, dense_ranks(rows)), 1):
+        entries.append({
+            "snapshot_id": snap.id,
+            "player_id": r.id,
+            "position": position,
+            "rank": rank,
+            "matches": int(r.matches),
+            "avg_rating": float(r.avg_rating or 0),
+            "avg_adr": float(r.avg_adr or 0),
+            "avg_hs": float(r.avg_hs or 0),
+            "kills": int(r.kills or 0),
+            "deaths": int(r.deaths or 0),
+            "fk": int(r.fk or 0),
+            "fd": int(r.fd or 0),
+            "avg_kast": float(r.avg_kast or 0),
+            "avg_swing_display": float(r.avg_swing_display or 0),
+        })
+
+    db.query(LeaderboardEntry).filter(LeaderboardEntry.snapshot_id == snap.id).delete(synchronize_session=False)
+    if entries:
+        db.execute(insert(LeaderboardEntry), entries)
+
+    snap.stale = False
+    snap.computed_at = datetime.utcnow()
+    db.flush()
+    return snap
+
+
+def _is_fresh(snap: LeaderboardSnapshot) -> bool:
+    if snap.stale or snap.computed_at is None:
+        return False
+    if not snap.period_days:
+        return True  # all-time does not age
+    return (datetime.utcnow() - snap.computed_at).total_seconds() < settings.LEADERBOARD_SNAPSHOT_TTL_SEC
+
+
+def get_snapshot(db: Session, period_days: int, map_name: Optional[str] = None) -> Optional[LeaderboardSnapshot]:
+    """Fresh snapshot of a standard window, rebuilt + committed when needed. None for a map without matches."""
+    period_days = period_days or 0
+    map_name = map_name or ALL_MAPS
+
+    snap = db.query(LeaderboardSnapshot).filter_by(period_days=period_days, map=map_name).first()
+    if snap is not None and _is_fresh(snap):
+        return snap
+
+    if map_name and db.query(Match.id).filter(Match.map == map_name).first() is None:
+        return None
+
+    try:
+        snap = refresh_snapshot(db, period_days, map_name)
+        db.commit()
+    except IntegrityError:
+        # a concurrent read rebuilt it first; same content
+        db.rollback()
+        snap = db.query(LeaderboardSnapshot).filter_by(period_days=period_days, map=map_name).one()
+    return snap
+
+
+# ============================================================
+# Read
+# ============================================================
+
+def _entries(db: Session, snapshot_id: int):
+    return (
+        db.query(
+            Player.id,
+            Player.steam_id,
+            Player.nickname,
+            Player.avatar_url,
+            LeaderboardEntry.position,
+            LeaderboardEntry.rank,
+            LeaderboardEntry.matches,
+            LeaderboardEntry.avg_rating,
+            LeaderboardEntry.avg_adr,
+            LeaderboardEntry.avg_hs,
+            LeaderboardEntry.kills,
+            LeaderboardEntry.deaths,
+            LeaderboardEntry.fk,
+            LeaderboardEntry.fd,
+            LeaderboardEntry.avg_kast,
+            LeaderboardEntry.avg_swing_display,
+        )
+        .join(Player, Player.id == LeaderboardEntry.player_id)
+        .filter(LeaderboardEntry.snapshot_id == snapshot_id)
+    )
+
+
+def snapshot_leaderboard(db: Session, snap: LeaderboardSnapshot, limit: int) -> List[dict]:
+    """Top `limit` of a snapshot, same shape as get_leaderboard() with the dense rank."""
+    rows = _entries(db, snap.id).order_by(LeaderboardEntry.position).limit(limit).all()
+    return format_leaderboard(rows, ranked=True)
+
+
+def player_rank(db: Session, snap: LeaderboardSnapshot, player_id: int, neighbours: int = 5) -> Optional[dict]:
+    """Rank of one player and the `neighbours` entries on each side; None if the player is not ranked."""
+    me = db.get(LeaderboardEntry, (snap.id, player_id))
+    if me is None:
+        return None
+
+    rows = (
+        _entries(db, snap.id)
+        .filter(LeaderboardEntry.position.between(me.position - neighbours, me.position + neighbours))
+        .order_by(LeaderboardEntry.position)
+        .all()
+    )
+    total = (
+        db.query(func.max(LeaderboardEntry.position))
+        .filter(LeaderboardEntry.snapshot_id == snap.id)
+        .scalar()
+    )
+
+    return {
+        "period_days": snap.period_days,
+        "map": snap.map or None,
+        "computed_at": snap.computed_at.isoformat() if snap.computed_at else None,
+        "rank": me.rank,
+        "position": me.position,
+        "ranked_players": int(total or 0),
+        "neighbours": format_leaderboard(rows, ranked=True),
+    }
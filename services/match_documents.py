@@ -0,0 +1,158 @@
+# services/match_documents.py
+"""
+Pre-rendered match documents for GET /api/matches/{match_id}.
+
+A match does not change after ingest, so its page is rendered once (first
+read), stored as JSON text in match_documents together with an ETag, and
+served as is. The document is dropped when something it shows changes:
+match delete, re-rate of the live rating, a player's nickname / avatar.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from models.match_document import MatchDocument
+from models.models import Match, MatchPlayer, Player
+from models.round import Round
+
+
+HALFTIME = 12
+
+
+def build_match_document(db: Session, match: Match) -> Dict[str, Any]:
+    rows = (
+        db.query(MatchPlayer, Player)
+        .join(Player, Player.id == MatchPlayer.player_id)
+        .filter(MatchPlayer.match_id == match.id)
+        .order_by(MatchPlayer.impact_rating.desc())
+        .all()
+    )
+
+    players = [
+        {
+            "steam_id": p.steam_id,
+            "nickname": p.nickname,
+            "avatar_url": p.avatar_url,
+            "team":     mp.team,
+            "K":        mp.kills,
+            "D":        mp.deaths,
+            "A":        mp.assists,
+            "ADR":      mp.adr,
+            "HS":       mp.hs_pct,
+            "FK":       mp.fk,
+            "FD":       mp.fd,
+
+            "kast_pct": mp.kast_pct,
+
+            # ✅ АГРЕССИВНЫЙ штраф: коэффициент 1.2
+            "swing": round(
+                (float(mp.swing or 0) * 50)
+                - ((float(mp.deaths or 0) - float(mp.kills or 0)) * 1.2),
+                2
+            ),
+
+            "rating":   float(mp.impact_rating) if mp.impact_rating is not None else None,
+        }
+        for mp, p in rows
+    ]
+
+    # Round winners для timeline: range scan of rounds (match_id, round_number)
+    round_winners = [
+        winner for (winner,) in
+        db.query(Round.winner_side)
+        .filter(Round.match_id == match.id)
+        .order_by(Round.round_number)
+        if winner
+    ]
+
+    # Счёт по половинам
+    first_half = round_winners[:HALFTIME]
+    second_half = round_winners[HALFTIME:24]
+
+    first_half_ct = sum(1 for r in first_half if r == "CT")
+    second_half_ct = sum(1 for r in second_half if r == "CT")
+
+    return {
+        "id":           match.id,
+        "played_at":    match.played_at.isoformat(),
+        "map":          match.map,
+        "team1_score":  match.team1_score,
+        "team2_score":  match.team2_score,
+        "total_rounds": match.total_rounds,
+        "total_kills":  match.total_kills,
+        "players":      players,
+        "round_winners": round_winners,
+        "first_half":  {"ct": first_half_ct, "t": len(first_half) - first_half_ct},
+        "second_half": {"ct": second_half_ct, "t": len(second_half) - second_half_ct},
+    }
+
+
+def render_document(doc: Dict[str, Any]) -> str:
+    # byte-for-byte what FastAPI's JSONResponse would send
+    return json.dumps(doc, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"))
+
+
+def _etag(body: str) -> str:
+    return '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def get_match_document(db: Session, match_id: int) -> Optional[MatchDocument]:
+    """Stored document, or render + store it now. None if the match does not exist."""
+    doc = db.get(MatchDocument, match_id)
+    if doc is not None:
+        return doc
+
+    match = db.get(Match, match_id)
+    if match is None:
+        return None
+
+    body = render_document(build_match_document(db, match))
+    doc = MatchDocument(match_id=match_id, etag=_etag(body), body=body)
+    db.add(doc)
+    try:
+        db.commit()
+    except IntegrityError:
+        # a concurrent first read stored it already; same content
+        db.rollback()
+        try:
+            doc = db.get(MatchDocument, match_id) or doc
+        except SQLAlchemyError:
+            db.rollback()
+    except SQLAlchemyError as e:
+        # storing is only a cache (e.g. SQLite "database is locked" under a writer): serve the render
+        db.rollback()
+        print(f"MATCH DOCUMENT {match_id}: not stored ({e.__class__.__name__}), served uncached")
+    return doc
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = (t.strip() for t in if_none_match.split(","))
+    return any((t[2:] if t.startswith("W/") else t) == etag for t in tags)
+
+
+# ============================================================
+# Invalidation (flush only, the caller commits)
+# ============================================================
+
+def invalidate_match_documents(db: Session, match_ids: Iterable[int]) -> None:
+    match_ids = list(match_ids)
+    if match_ids:
+        db.query(MatchDocument).filter(MatchDocument.match_id.in_(match_ids)).delete(synchronize_session=False)
+
+
+def invalidate_player_documents(db: Session, player_ids: Iterable[int]) -> None:
+    """Every match document that shows one of these players (nickname / avatar changed)."""
+    player_ids = list(player_ids)
+    if player_ids:
+        match_ids = select(MatchPlayer.match_id).where(MatchPlayer.player_id.in_(player_ids))
+        db.query(MatchDocument).filter(MatchDocument.match_id.in_(match_ids)).delete(synchronize_session=False)
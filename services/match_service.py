@@ -1,12 +1,16 @@
 from datetime import datetime
-from typing import Optional, Dict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, insert, update
 from sqlalchemy.orm import Session
-from models.models import Match, Player, MatchPlayer, WeaponStat
+from core.database import insert_for
+from models.models import Match, Player, MatchPlayer, MatchPlayerRating, WeaponStat
+from models.round import Round
 from models.round_event import RoundEvent
-from services.impact_rating_v3 import (
-    compute_impact_rating_v3 as compute_impact_rating,
-    compute_impact_breakdown_v3,  # ← НОВОЕ: для KAST и SWING
-)
+from services.match_documents import invalidate_player_documents
+from services.rating_engines import EventStream, active_engines, compute_engines, live_breakdown
+from services.event_loader import EventRow, build_event_rows, load_round_events
+from services.damage_compaction import store_damage_rows
+from services.winprob_empirical import update_winprob_counts
 import re
 
 
@@ -25,26 +29,121 @@ def _parse_date_from_filename(filename: str) -> datetime:
     return datetime.utcnow()
 
 
-def upsert_player(db: Session, steam_id: str, nickname: str) -> Player:
-    player = db.query(Player).filter(Player.steam_id == steam_id).first()
-    if player is None:
-        player = Player(steam_id=steam_id, nickname=nickname)
-        db.add(player)
-        db.flush()
+def round_rows(events: Iterable[Any], match_id: int) -> List[Dict[str, Any]]:
+    """round_result events -> rounds rows (one per round_number, the last one wins like the dedupe)."""
+    by_round: Dict[int, Dict[str, Any]] = {}
+    for ev in events:
+        if ev.event_type != "round_result" or ev.round_number is None:
+            continue
+        by_round[ev.round_number] = dict(
+            match_id=match_id,
+            round_number=ev.round_number,
+            winner_side=ev.winner_side,
+            win_reason=ev.win_reason,
+            bomb_planted=bool(ev.bomb_planted),
+            score_t=ev.score_t,
+            score_ct=ev.score_ct,
+            alive_t=ev.alive_t,
+            alive_ct=ev.alive_ct,
+            end_tick=ev.tick,
+        )
+    return [by_round[rn] for rn in sorted(by_round)]
+
+
+def backfill_rounds(db: Session) -> int:
+    """One-off: rounds rows for matches ingested before the table existed. Commits; returns rows written."""
+    missing = (
+        db.query(Match.id)
+        .filter(~Match.id.in_(db.query(Round.match_id).distinct()))
+        .order_by(Match.id)
+        .all()
+    )
+    written = 0
+    for (match_id,) in missing:
+        events = (
+            db.query(RoundEvent)
+            .filter(RoundEvent.match_id == match_id, RoundEvent.event_type == "round_result")
+            .order_by(RoundEvent.id)
+            .all()
+        )
+        rows = round_rows(events, match_id)
+        if rows:
+            db.execute(insert(Round), rows)
+            written += len(rows)
+        db.commit()
+    print(f"rounds backfilled: {len(missing)} matches, {written} rows")
+    return written
+
+
+def upsert_players(db: Session, nicknames: Dict[str, str]) -> Dict[str, int]:
+    """
+    steam_id -> nickname in, steam_id -> players.id out.
+    One INSERT ... ON CONFLICT (steam_id) DO UPDATE nickname + IN selects before / after, whatever the player count.
+    Renamed players drop the cached match documents that show the old nickname.
+    """
+    if not nicknames:
+        return {}
+
+    previous = dict(
+        db.query(Player.steam_id, Player.nickname)
+        .filter(Player.steam_id.in_(list(nicknames)))
+        .all()
+    )
+
+    dialect_insert = insert_for(db)
+    if dialect_insert is not None:
+        stmt = dialect_insert(Player).values(
+            [{"steam_id": sid, "nickname": nick} for sid, nick in nicknames.items()]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Player.steam_id],
+            set_={"nickname": stmt.excluded.nickname, "updated_at": func.now()},
+        )
+        db.execute(stmt)
     else:
-        player.nickname = nickname
-    return player
+        # no native upsert: one IN select, update known, insert missing
+        known = {
+            pl.steam_id: pl
+            for pl in db.query(Player).filter(Player.steam_id.in_(list(nicknames))).all()
+        }
+        for sid, nick in nicknames.items():
+            if sid in known:
+                known[sid].nickname = nick
+            else:
+                db.add(Player(steam_id=sid, nickname=nick))
+        db.flush()
+
+    ids = dict(
+        db.query(Player.steam_id, Player.id)
+        .filter(Player.steam_id.in_(list(nicknames)))
+        .all()
+    )
+
+    renamed = [ids[sid] for sid, nick in nicknames.items() if sid in previous and previous[sid] != nick]
+    invalidate_player_documents(db, renamed)
+    return ids
 
 
 # ============================================================
 # MAIN SAVE FUNCTION
 # ============================================================
 
-def save_match(
+def find_match_by_hash(db: Session, demo_hash: Optional[str]) -> Optional[Match]:
+    if not demo_hash:
+        return None
+    return db.query(Match).filter(Match.demo_hash == demo_hash).first()
+
+
+def persist_match_rows(
     db: Session,
     raw: dict,
     demo_filename: Optional[str] = None,
-) -> Match:
+    demo_hash: Optional[str] = None,
+) -> Tuple[Match, List[EventRow]]:
+    """
+    Match + players + match_players + weapon_stats + round_events + rounds, flushed but not committed.
+    Returns the match and the written event rows (kept in memory for rating).
+    """
 
     played_at = _parse_date_from_filename(demo_filename or "")
 
@@ -52,6 +151,7 @@ def save_match(
 
     match = Match(
         demo_filename=demo_filename,
+        demo_hash=demo_hash,
         played_at=played_at,
         map=raw.get("map", "unknown"),
         total_rounds=raw.get("total_rounds", 0),
@@ -65,23 +165,27 @@ def save_match(
     db.add(match)
     db.flush()
 
-    steam_to_player: Dict[str, Player] = {}
-    steam_to_mp: Dict[str, MatchPlayer] = {}
-
     # ============================================================
     # Players + MatchPlayer + WeaponStats
     # ============================================================
 
-    for p_data in raw.get("players", []):
+    players_raw = [
+        p_data for p_data in raw.get("players", [])
+        if p_data.get("steamid", "") and p_data.get("steamid") != "undefined"
+    ]
 
-        steam_id = p_data.get("steamid", "")
-        nickname = p_data.get("nickname", "unknown")
+    steam_to_pid = upsert_players(
+        db,
+        {p_data["steamid"]: p_data.get("nickname", "unknown") for p_data in players_raw},
+    )
 
-        if not steam_id or steam_id == "undefined":
-            continue
+    mp_rows: List[Dict[str, Any]] = []
+    ws_rows: List[Dict[str, Any]] = []
+
+    for p_data in players_raw:
 
-        player = upsert_player(db, steam_id, nickname)
-        steam_to_player[steam_id] = player
+        steam_id = p_data["steamid"]
+        player_id = steam_to_pid[steam_id]
 
         kills = int(p_data.get("K", 0) or 0)
         deaths = int(p_data.get("D", 0) or 0)
@@ -94,9 +198,9 @@ def save_match(
         adr = float(p_data.get("ADR", 0.0) or 0.0)
         damage = round(adr * rounds)
 
-        mp = MatchPlayer(
+        mp_rows.append(dict(
             match_id=match.id,
-            player_id=player.id,
+            player_id=player_id,
             team=p_data.get("team", ""),
             kills=kills,
             deaths=deaths,
@@ -109,99 +213,132 @@ def save_match(
             fd=int(p_data.get("FD", 0) or 0),
             rating=float(p_data.get("rating", 0.0) or 0.0),
             rounds_played=rounds,  # ← НОВОЕ
-        )
-
-        db.add(mp)
-        steam_to_mp[steam_id] = mp
+        ))
 
         # Weapon stats
         for w in p_data.get("weapon_kills", []):
-            ws = WeaponStat(
+            ws_rows.append(dict(
                 match_id=match.id,
-                player_id=player.id,
+                player_id=player_id,
                 weapon=w.get("weapon", "unknown"),
                 kills=int(w.get("kills", 0) or 0),
                 headshots=int(w.get("headshots", 0) or 0),
                 damage=int(w.get("damage", 0) or 0),
-            )
-            db.add(ws)
+            ))
 
-    db.flush()
+    # ORM bulk INSERT: one executemany per table instead of a statement per row
+    if mp_rows:
+        db.execute(insert(MatchPlayer), mp_rows)
+    if ws_rows:
+        db.execute(insert(WeaponStat), ws_rows)
 
     # ============================================================
-    # ROUND EVENTS
+    # ROUND EVENTS (deduped once, written once)
     # ============================================================
 
-    bulk_events = []
+    events = build_event_rows(
+        raw.get("round_events", []) or [],
+        match_id=match.id,
+        map_name=raw.get("map"),
+        steam_to_pid=steam_to_pid,
+    )
+    # per-hit damage -> one row per (round, attacker, victim); same ADR / ratings
+    events = store_damage_rows(match.id, events)
+    load_round_events(db, events)
 
-    for e in raw.get("round_events", []):
+    rounds = round_rows(events, match.id)
+    if rounds:
+        db.execute(insert(Round), rounds)
 
-        attacker_steam = e.get("attacker_id")
-        victim_steam = e.get("victim_id")
+    # empirical win probability counts: this match's kills only, no rescan
+    update_winprob_counts(db, events)
 
-        attacker = steam_to_player.get(str(attacker_steam)) if attacker_steam else None
-        victim = steam_to_player.get(str(victim_steam)) if victim_steam else None
+    rr_count = sum(1 for ev in events if ev.event_type == "round_result")
+    print(f"Saved {len(events)} round events (round_result = {rr_count}, match.total_rounds = {match.total_rounds})")
 
-        bulk_events.append(
-            RoundEvent(
-                match_id=match.id,
-                map_name=str(raw.get("map", "unknown") or "unknown"),
-                round_number=int(e.get("round_number") or 0),
-                tick=int(e.get("tick")) if e.get("tick") is not None else None,
-                event_type=str(e.get("event_type") or ""),
-                attacker_id=attacker.id if attacker else None,
-                victim_id=victim.id if victim else None,
-                weapon=str(e.get("weapon") or ""),
-                is_headshot=bool(e.get("headshot") or False),
-                damage=float(e.get("damage") or 0.0),
-                alive_t=int(e.get("alive_t") or 0),
-                alive_ct=int(e.get("alive_ct") or 0),
-                eco_t=bool(e.get("eco_t") or False),
-                eco_ct=bool(e.get("eco_ct") or False),
-                score_t=int(e.get("score_t") or 0),
-                score_ct=int(e.get("score_ct") or 0),
-
-                attacker_side=e.get("attacker_side"),
-                victim_side=e.get("victim_side"),
-                time_in_round=e.get("time_in_round"),
-            )
-        )
+    return match, events
 
-    if bulk_events:
-        db.bulk_save_objects(bulk_events)
-        db.flush()
 
-    # ============================================================
-    # IMPACT RATING + KAST + SWING (✅ ИСПРАВЛЕНО!)
-    # ============================================================
-
-    if bulk_events:
-
-        player_id_to_steamid = {
-            pl.id: sid for sid, pl in steam_to_player.items()
-        }
+# ============================================================
+# IMPACT RATING + KAST + SWING
+# ============================================================
 
-        # ✅ FIX: Используем breakdown вместо просто рейтинга
-        breakdown = compute_impact_breakdown_v3(
-            db_events=bulk_events,
-            total_rounds=match.total_rounds,
-            player_id_to_steamid=player_id_to_steamid,
+def rating_columns(stats: Dict[str, float]) -> Dict[str, float]:
+    """Engine breakdown of one player -> match_players / match_player_ratings columns."""
+    return {
+        "impact_rating": float(stats.get("rating", 1.0)),
+        "kast_pct": float(stats.get("kast_pct", 0.0)),
+        "swing": float(stats.get("swing_per_round", 0.0)),
+    }
+
+
+def write_engine_ratings(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """
+    rows: {match_player_id, engine_version, impact_rating, kast_pct, swing}.
+    One upsert on (match_player_id, engine_version); re-running a version overwrites it.
+    """
+    if not rows:
+        return
+
+    dialect_insert = insert_for(db)
+    if dialect_insert is not None:
+        stmt = dialect_insert(MatchPlayerRating).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[MatchPlayerRating.match_player_id, MatchPlayerRating.engine_version],
+            set_={
+                "impact_rating": stmt.excluded.impact_rating,
+                "kast_pct": stmt.excluded.kast_pct,
+                "swing": stmt.excluded.swing,
+            },
         )
+        db.execute(stmt)
+        return
+
+    # no native upsert: drop the versions being rewritten, insert fresh
+    for version in {r["engine_version"] for r in rows}:
+        db.query(MatchPlayerRating).filter(
+            MatchPlayerRating.engine_version == version,
+            MatchPlayerRating.match_player_id.in_([r["match_player_id"] for r in rows if r["engine_version"] == version]),
+        ).delete(synchronize_session=False)
+    db.execute(insert(MatchPlayerRating), rows)
+
+
+def rate_match(db: Session, match: Match, events: List[EventRow]) -> Dict[int, Dict[str, float]]:
+    """
+    Live rating + every active engine version (settings.RATING_ENGINES) over one decoded event stream;
+    one executemany UPDATE of match_players by id, one upsert into match_player_ratings.
+    Returns the live breakdown keyed by player_id.
+    """
+    if not events:
+        return {}
+
+    stream = EventStream.from_rows(events)
+    breakdown = live_breakdown(stream, match.total_rounds)
+    versions = compute_engines(stream, match.total_rounds, active_engines())
+
+    mp_ids = dict(
+        db.query(MatchPlayer.player_id, MatchPlayer.id)
+        .filter(MatchPlayer.match_id == match.id)
+        .all()
+    )
 
-        for player_id, stats in breakdown.items():
-
-            steam_id = player_id_to_steamid.get(player_id)
-            if not steam_id:
-                continue
+    updates = []
+    for player_id, stats in breakdown.items():
+        mp_id = mp_ids.get(player_id)
+        if mp_id is None:
+            continue
+        updates.append({"id": mp_id, **rating_columns(stats)})
 
-            mp = steam_to_mp.get(str(steam_id))
-            if mp:
-                # ✅ НОВОЕ: Сохраняем все HLTV 3.0 метрики
-                mp.impact_rating = float(stats.get("rating", 1.0))
-                mp.kast_pct      = float(stats.get("kast_pct", 0.0))
-                mp.swing         = float(stats.get("swing_per_round", 0.0))
+    if updates:
+        # ORM bulk UPDATE by primary key -> a single executemany
+        db.execute(update(MatchPlayer), updates)
 
-    db.commit()
-    db.refresh(match)
+    write_engine_ratings(db, [
+        {"match_player_id": mp_ids[player_id], "engine_version": version, **rating_columns(stats)}
+        for version, version_breakdown in versions.items()
+        for player_id, stats in version_breakdown.items()
+        if player_id in mp_ids
+    ])
 
-    return match
+    print("HLTV 3.0 rating calculated" + (f" (+ {', '.join(versions)})" if versions else ""))
+    return breakdown
@@ -0,0 +1,126 @@
+# services/parse_cache.py
+"""
+Content-addressed cache of CS2DemoAnalyzer.parse() results.
+
+Key = SHA-256 of the .dem bytes. Entries are pickles on disk
+(<dir>/<hash[:2]>/<hash>.pkl); a hit bumps the file mtime, and when the
+directory grows past max_bytes the least recently used entries are evicted.
+"""
+from __future__ import annotations
+
+import os
+import pickle
+import tempfile
+from typing import Any, Dict, Optional
+
+from core.config import settings
+
+
+# bump when the analyzer output shape changes, old entries then read as misses
+CACHE_FORMAT_VERSION = 2
+
+
+class ParseCache:
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max(0, int(max_bytes))
+
+    def _path(self, demo_hash: str) -> str:
+        return os.path.join(self.root, demo_hash[:2], f"{demo_hash}.pkl")
+
+    def get(self, demo_hash: str) -> Optional[Dict[str, Any]]:
+        if not demo_hash or self.max_bytes <= 0:
+            return None
+
+        path = self._path(demo_hash)
+        try:
+            with open(path, "rb") as f:
+                payload = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # corrupt / truncated entry -> drop it, treat as miss
+            self._remove(path)
+            return None
+
+        if not isinstance(payload, dict) or payload.get("version") != CACHE_FORMAT_VERSION:
+            self._remove(path)
+            return None
+
+        try:
+            os.utime(path, None)  # LRU touch
+        except OSError:
+            pass
+
+        return payload.get("result")
+
+    def put(self, demo_hash: str, result: Dict[str, Any]) -> None:
+        if not demo_hash or self.max_bytes <= 0:
+            return
+
+        path = self._path(demo_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(
+                    {"version": CACHE_FORMAT_VERSION, "result": result},
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(tmp_path, path)
+        except Exception:
+            self._remove(tmp_path)
+            raise
+
+        self.evict()
+
+    def evict(self) -> int:
+        """Drop least recently used entries until the cache fits max_bytes. Returns entries removed."""
+        entries = []
+        total = 0
+
+        if not os.path.isdir(self.root):
+            return 0
+
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith(".pkl"):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+
+        removed = 0
+        if total <= self.max_bytes:
+            return removed
+
+        entries.sort()
+        for _mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                removed += 1
+            total -= size
+
+        return removed
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.unlink(path)
+            return True
+        except OSError:
+            return False
+
+
+parse_cache = ParseCache(
+    settings.PARSE_CACHE_DIR,
+    settings.PARSE_CACHE_MAX_MB * 1024 * 1024,
+)
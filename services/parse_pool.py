@@ -0,0 +1,65 @@
+# services/parse_pool.py
+"""
+Bounded process pool for CPU-bound demo parsing.
+
+Parsing a demo holds the GIL for its whole duration, so running it on the
+event loop (or in the default thread pool) stalls every other request on
+the worker. parse_demo_async() ships the parse to a separate process and
+awaits the result.
+"""
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from core.config import settings
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def parse_demo(demo_path: str) -> Dict[str, Any]:
+    """Runs inside a pool worker; imports the parser lazily so the API process stays light."""
+    from parser.demo_analyzer import CS2DemoAnalyzer
+
+    return CS2DemoAnalyzer(demo_path).parse()
+
+
+def get_parse_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=max(1, settings.PARSE_WORKERS),
+            # spawn: don't fork a process that already runs uvicorn/DB threads
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_parse_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def parse_demo_async(demo_path: str) -> Dict[str, Any]:
+    """
+    Parse a demo without blocking the event loop.
+    PARSE_WORKERS=0 parses in the thread pool instead (dev / tiny containers).
+    """
+    if settings.PARSE_WORKERS <= 0:
+        return await run_in_threadpool(parse_demo, demo_path)
+
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_parse_executor(), parse_demo, demo_path)
+    except BrokenProcessPool:
+        # a worker died (OOM on a huge demo, segfault in the native parser): start fresh next time
+        shutdown_parse_executor()
+        raise
@@ -0,0 +1,126 @@
+# services/player_aggregates.py
+"""
+Player career aggregates (player_aggregates): running sums per player so the
+player list, all-time leaderboard and profile overview read one row per
+player instead of grouping all of match_players.
+
+Every change goes through apply_match_aggregates(match_ids, sign), which sums
+just those matches' match_players rows per player and adds (+1) or subtracts
+(-1) them, in the caller's transaction:
+
+    ingest          +1 after rating
+    match delete    -1 before the rows go
+    live re-rate    -1 before the UPDATE, +1 after
+
+rebuild_player_aggregates() recomputes the table from scratch (make aggregates-rebuild).
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from core.database import insert_for
+from models.models import Match, MatchPlayer
+from models.player_aggregate import PlayerAggregate
+
+
+SUM_COLUMNS = (
+    "matches", "wins", "kills", "deaths", "assists", "fk", "fd",
+    "sum_adr", "sum_hs_pct", "sum_rating", "sum_kast", "sum_swing",
+)
+
+# same win rule as the profile overview: team1 = CT side, team2 = T side
+_WIN = (
+    ((MatchPlayer.team == "CT") & (Match.team1_score > Match.team2_score))
+    | (MatchPlayer.team.in_(("T", "TERRORIST")) & (Match.team2_score > Match.team1_score))
+)
+
+
+def _totals(db: Session, match_ids: Optional[List[int]]) -> List[Dict[str, Any]]:
+    """Per-player sums over the given matches (None = every match), ordered by player_id."""
+    q = (
+        select(
+            MatchPlayer.player_id,
+            func.count(MatchPlayer.id).label("matches"),
+            func.sum(case((_WIN, 1), else_=0)).label("wins"),
+            func.sum(MatchPlayer.kills).label("kills"),
+            func.sum(MatchPlayer.deaths).label("deaths"),
+            func.sum(MatchPlayer.assists).label("assists"),
+            func.sum(MatchPlayer.fk).label("fk"),
+            func.sum(MatchPlayer.fd).label("fd"),
+            func.sum(MatchPlayer.adr).label("sum_adr"),
+            func.sum(MatchPlayer.hs_pct).label("sum_hs_pct"),
+            func.sum(MatchPlayer.impact_rating).label("sum_rating"),
+            func.sum(MatchPlayer.kast_pct).label("sum_kast"),
+            func.sum(MatchPlayer.swing).label("sum_swing"),
+        )
+        .join(Match, Match.id == MatchPlayer.match_id)
+        .group_by(MatchPlayer.player_id)
+        # sorted: concurrent ingests lock the aggregate rows in the same order (no upsert deadlocks on PG)
+        .order_by(MatchPlayer.player_id)
+    )
+    if match_ids is not None:
+        q = q.where(MatchPlayer.match_id.in_(match_ids))
+    return [dict(r._mapping) for r in db.execute(q)]
+
+
+def apply_match_aggregates(db: Session, match_ids: Iterable[int], sign: int = 1) -> int:
+    """
+    Add (sign=1) or subtract (sign=-1) these matches' match_players rows.
+    Flush only, the caller commits. Returns the number of players touched.
+    """
+    match_ids = list(match_ids)
+    if not match_ids:
+        return 0
+
+    rows = [
+        {"player_id": r["player_id"], **{c: sign * (r[c] or 0) for c in SUM_COLUMNS}}
+        for r in _totals(db, match_ids)
+    ]
+    if not rows:
+        return 0
+
+    dialect_insert = insert_for(db)
+    if dialect_insert is not None:
+        stmt = dialect_insert(PlayerAggregate).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PlayerAggregate.player_id],
+            set_={c: getattr(PlayerAggregate, c) + getattr(stmt.excluded, c) for c in SUM_COLUMNS}
+            | {"updated_at": func.now()},
+        )
+        db.execute(stmt)
+    else:
+        existing = {
+            a.player_id: a
+            for a in db.query(PlayerAggregate).filter(PlayerAggregate.player_id.in_([r["player_id"] for r in rows]))
+        }
+        for r in rows:
+            agg = existing.get(r["player_id"])
+            if agg is None:
+                db.add(PlayerAggregate(**r))
+            else:
+                for c in SUM_COLUMNS:
+                    setattr(agg, c, getattr(agg, c) + r[c])
+        db.flush()
+
+    if sign < 0:
+        # last match of a player gone -> no row, like the GROUP BY it replaces
+        db.execute(
+            delete(PlayerAggregate)
+            .where(PlayerAggregate.player_id.in_([r["player_id"] for r in rows]), PlayerAggregate.matches <= 0)
+            .execution_options(synchronize_session=False)
+        )
+    return len(rows)
+
+
+def rebuild_player_aggregates(db: Session) -> int:
+    """One-off / repair: recompute every row from match_players. Commits; returns players written."""
+    db.execute(delete(PlayerAggregate))
+    rows = _totals(db, None)
+    if rows:
+        db.execute(insert(PlayerAggregate), [{"player_id": r["player_id"], **{c: r[c] or 0 for c in SUM_COLUMNS}} for r in rows])
+    db.commit()
+    print(f"player aggregates rebuilt: {len(rows)} players")
+    return len(rows)
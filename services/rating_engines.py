@@ -0,0 +1,146 @@
+# services/rating_engines.py
+"""
+Versioned rating engines.
+
+The live rating (match_players.impact_rating / kast_pct / swing) is what the
+leaderboard orders by. Trial formulas are registered here by name and stored
+per (match_player, engine_version) in match_player_ratings, so they can be
+compared (engine= on leaderboard / profile) without touching the live numbers.
+
+    RATING_ENGINES = "v3_empirical"     # computed at ingest + by rerate jobs
+
+All engines of one match read the same EventStream: the events are decoded
+to columns once and every engine reuses them.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from core.config import settings
+from services.event_loader import EventRow
+from services.impact_rating_columnar import compute_impact_breakdown_columnar, event_columns, row_columns
+from services.impact_rating_v3 import compute_impact_breakdown_v3
+
+
+# engine= value that means match_players itself
+LIVE_ENGINE = "live"
+
+Breakdown = Dict[int, Dict[str, float]]
+
+
+class EventStream:
+    """One match's events; columns are decoded on first use and shared by every engine."""
+
+    def __init__(self, events: Sequence[Any]):
+        self._events: Optional[Sequence[Any]] = events
+        self._rows: Optional[Sequence[tuple]] = None
+        self._columns: Optional[Dict[str, np.ndarray]] = None
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[tuple]) -> "EventStream":
+        """Tuples in EVENT_COLUMNS order (fetched rows, EventRow): columns straight from the tuples."""
+        stream = cls(None)
+        stream._rows = rows
+        return stream
+
+    @property
+    def events(self) -> Sequence[Any]:
+        """Objects for the python backend (built from the rows only if an engine asks)."""
+        if self._events is None:
+            self._events = [EventRow._make(r) for r in self._rows]
+        return self._events
+
+    def __len__(self) -> int:
+        return len(self._rows if self._events is None else self._events)
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        if self._columns is None:
+            self._columns = row_columns(self._rows) if self._rows is not None else event_columns(self._events)
+        return self._columns
+
+
+def _breakdown(stream: EventStream, total_rounds: int, winprob_model: Optional[str]) -> Breakdown:
+    """Impact rating v3 formula on the configured backend (numpy / python give the same numbers)."""
+    if not len(stream):
+        return {}
+    if settings.RATING_BACKEND == "numpy":
+        return compute_impact_breakdown_columnar(
+            columns=stream.columns, total_rounds=total_rounds, winprob_model=winprob_model
+        )
+    return compute_impact_breakdown_v3(
+        events=stream.events, total_rounds=total_rounds, winprob_model=winprob_model
+    )
+
+
+def live_breakdown(stream: EventStream, total_rounds: int) -> Breakdown:
+    """The rating written to match_players (model: settings.RATING_WINPROB_MODEL)."""
+    return _breakdown(stream, total_rounds, None)
+
+
+# =========================================================
+# Registry
+# =========================================================
+
+class RatingEngine(NamedTuple):
+    name: str
+    description: str
+    compute: Callable[[EventStream, int], Breakdown]
+
+
+_ENGINES: Dict[str, RatingEngine] = {}
+
+
+def register_engine(name: str, description: str):
+    """Decorator: compute(stream, total_rounds) -> {player_id: breakdown} becomes engine version `name`."""
+    def deco(fn):
+        if name == LIVE_ENGINE:
+            raise ValueError(f"'{LIVE_ENGINE}' is reserved for match_players")
+        _ENGINES[name] = RatingEngine(name, description, fn)
+        return fn
+    return deco
+
+
+def available_engines() -> List[str]:
+    return sorted(_ENGINES)
+
+
+def get_engine(name: str) -> RatingEngine:
+    engine = _ENGINES.get(name)
+    if engine is None:
+        raise ValueError(f"Unknown rating engine '{name}' (available: {', '.join(available_engines())})")
+    return engine
+
+
+def active_engines() -> List[str]:
+    """settings.RATING_ENGINES (comma separated), validated."""
+    names = [n.strip() for n in (settings.RATING_ENGINES or "").split(",") if n.strip()]
+    for name in names:
+        get_engine(name)
+    return names
+
+
+def compute_engines(stream: EventStream, total_rounds: int, names: Sequence[str]) -> Dict[str, Breakdown]:
+    """Every requested engine version over the same decoded stream."""
+    return {name: get_engine(name).compute(stream, total_rounds) for name in names}
+
+
+# =========================================================
+# Engines
+# =========================================================
+
+@register_engine("v3", "Impact rating v3, CT alive-count win probability table (the live default)")
+def _v3(stream: EventStream, total_rounds: int) -> Breakdown:
+    return _breakdown(stream, total_rounds, "ct_table")
+
+
+@register_engine("v3_swing", "Impact rating v3, kill swing from the swing_engine win probability model")
+def _v3_swing(stream: EventStream, total_rounds: int) -> Breakdown:
+    return _breakdown(stream, total_rounds, "swing_logit")
+
+
+@register_engine("v3_empirical", "Impact rating v3, kill swing from the empirical win probability counts")
+def _v3_empirical(stream: EventStream, total_rounds: int) -> Breakdown:
+    return _breakdown(stream, total_rounds, "empirical")
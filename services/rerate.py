@@ -0,0 +1,486 @@
+# services/rerate.py
+"""
+Whole-archive re-rating.
+
+Changing the rating formula or a win probability model leaves the stored
+match_players.impact_rating / kast_pct / swing stale, and a new trial engine
+version (services.rating_engines) has no ratings for old matches yet.
+A RerateJob walks the archive in match id order, RERATE_CHUNK_MATCHES at a time:
+
+    one query      -> the chunk's round_events (plain tuples, no ORM objects)
+    process pool   -> every engine of the job per match, one decoded event stream each
+    one UPDATE     -> match_players of the whole chunk ("live"), one upsert for the versions
+
+The chunk's writes and the job checkpoint (last_match_id) commit together,
+so a crash costs at most one chunk and the job resumes where it stopped.
+The next chunk is read while the pool is still rating the current one.
+
+Only one runner walks a job: queued -> running is an atomic claim, and a job
+goes back to queued only from failed, interrupted (paused by a shutdown) or
+running with a heartbeat (updated_at, moved by every chunk) older than
+RERATE_STALE_SEC, i.e. its runner crashed. A live running job is never requeued.
+
+    POST /api/rerate[?engine=..]    start (or get the active job); default: live + RATING_ENGINES
+    GET  /api/rerate/{id}           progress + throughput
+    POST /api/rerate/{id}/resume    continue a failed / interrupted job (409 while running)
+    make rerate [JOB=id] [ENGINES=live,v3_x]  same job from the shell
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from itertools import groupby
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.database import SessionLocal
+from models.models import Match, MatchPlayer
+from models.rerate_job import RerateJob
+from models.round_event import RoundEvent
+from services.event_loader import EVENT_COLUMNS
+from services.leaderboard_snapshots import mark_snapshots_stale
+from services.match_documents import invalidate_match_documents
+from services.match_service import rating_columns, write_engine_ratings
+from services.player_aggregates import apply_match_aggregates
+from services.rating_engines import LIVE_ENGINE, EventStream, active_engines, compute_engines, get_engine, live_breakdown
+
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+INTERRUPTED = "interrupted"
+
+ACTIVE_STATUSES = (QUEUED, RUNNING, INTERRUPTED)
+
+
+class RerateJobConflict(Exception):
+    """A job for other engines is already active; only one re-rate runs at a time."""
+
+    def __init__(self, active: RerateJob, requested: List[str]):
+        super().__init__(
+            f"rerate job {active.id} is already {active.status} for engines {active.engines or [LIVE_ENGINE]}, "
+            f"requested {requested}"
+        )
+        self.active = active
+        self.requested = requested
+
+# (match_id, total_rounds, event tuples in EVENT_COLUMNS order)
+RateTask = Tuple[int, int, List[tuple]]
+
+
+# ============================================================
+# Worker (runs in the pool)
+# ============================================================
+
+def rate_match_events(task: RateTask, engines: List[str]) -> Tuple[int, Dict[str, Dict[int, Dict[str, float]]], int]:
+    """(match_id, total_rounds, events) -> (match_id, {engine: {player_id: rating columns}}, event count)."""
+    match_id, total_rounds, rows = task
+    if not rows:
+        return match_id, {}, 0
+
+    stream = EventStream.from_rows(rows)
+    out = compute_engines(stream, total_rounds, [e for e in engines if e != LIVE_ENGINE])
+    if LIVE_ENGINE in engines:
+        out[LIVE_ENGINE] = live_breakdown(stream, total_rounds)
+    return match_id, {
+        engine: {pid: rating_columns(stats) for pid, stats in breakdown.items()}
+        for engine, breakdown in out.items()
+    }, len(rows)
+
+
+# ============================================================
+# Job rows
+# ============================================================
+
+def resolve_engines(engines: Optional[List[str]]) -> List[str]:
+    """Requested engines, validated; default = live + settings.RATING_ENGINES."""
+    engines = list(dict.fromkeys(engines or [LIVE_ENGINE, *active_engines()]))
+    for name in engines:
+        if name != LIVE_ENGINE:
+            get_engine(name)
+    return engines
+
+
+def create_rerate_job(db: Session, engines: Optional[List[str]] = None) -> RerateJob:
+    """
+    New job over every match that exists now. If a job is already active it is returned when it
+    re-rates the same engines, otherwise RerateJobConflict is raised.
+    """
+    engines = resolve_engines(engines)
+    active = (
+        db.query(RerateJob)
+        .filter(RerateJob.status.in_(ACTIVE_STATUSES))
+        .order_by(RerateJob.id.asc())
+        .first()
+    )
+    if active is not None:
+        if set(active.engines or [LIVE_ENGINE]) != set(engines):
+            raise RerateJobConflict(active, engines)
+        requeue_rerate_job(db, active)  # paused / crashed -> queued; a live run is left alone
+        return active
+
+    max_id, total = db.query(func.max(Match.id), func.count(Match.id)).one()
+    job = RerateJob(
+        status=QUEUED,
+        engines=engines,
+        max_match_id=max_id or 0,
+        total_matches=total or 0,
+        progress={},
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def _requeueable(now: datetime):
+    """failed, interrupted, or running without a heartbeat for RERATE_STALE_SEC (its runner is gone)."""
+    stale_before = now - timedelta(seconds=settings.RERATE_STALE_SEC)
+    return or_(
+        RerateJob.status.in_((FAILED, INTERRUPTED)),
+        and_(RerateJob.status == RUNNING, RerateJob.updated_at < stale_before),
+    )
+
+
+def requeue_rerate_job(db: Session, job: RerateJob) -> bool:
+    """
+    failed / interrupted / crashed -> queued in one conditional UPDATE; the checkpoint is kept.
+    False (nothing changed) when the job is queued, done, or running with a live heartbeat.
+    """
+    now = datetime.utcnow()
+    n = (
+        db.query(RerateJob)
+        .filter(RerateJob.id == job.id, _requeueable(now))
+        .update({"status": QUEUED, "error": None, "finished_at": None, "updated_at": now}, synchronize_session=False)
+    )
+    db.commit()
+    db.refresh(job)
+    return n == 1
+
+
+def rerate_job_to_dict(job: RerateJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "engines": job.engines or [LIVE_ENGINE],
+        "last_match_id": job.last_match_id,
+        "max_match_id": job.max_match_id,
+        "total_matches": job.total_matches,
+        "matches_done": job.matches_done,
+        "players_updated": job.players_updated,
+        "events_done": job.events_done,
+        "percent": round(100.0 * job.matches_done / job.total_matches, 1) if job.total_matches else 100.0,
+        "elapsed_sec": round(job.elapsed_sec or 0.0, 1),
+        "progress": job.progress or {},
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def _claim(db: Session, job_id: int) -> bool:
+    """QUEUED -> RUNNING, atomically, so two runners never walk the same job."""
+    n = (
+        db.query(RerateJob)
+        .filter(RerateJob.id == job_id, RerateJob.status == QUEUED)
+        .update({"status": RUNNING, "updated_at": datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    return n == 1
+
+
+# ============================================================
+# Chunks
+# ============================================================
+
+def _next_matches(db: Session, after_id: int, max_id: int, limit: int) -> List[Tuple[int, int]]:
+    return [
+        (m.id, m.total_rounds)
+        for m in db.query(Match.id, Match.total_rounds)
+        .filter(Match.id > after_id, Match.id <= max_id)
+        .order_by(Match.id.asc())
+        .limit(limit)
+    ]
+
+
+def _load_tasks(db: Session, matches: List[Tuple[int, int]]) -> List[RateTask]:
+    """One query for the chunk's events, in insert order (the order the engine saw at ingest)."""
+    table = RoundEvent.__table__
+    rows = db.execute(
+        select(*[table.c[name] for name in EVENT_COLUMNS])
+        .where(table.c.match_id.in_([mid for mid, _ in matches]))
+        .order_by(table.c.match_id, table.c.id)
+    )
+    by_match = {mid: [tuple(r) for r in group] for mid, group in groupby(rows, key=lambda r: r[0])}
+    return [(mid, total_rounds, by_match.get(mid, [])) for mid, total_rounds in matches]
+
+
+def _write_back(db: Session, results: Iterable[Tuple[int, Dict[str, Dict[int, Dict[str, float]]], int]]) -> Tuple[int, int]:
+    """
+    One executemany UPDATE of match_players ("live") + one match_player_ratings upsert
+    for the chunk. Returns (player ratings written, events rated).
+    """
+    results = list(results)
+    match_ids = [mid for mid, _, _ in results]
+    mp_ids = {
+        (r.match_id, r.player_id): r.id
+        for r in db.query(MatchPlayer.id, MatchPlayer.match_id, MatchPlayer.player_id)
+        .filter(MatchPlayer.match_id.in_(match_ids))
+    }
+
+    live, versions = [], []
+    for match_id, by_engine, _n in results:
+        for engine, columns in by_engine.items():
+            for player_id, values in columns.items():
+                mp_id = mp_ids.get((match_id, player_id))
+                if mp_id is None:
+                    continue
+                if engine == LIVE_ENGINE:
+                    live.append({"id": mp_id, **values})
+                else:
+                    versions.append({"match_player_id": mp_id, "engine_version": engine, **values})
+
+    if live:
+        # career sums: take the old ratings of these matches out, put the new ones in
+        apply_match_aggregates(db, match_ids, -1)
+        db.execute(update(MatchPlayer), live)
+        apply_match_aggregates(db, match_ids, +1)
+        mark_snapshots_stale(db)  # every window / map may reorder
+        invalidate_match_documents(db, match_ids)  # cached match pages show the live rating
+    write_engine_ratings(db, versions)
+    return len(live) + len(versions), sum(n for _, _, n in results)
+
+
+def _make_executor(workers: int) -> Optional[ProcessPoolExecutor]:
+    if workers <= 0:
+        return None
+    # spawn: the API process runs uvicorn/DB threads, don't fork it
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+# ============================================================
+# Run
+# ============================================================
+
+def run_rerate_job(
+    job_id: int,
+    workers: Optional[int] = None,
+    chunk_matches: Optional[int] = None,
+    stop: Optional[threading.Event] = None,
+) -> None:
+    """
+    Walk the job from its checkpoint to max_match_id. A set `stop` event ends the
+    walk after the current chunk; the job is left "interrupted" and resumed on the next start.
+    """
+    workers = settings.RERATE_WORKERS if workers is None else workers
+    chunk_matches = max(1, chunk_matches or settings.RERATE_CHUNK_MATCHES)
+
+    db = SessionLocal()
+    executor = None
+    try:
+        if not _claim(db, job_id):
+            print(f"RERATE JOB {job_id}: not queued (running elsewhere or finished)")
+            return
+        job = db.get(RerateJob, job_id)
+        job.started_at = job.started_at or datetime.utcnow()
+        job.updated_at = datetime.utcnow()  # heartbeat (utcnow like the claim, not the server clock)
+        engines = job.engines or [LIVE_ENGINE]
+        rate = partial(rate_match_events, engines=engines)
+        job.progress = {
+            "engine": settings.RATING_BACKEND,
+            "winprob_model": settings.RATING_WINPROB_MODEL,
+            "workers": workers,
+            "chunk_matches": chunk_matches,
+        }
+        db.commit()
+        print(
+            f"=== RERATE JOB {job_id} STARTED at match {job.last_match_id} "
+            f"({job.matches_done}/{job.total_matches}), engines: {', '.join(engines)} ==="
+        )
+
+        executor = _make_executor(workers)
+
+        cursor = job.last_match_id
+        pending = None  # (match ids, lazy results) of the chunk the pool is working on
+        t0 = time.perf_counter()
+
+        while True:
+            stopping = stop is not None and stop.is_set()
+            matches = [] if stopping else _next_matches(db, cursor, job.max_match_id, chunk_matches)
+            tasks = _load_tasks(db, matches) if matches else []
+
+            if pending is not None:
+                ids, results = pending
+                players, events = _write_back(db, results)
+
+                now = time.perf_counter()
+                job.elapsed_sec = (job.elapsed_sec or 0.0) + (now - t0)
+                t0 = now
+                job.last_match_id = ids[-1]
+                job.updated_at = datetime.utcnow()  # heartbeat
+                job.matches_done += len(ids)
+                job.players_updated += players
+                job.events_done += events
+                job.progress = dict(
+                    job.progress or {},
+                    matches_per_sec=round(job.matches_done / job.elapsed_sec, 2) if job.elapsed_sec else None,
+                    events_per_sec=round(job.events_done / job.elapsed_sec) if job.elapsed_sec else None,
+                )
+                db.commit()  # chunk writes + checkpoint in one transaction
+                print(
+                    f"RERATE JOB {job_id}: {job.matches_done}/{job.total_matches} matches "
+                    f"(up to id {job.last_match_id}), {job.progress['matches_per_sec']} matches/s, "
+                    f"{job.progress['events_per_sec']} events/s"
+                )
+                pending = None
+
+            if not tasks:
+                break
+
+            if executor is not None:
+                # map() submits the whole chunk now; the next chunk is read while the pool works
+                results = executor.map(rate, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+            else:
+                results = [rate(t) for t in tasks]
+            pending = ([mid for mid, _, _ in tasks], results)
+            cursor = tasks[-1][0]
+
+        if stop is not None and stop.is_set():
+            job.status = INTERRUPTED
+            db.commit()
+            print(f"RERATE JOB {job_id}: paused at match {job.last_match_id}")
+            return
+
+        job.status = DONE
+        job.finished_at = datetime.utcnow()
+        db.commit()
+        print(f"=== RERATE JOB {job_id} DONE: {job.matches_done} matches, {job.players_updated} players ===")
+
+    except Exception as e:
+        db.rollback()  # drop the half-written chunk, the checkpoint still points before it
+        job = db.get(RerateJob, job_id)
+        if job is not None:
+            job.status = FAILED
+            job.error = str(e)[:1024]
+            job.finished_at = datetime.utcnow()
+            db.commit()
+        print(f"RERATE JOB {job_id} FAILED:", str(e))
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        db.close()
+
+
+# ============================================================
+# Runner (API process)
+# ============================================================
+
+class RerateRunner:
+    """Runs rerate jobs on background threads (the heavy work is in the process pool)."""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._threads: Dict[int, threading.Thread] = {}
+
+    def submit(self, job_id: int) -> None:
+        thread = self._threads.get(job_id)
+        if thread is not None and thread.is_alive():
+            return
+        thread = threading.Thread(target=self._run, args=(job_id,), name=f"rerate-{job_id}", daemon=True)
+        self._threads[job_id] = thread
+        thread.start()
+
+    def _run(self, job_id: int) -> None:
+        try:
+            run_rerate_job(job_id, stop=self._stop)
+        except Exception as e:
+            print(f"RERATE JOB {job_id} CRASHED:", str(e))
+
+    def resume_pending(self) -> int:
+        """
+        Jobs paused by a shutdown (or whose runner crashed, see RERATE_STALE_SEC) go back to
+        queued in one UPDATE, then every queued job is submitted. Safe with several app
+        processes: a job another process is running is not touched, and _claim lets only
+        one of them run a queued job.
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            db.query(RerateJob).filter(RerateJob.status != FAILED, _requeueable(now)).update(
+                {"status": QUEUED, "updated_at": now}, synchronize_session=False
+            )
+            db.commit()
+            job_ids = [
+                job_id for (job_id,) in
+                db.query(RerateJob.id).filter(RerateJob.status == QUEUED).order_by(RerateJob.id.asc())
+            ]
+        finally:
+            db.close()
+
+        for job_id in job_ids:
+            self.submit(job_id)
+        return len(job_ids)
+
+    def shutdown(self) -> None:
+        # threads stop after their current chunk; the checkpoint is already committed
+        self._stop.set()
+
+
+rerate_runner = RerateRunner()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Re-rate every stored match with the current rating engine")
+    ap.add_argument("--engines", default=None, help="comma separated: live and/or engine versions (default live + RATING_ENGINES)")
+    ap.add_argument("--job", type=int, default=None, help="resume this job id instead of starting a new one")
+    ap.add_argument("--workers", type=int, default=None, help=f"pool size (default RERATE_WORKERS={settings.RERATE_WORKERS})")
+    ap.add_argument("--chunk", type=int, default=None, help=f"matches per chunk (default {settings.RERATE_CHUNK_MATCHES})")
+    args = ap.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.job is not None:
+            job = db.get(RerateJob, args.job)
+            if job is None:
+                print(f"rerate job {args.job} not found")
+                return 1
+            if not requeue_rerate_job(db, job) and job.status != QUEUED:
+                print(f"rerate job {job.id} is {job.status}; only failed / interrupted jobs (or running ones "
+                      f"without a heartbeat for {settings.RERATE_STALE_SEC}s) can be resumed")
+                return 1
+        else:
+            engines = [e.strip() for e in args.engines.split(",") if e.strip()] if args.engines else None
+            try:
+                job = create_rerate_job(db, engines)
+            except RerateJobConflict as e:
+                print(f"{e}; wait for it or --job {e.active.id} to take it over after a crash")
+                return 1
+            if job.status == RUNNING:
+                print(f"rerate job {job.id} is already running; --job {job.id} takes it over after a crash "
+                      f"(no heartbeat for {settings.RERATE_STALE_SEC}s)")
+                return 1
+        job_id = job.id
+    finally:
+        db.close()
+
+    run_rerate_job(job_id, workers=args.workers, chunk_matches=args.chunk)
+
+    db = SessionLocal()
+    try:
+        return 0 if db.get(RerateJob, job_id).status == DONE else 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
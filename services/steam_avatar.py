@@ -109,13 +109,16 @@ def update_player_avatar(db, player_id: int, steam_id: str) -> bool:
         True если успешно обновлено
     """
     from models.models import Player
+    from services.match_documents import invalidate_player_documents
     
     avatar_url = get_steam_avatar(steam_id)
     
     if avatar_url:
         player = db.query(Player).filter(Player.id == player_id).first()
         if player:
-            player.avatar_url = avatar_url
+            if player.avatar_url != avatar_url:
+                player.avatar_url = avatar_url
+                invalidate_player_documents(db, [player.id])
             db.commit()
             return True
     
@@ -1,13 +1,17 @@
 # services/swing_engine.py
 from __future__ import annotations
 
+from collections import namedtuple
 from typing import Any, Dict, List, Optional, Tuple
 import math
 
+import numpy as np
 from sqlalchemy.orm import Session
 
+from core.config import settings
 from models.round_event import RoundEvent
 from models.models import MatchPlayer, Player
+from services.win_probability import WinProbBatch, get_model
 
 
 # =========================================================
@@ -142,6 +146,30 @@ def win_probability_t(
     return max(0.02, min(0.98, p))
 
 
+# =========================================================
+# Vectorized win probability (same model over arrays)
+# =========================================================
+
+def _win_probability_t_array(alive_t, alive_ct, score_diff, bomb_planted, phase) -> np.ndarray:
+    """win_probability_t over arrays; phase is already the 0..1 round progress."""
+    alive_diff = np.maximum(0, alive_t) - np.maximum(0, alive_ct)
+    k_alive = 0.85 + 1.25 * phase
+    bomb_shift = np.where(bomb_planted, 0.95 + 0.45 * phase, 0.0)
+    logit = -0.08 + bomb_shift + (k_alive * alive_diff) + (0.06 * score_diff)
+    return np.clip(1.0 / (1.0 + np.exp(-logit)), 0.02, 0.98)
+
+
+def _phase_array(time_in_round, tick) -> np.ndarray:
+    """Vectorized _round_phase; NaN marks a missing time_in_round / tick."""
+    t_ir = np.asarray(time_in_round, dtype=np.float64)
+    tk = np.asarray(tick, dtype=np.float64)
+    return np.where(
+        ~np.isnan(t_ir),
+        np.clip(t_ir / 115.0, 0.0, 1.0),
+        np.where(np.isnan(tk), 0.5, np.clip(tk / 115000.0, 0.0, 1.0)),
+    )
+
+
 # =========================================================
 # Side inference
 # =========================================================
@@ -237,6 +265,15 @@ def _load_player_side_map(db: Session, match_id: int) -> Dict[int, str]:
 # Full state-machine swing computation (debug endpoint)
 # =========================================================
 
+# state of one kill; win probabilities are evaluated for all kills after the pass
+_KillState = namedtuple("_KillState", (
+    "ev", "round_number", "tick", "attacker_id", "victim_id",
+    "attacker_side", "victim_side", "side_source", "unknown_side",
+    "before_t", "before_ct", "after_t", "after_ct", "score_t", "score_ct",
+    "bomb_before", "bomb_after", "time_in_round", "leverage", "eco_mult",
+))
+
+
 def compute_kill_swings(
     db: Session,
     match_id: int,
@@ -276,6 +313,7 @@ def compute_kill_swings(
     last_time_in_round: Optional[float] = None
 
     kills_used = 0
+    kill_states: List[_KillState] = []
 
     for ev in db_events:
         rn = _safe_int(getattr(ev, "round_number", None), None)
@@ -344,88 +382,102 @@ def compute_kill_swings(
             elif victim_side == "CT":
                 after_ct = max(0, after_ct - 1)
 
-            # win prob (T)
-            p_before_t = win_probability_t(
-                before_t, before_ct,
-                score_t=score_t, score_ct=score_ct,
-                bomb_planted=bomb_before,
-                time_in_round=last_time_in_round,
-                tick=tick,
-            )
-            p_after_t = win_probability_t(
-                after_t, after_ct,
-                score_t=score_t, score_ct=score_ct,
-                bomb_planted=bomb_after,
-                time_in_round=last_time_in_round,
-                tick=tick,
-            )
-
-            delta_t = p_after_t - p_before_t
-
-            # swing for attacker: positive when it helps attacker
-            swing_for_attacker = 0.0
-            if attacker_side == "T":
-                swing_for_attacker = delta_t
-            elif attacker_side == "CT":
-                swing_for_attacker = -delta_t
-
-            # leverage + eco weight (debug: show raw + weighted)
-            swing_weighted = float(swing_for_attacker) * float(lev) * float(eco_mult)
-
-            if attacker_id is not None and not unknown_side:
-                swing_totals[int(attacker_id)] = swing_totals.get(int(attacker_id), 0.0) + float(swing_weighted)
-
             # update internal alive state
             alive_t, alive_ct = after_t, after_ct
 
-            # output row (limit)
-            if kills_used < limit:
-                kills_out.append({
-                    "match_id": match_id,
-                    "round_number": rn,
-                    "tick": tick,
-
-                    "attacker_id": attacker_id,
-                    "attacker_name": f"player_{attacker_id}" if attacker_id else None,
-                    "attacker_side": attacker_side,
-
-                    "victim_id": victim_id,
-                    "victim_name": f"player_{victim_id}" if victim_id else None,
-                    "victim_side": victim_side,
-
-                    "alive_t_before": before_t,
-                    "alive_ct_before": before_ct,
-                    "alive_t_after": after_t,
-                    "alive_ct_after": after_ct,
-
-                    "score_t": score_t,
-                    "score_ct": score_ct,
-
-                    "bomb_before": bomb_before,
-                    "bomb_after": bomb_after,
-                    "time_in_round": last_time_in_round,
-
-                    "p_before_t": p_before_t,
-                    "p_after_t": p_after_t,
-
-                    "swing_for_attacker": float(swing_for_attacker),
-                    "swing_weighted": float(swing_weighted),
-
-                    "leverage": float(lev),
-                    "eco_mult": float(eco_mult),
-
-                    "side_source": source,
-                    "unknown_side": bool(unknown_side),
-
-                    "is_t_eco": bool(getattr(ev, "eco_t", False)),
-                    "is_ct_eco": bool(getattr(ev, "eco_ct", False)),
-                })
+            kill_states.append(_KillState(
+                ev, rn, tick, attacker_id, victim_id, attacker_side, victim_side, source, unknown_side,
+                before_t, before_ct, after_t, after_ct, score_t, score_ct,
+                bomb_before, bomb_after, last_time_in_round, lev, eco_mult,
+            ))
 
             kills_used += 1
 
         # (Optional) you can extend: swing for bomb actions later in this same state machine
         # For now endpoint is "kill swings", as you already do.
 
+    # --- win probabilities: before + after states of every kill in one model batch ---
+    p_before_all, p_after_all = [], []
+    if kill_states:
+        ks = _KillState(*zip(*kill_states))
+        n = len(kill_states)
+        p_all = get_model(settings.SWING_WINPROB_MODEL).predict(WinProbBatch.from_lists(
+            alive_t=ks.before_t + ks.after_t,
+            alive_ct=ks.before_ct + ks.after_ct,
+            score_t=ks.score_t * 2,
+            score_ct=ks.score_ct * 2,
+            bomb_planted=ks.bomb_before + ks.bomb_after,
+            time_in_round=ks.time_in_round * 2,
+            tick=ks.tick * 2,
+        )).tolist()
+        p_before_all, p_after_all = p_all[:n], p_all[n:]
+
+    for i, (
+        ev, rn, tick, attacker_id, victim_id, attacker_side, victim_side, source, unknown_side,
+        before_t, before_ct, after_t, after_ct, score_t, score_ct,
+        bomb_before, bomb_after, last_time_in_round, lev, eco_mult,
+    ) in enumerate(kill_states):
+        p_before_t = p_before_all[i]
+        p_after_t = p_after_all[i]
+
+        delta_t = p_after_t - p_before_t
+
+        # swing for attacker: positive when it helps attacker
+        swing_for_attacker = 0.0
+        if attacker_side == "T":
+            swing_for_attacker = delta_t
+        elif attacker_side == "CT":
+            swing_for_attacker = -delta_t
+
+        # leverage + eco weight (debug: show raw + weighted)
+        swing_weighted = float(swing_for_attacker) * float(lev) * float(eco_mult)
+
+        if attacker_id is not None and not unknown_side:
+            swing_totals[int(attacker_id)] = swing_totals.get(int(attacker_id), 0.0) + float(swing_weighted)
+
+        # output row (limit)
+        if i < limit:
+            kills_out.append({
+                "match_id": match_id,
+                "round_number": rn,
+                "tick": tick,
+
+                "attacker_id": attacker_id,
+                "attacker_name": f"player_{attacker_id}" if attacker_id else None,
+                "attacker_side": attacker_side,
+
+                "victim_id": victim_id,
+                "victim_name": f"player_{victim_id}" if victim_id else None,
+                "victim_side": victim_side,
+
+                "alive_t_before": before_t,
+                "alive_ct_before": before_ct,
+                "alive_t_after": after_t,
+                "alive_ct_after": after_ct,
+
+                "score_t": score_t,
+                "score_ct": score_ct,
+
+                "bomb_before": bomb_before,
+                "bomb_after": bomb_after,
+                "time_in_round": last_time_in_round,
+
+                "p_before_t": p_before_t,
+                "p_after_t": p_after_t,
+
+                "swing_for_attacker": float(swing_for_attacker),
+                "swing_weighted": float(swing_weighted),
+
+                "leverage": float(lev),
+                "eco_mult": float(eco_mult),
+
+                "side_source": source,
+                "unknown_side": bool(unknown_side),
+
+                "is_t_eco": bool(getattr(ev, "eco_t", False)),
+                "is_ct_eco": bool(getattr(ev, "eco_ct", False)),
+            })
+
     # --- top_swing ---
     top = sorted(swing_totals.items(), key=lambda x: x[1], reverse=True)
     top_swing = [{"player_id": pid, "player_name": f"player_{pid}", "swing_total": val} for pid, val in top]
@@ -435,6 +487,7 @@ def compute_kill_swings(
         "limit": limit,
         "unknown_side_kills": unknown_side_kills,
         "side_source_counts": side_source_counts,
+        "winprob_model": settings.SWING_WINPROB_MODEL,
         "note": "Swing B-mode: full per-round state machine (alive + bomb + time). after_alive computed manually, not from next event. Sides inferred from event fields if exist, otherwise match_players.",
     }
 
@@ -0,0 +1,244 @@
+# services/win_probability.py
+"""
+One interface over the win-probability models we have.
+
+    model = get_model("swing_logit")
+    p_t = model.predict(WinProbBatch.from_lists(alive_t=[...], alive_ct=[...], ...))
+
+Every model takes a whole batch of round states (numpy arrays) and returns
+P(T wins) per state, so callers evaluate a match in one call. Models are
+registered by name; the rating engine and the swing debug endpoint pick theirs
+through settings (RATING_WINPROB_MODEL / SWING_WINPROB_MODEL).
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.config import settings
+
+
+# eco flags are tri-state: unknown / no / yes (winprob_model.win_prob_t treats None differently from False)
+ECO_UNKNOWN, ECO_NO, ECO_YES = -1, 0, 1
+
+
+@dataclass(frozen=True)
+class WinProbBatch:
+    """Round states, one row per index. Missing time_in_round / tick are NaN."""
+    alive_t: np.ndarray
+    alive_ct: np.ndarray
+    score_t: np.ndarray
+    score_ct: np.ndarray
+    bomb_planted: np.ndarray
+    time_in_round: np.ndarray
+    tick: np.ndarray
+    eco_t: np.ndarray
+    eco_ct: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.alive_t)
+
+    @classmethod
+    def from_lists(
+        cls,
+        *,
+        alive_t: Sequence[int],
+        alive_ct: Sequence[int],
+        score_t: Optional[Sequence[int]] = None,
+        score_ct: Optional[Sequence[int]] = None,
+        bomb_planted: Optional[Sequence[bool]] = None,
+        time_in_round: Optional[Sequence[Optional[float]]] = None,
+        tick: Optional[Sequence[Optional[int]]] = None,
+        eco_t: Optional[Sequence[Optional[bool]]] = None,
+        eco_ct: Optional[Sequence[Optional[bool]]] = None,
+    ) -> "WinProbBatch":
+        n = len(alive_t)
+
+        def ints(x, default=0):
+            return np.full(n, default, dtype=np.int64) if x is None else np.asarray(x, dtype=np.int64)
+
+        def floats(x):
+            if x is None:
+                return np.full(n, np.nan)
+            return np.asarray([np.nan if v is None else v for v in x], dtype=np.float64)
+
+        def eco(x):
+            if x is None:
+                return np.full(n, ECO_UNKNOWN, dtype=np.int8)
+            return np.asarray([ECO_UNKNOWN if v is None else int(bool(v)) for v in x], dtype=np.int8)
+
+        return cls(
+            alive_t=ints(alive_t),
+            alive_ct=ints(alive_ct),
+            score_t=ints(score_t),
+            score_ct=ints(score_ct),
+            bomb_planted=np.zeros(n, dtype=bool) if bomb_planted is None else np.asarray(bomb_planted, dtype=bool),
+            time_in_round=floats(time_in_round),
+            tick=floats(tick),
+            eco_t=eco(eco_t),
+            eco_ct=eco(eco_ct),
+        )
+
+
+class WinProbabilityModel:
+    """Base class: implement predict(); predict_sides() only if P(CT) is not exactly 1 - P(T)."""
+
+    name = "base"
+
+    def predict(self, batch: WinProbBatch) -> np.ndarray:
+        """P(T wins) per state."""
+        raise NotImplementedError
+
+    def predict_sides(self, batch: WinProbBatch) -> Tuple[np.ndarray, np.ndarray]:
+        """(P(T wins), P(CT wins)) per state."""
+        p_t = self.predict(batch)
+        return p_t, 1.0 - p_t
+
+
+# =========================================================
+# Registry
+# =========================================================
+
+_REGISTRY: Dict[str, Callable[[], WinProbabilityModel]] = {}
+_INSTANCES: Dict[str, WinProbabilityModel] = {}
+
+
+def register_model(name: str):
+    """Class decorator: make a model available as get_model(name)."""
+    def deco(cls):
+        cls.name = name
+        _REGISTRY[name] = cls
+        return cls
+    return deco
+
+
+def available_models() -> List[str]:
+    return sorted(_REGISTRY)
+
+
+def get_model(name: str) -> WinProbabilityModel:
+    model = _INSTANCES.get(name)
+    if model is None:
+        factory = _REGISTRY.get(name)
+        if factory is None:
+            raise ValueError(f"Unknown win probability model '{name}' (available: {', '.join(available_models())})")
+        model = _INSTANCES[name] = factory()
+    return model
+
+
+# =========================================================
+# Models
+# =========================================================
+
+@register_model("ct_table")
+class CtTableModel(WinProbabilityModel):
+    """impact_rating_v3._CT_WIN_PROB_TABLE: alive counts only, clamped to 1..5."""
+
+    def __init__(self):
+        from services.impact_rating_v3 import _CT_WIN_PROB_TABLE
+
+        self._ct = np.full((6, 6), 0.5, dtype=np.float64)
+        for (ct, t), p in _CT_WIN_PROB_TABLE.items():
+            self._ct[ct, t] = p
+
+    def _ct_prob(self, batch: WinProbBatch) -> np.ndarray:
+        return self._ct[np.clip(batch.alive_ct, 1, 5), np.clip(batch.alive_t, 1, 5)]
+
+    def predict(self, batch: WinProbBatch) -> np.ndarray:
+        return 1.0 - self._ct_prob(batch)
+
+    def predict_sides(self, batch: WinProbBatch) -> Tuple[np.ndarray, np.ndarray]:
+        # the table stores P(CT); return it as is so CT-side swings match the scalar lookup exactly
+        ct_p = self._ct_prob(batch)
+        return 1.0 - ct_p, ct_p
+
+
+@register_model("swing_logit")
+class SwingLogitModel(WinProbabilityModel):
+    """swing_engine.win_probability_t (alive, score, bomb, round phase), evaluated analytically."""
+
+    def predict(self, batch: WinProbBatch) -> np.ndarray:
+        from services.swing_engine import _phase_array, _win_probability_t_array
+
+        return _win_probability_t_array(
+            batch.alive_t, batch.alive_ct, batch.score_t - batch.score_ct,
+            batch.bomb_planted, _phase_array(batch.time_in_round, batch.tick),
+        )
+
+
+@register_model("winprob_v1")
+class WinProbV1Model(WinProbabilityModel):
+    """winprob_model.win_prob_t (alive, score progress, eco)."""
+
+    def predict(self, batch: WinProbBatch) -> np.ndarray:
+        alive_diff = batch.alive_t - batch.alive_ct
+        total_score = np.maximum(0, batch.score_t + batch.score_ct)
+        progress = np.clip(total_score / 24.0, 0.0, 1.0)
+
+        eco_adj = np.where(
+            (batch.eco_t == ECO_YES) & (batch.eco_ct == ECO_NO), -0.35,
+            np.where((batch.eco_t == ECO_NO) & (batch.eco_ct == ECO_YES), 0.35, 0.0),
+        )
+
+        x = 0.85 * alive_diff + 0.25 * (progress * (batch.score_t - batch.score_ct)) + eco_adj
+
+        # numerically stable sigmoid
+        z = np.exp(-np.abs(x))
+        p = np.where(x >= 0, 1.0 / (1.0 + z), z / (1.0 + z))
+        return np.clip(p, 0.02, 0.98)
+
+
+@register_model("empirical")
+class EmpiricalModel(WinProbabilityModel):
+    """
+    Observed T win rate per (alive_t, alive_ct, bomb, time bucket) from winprob_cells
+    (services.winprob_empirical), Laplace-smoothed: (t_wins + a) / (t_wins + ct_wins + 2a).
+    States without time_in_round use the counts summed over all time buckets.
+    Counts are re-read every WINPROB_EMPIRICAL_TTL_SEC, so new ingests show up without a restart.
+    """
+
+    def __init__(self):
+        self._tables: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._loaded_at = 0.0
+
+    def _load(self) -> Tuple[np.ndarray, np.ndarray]:
+        tables = self._tables
+        if tables is not None and time.monotonic() - self._loaded_at < settings.WINPROB_EMPIRICAL_TTL_SEC:
+            return tables
+
+        from core.database import SessionLocal
+        from services.winprob_empirical import load_count_arrays
+
+        db = SessionLocal()
+        try:
+            t_wins, ct_wins = load_count_arrays(db)
+        finally:
+            db.close()
+
+        a = settings.WINPROB_LAPLACE_ALPHA
+
+        def smoothed(t, ct):
+            n = t + ct + 2 * a
+            return np.divide(t + a, n, out=np.full(t.shape, 0.5), where=n > 0)
+
+        tables = (smoothed(t_wins, ct_wins), smoothed(t_wins.sum(axis=3), ct_wins.sum(axis=3)))
+        self._tables, self._loaded_at = tables, time.monotonic()
+        return tables
+
+    def predict(self, batch: WinProbBatch) -> np.ndarray:
+        from services.winprob_empirical import ALIVE_MAX, TIME_UNKNOWN, time_bucket_array
+
+        p_cell, p_any_time = self._load()
+        at = np.clip(batch.alive_t, 0, ALIVE_MAX)
+        act = np.clip(batch.alive_ct, 0, ALIVE_MAX)
+        bomb = np.asarray(batch.bomb_planted, dtype=np.int64)
+        bucket = time_bucket_array(batch.time_in_round)
+
+        return np.where(
+            bucket == TIME_UNKNOWN,
+            p_any_time[at, act, bomb],
+            p_cell[at, act, bomb, np.maximum(bucket, 0)],
+        )
@@ -0,0 +1,247 @@
+# services/winprob_empirical.py
+"""
+Empirical win probability: count table of round state -> round winner.
+
+A state is (alive_t, alive_ct, bomb planted, time bucket) taken from every
+round_events kill row (the parser stores alive counts BEFORE the kill), and
+the outcome is that round's round_result.winner_side. Counts live in
+winprob_cells and change incrementally: each ingest adds the observations of
+its own events (one upsert), deleting a match subtracts them again
+(apply_match_winprob_counts(..., -1)); nothing is rescanned.
+
+time_in_round of a kill is seconds since freeze time ended (the analyzer's
+round_freeze_end tick). Matches parsed before that carry no time on kills and
+stay in TIME_UNKNOWN until they are parsed again.
+
+The "empirical" model in services.win_probability reads these counts with
+Laplace smoothing.
+"""
+from __future__ import annotations
+
+import math
+from collections import defaultdict
+from itertools import groupby
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from core.database import insert_for
+from models.models import Match
+from models.round_event import RoundEvent
+from models.winprob_cell import WinProbCell
+from services.impact_rating_v3 import _norm_side
+
+
+ALIVE_MAX = 5
+TIME_BUCKET_SEC = 15
+TIME_BUCKETS = 8      # 0-15s, 15-30s, ... 105s+ (last bucket is open-ended)
+TIME_UNKNOWN = -1     # stored bucket for kills without time_in_round
+
+# (alive_t, alive_ct, bomb_planted, time_bucket) -> [t_wins, ct_wins]
+CellKey = Tuple[int, int, bool, int]
+
+
+def _clamp_alive(x: Any) -> int:
+    try:
+        return max(0, min(ALIVE_MAX, int(x)))
+    except Exception:
+        return ALIVE_MAX
+
+
+def time_bucket(time_in_round: Any) -> int:
+    try:
+        t = float(time_in_round)
+    except (TypeError, ValueError):
+        return TIME_UNKNOWN
+    if math.isnan(t):
+        return TIME_UNKNOWN
+    return min(TIME_BUCKETS - 1, max(0, int(t // TIME_BUCKET_SEC)))
+
+
+def time_bucket_array(time_in_round: np.ndarray) -> np.ndarray:
+    """Vectorized time_bucket(); NaN -> TIME_UNKNOWN."""
+    t = np.asarray(time_in_round, dtype=np.float64)
+    known = ~np.isnan(t)
+    b = np.clip(np.floor_divide(np.where(known, t, 0.0), TIME_BUCKET_SEC), 0, TIME_BUCKETS - 1)
+    return np.where(known, b, TIME_UNKNOWN).astype(np.int64)
+
+
+# =========================================================
+# Counting (O(events) per match)
+# =========================================================
+
+def count_observations(events: Iterable[Any]) -> Dict[CellKey, List[int]]:
+    """
+    Kill rows of one match -> cell counts. Rounds without a decided round_result are skipped.
+    Bomb state of a kill = a bomb_planted event of the same round at or before its tick.
+    """
+    winner: Dict[int, str] = {}
+    plant_tick: Dict[int, int] = {}
+    kills: List[Any] = []
+
+    for ev in events:
+        et = str(getattr(ev, "event_type", "") or "").lower()
+        rn = getattr(ev, "round_number", None)
+        if rn is None:
+            continue
+        if et == "kill":
+            kills.append(ev)
+        elif et == "round_result":
+            side = _norm_side(getattr(ev, "winner_side", None))
+            if side is not None:
+                winner[rn] = side
+        elif et == "bomb_planted":
+            tick = getattr(ev, "tick", None) or 0
+            plant_tick[rn] = min(plant_tick.get(rn, tick), tick)
+
+    counts: Dict[CellKey, List[int]] = defaultdict(lambda: [0, 0])
+    for ev in kills:
+        rn = ev.round_number
+        side = winner.get(rn)
+        if side is None:
+            continue
+        planted = rn in plant_tick and (getattr(ev, "tick", None) or 0) >= plant_tick[rn]
+        key = (
+            _clamp_alive(getattr(ev, "alive_t", ALIVE_MAX)),
+            _clamp_alive(getattr(ev, "alive_ct", ALIVE_MAX)),
+            bool(planted),
+            time_bucket(getattr(ev, "time_in_round", None)),
+        )
+        counts[key][0 if side == "T" else 1] += 1
+
+    return dict(counts)
+
+
+def update_winprob_counts(db: Session, events: Iterable[Any], sign: int = 1) -> int:
+    """
+    Add (sign=1) or subtract (sign=-1) one match's observations in winprob_cells
+    (flush only, caller commits). Returns the number of observations.
+    """
+    counts = count_observations(events)
+    if not counts:
+        return 0
+
+    # sorted keys: concurrent ingests lock the cells in the same order (no upsert deadlocks on PG)
+    rows = [
+        {"alive_t": k[0], "alive_ct": k[1], "bomb_planted": k[2], "time_bucket": k[3],
+         "t_wins": sign * v[0], "ct_wins": sign * v[1]}
+        for k, v in sorted(counts.items())
+    ]
+
+    dialect_insert = insert_for(db)
+    if dialect_insert is not None:
+        stmt = dialect_insert(WinProbCell).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[WinProbCell.alive_t, WinProbCell.alive_ct, WinProbCell.bomb_planted, WinProbCell.time_bucket],
+            set_={
+                "t_wins": WinProbCell.t_wins + stmt.excluded.t_wins,
+                "ct_wins": WinProbCell.ct_wins + stmt.excluded.ct_wins,
+            },
+        )
+        db.execute(stmt)
+    else:
+        existing = {
+            (c.alive_t, c.alive_ct, c.bomb_planted, c.time_bucket): c
+            for c in db.query(WinProbCell).all()
+        }
+        for r in rows:
+            cell = existing.get((r["alive_t"], r["alive_ct"], r["bomb_planted"], r["time_bucket"]))
+            if cell is None:
+                db.add(WinProbCell(**r))
+            else:
+                cell.t_wins += r["t_wins"]
+                cell.ct_wins += r["ct_wins"]
+        db.flush()
+
+    if sign < 0:
+        # last observation of a cell gone -> no row, like rebuild_winprob_counts
+        db.execute(
+            delete(WinProbCell)
+            .where(WinProbCell.t_wins <= 0, WinProbCell.ct_wins <= 0)
+            .execution_options(synchronize_session=False)
+        )
+    return sum(v[0] + v[1] for v in counts.values())
+
+
+def _observation_rows(db: Session, match_ids: Optional[List[int]] = None):
+    """
+    Stored round_events rows count_observations reads, ordered by match_id.
+    round_events has no FK to matches: rows left behind by deleted matches are skipped.
+    """
+    q = (
+        db.query(
+            RoundEvent.match_id, RoundEvent.round_number, RoundEvent.tick, RoundEvent.event_type,
+            RoundEvent.alive_t, RoundEvent.alive_ct, RoundEvent.time_in_round, RoundEvent.winner_side,
+        )
+        .join(Match, Match.id == RoundEvent.match_id)
+        .filter(RoundEvent.event_type.in_(("kill", "round_result", "bomb_planted")))
+    )
+    if match_ids is not None:
+        q = q.filter(RoundEvent.match_id.in_(match_ids))
+    return q.order_by(RoundEvent.match_id)
+
+
+def apply_match_winprob_counts(db: Session, match_ids: Iterable[int], sign: int = 1) -> int:
+    """
+    Add (sign=1) or subtract (sign=-1) stored matches' observations, e.g. before
+    a match is deleted. Flush only, the caller commits. Returns observations.
+    """
+    match_ids = list(match_ids)
+    if not match_ids:
+        return 0
+    return sum(
+        update_winprob_counts(db, rows, sign)
+        for _match_id, rows in groupby(_observation_rows(db, match_ids), key=lambda r: r.match_id)
+    )
+
+
+def rebuild_winprob_counts(db: Session) -> int:
+    """
+    One-off backfill: recount winprob_cells from every stored round_events row
+    (streamed match by match). Commits. Returns the number of observations.
+    """
+    q = _observation_rows(db).yield_per(10_000)
+
+    total: Dict[CellKey, List[int]] = defaultdict(lambda: [0, 0])
+    for _match_id, rows in groupby(q, key=lambda r: r.match_id):
+        for key, (t, ct) in count_observations(rows).items():
+            total[key][0] += t
+            total[key][1] += ct
+
+    db.query(WinProbCell).delete()
+    db.add_all([
+        WinProbCell(alive_t=k[0], alive_ct=k[1], bomb_planted=k[2], time_bucket=k[3], t_wins=v[0], ct_wins=v[1])
+        for k, v in sorted(total.items())
+    ])
+    db.commit()
+
+    n = sum(v[0] + v[1] for v in total.values())
+    print(f"winprob_cells rebuilt: {len(total)} cells, {n} observations")
+    return n
+
+
+# =========================================================
+# Read side
+# =========================================================
+
+def load_count_arrays(db: Session) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (t_wins, ct_wins) as arrays indexed [alive_t, alive_ct, bomb, bucket];
+    the last bucket slot (index TIME_BUCKETS) holds kills with unknown time.
+    """
+    shape = (ALIVE_MAX + 1, ALIVE_MAX + 1, 2, TIME_BUCKETS + 1)
+    t_wins = np.zeros(shape, dtype=np.float64)
+    ct_wins = np.zeros(shape, dtype=np.float64)
+
+    for c in db.query(
+        WinProbCell.alive_t, WinProbCell.alive_ct, WinProbCell.bomb_planted,
+        WinProbCell.time_bucket, WinProbCell.t_wins, WinProbCell.ct_wins,
+    ):
+        bucket = TIME_BUCKETS if c.time_bucket == TIME_UNKNOWN else c.time_bucket
+        idx = (_clamp_alive(c.alive_t), _clamp_alive(c.alive_ct), int(bool(c.bomb_planted)), bucket)
+        t_wins[idx] += c.t_wins
+        ct_wins[idx] += c.ct_wins
+
+    return t_wins, ct_wins
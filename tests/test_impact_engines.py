@@ -0,0 +1,157 @@
+"""
+compute_impact_breakdown_columnar (numpy) must give exactly what the reference
+compute_impact_breakdown_v3 (python) gives: raw PlayerStats and the breakdown,
+field by field, from event objects and from plain tuples (EventStream.from_rows).
+"""
+import dataclasses
+
+import pytest
+
+from benchmarks.bench_round_events_load import STEAMIDS, synthetic_buffer
+from services.event_loader import EVENT_COLUMNS, EventRow, build_event_rows
+from services.impact_rating_columnar import (
+    compute_impact_breakdown_columnar,
+    compute_raw_columnar,
+    event_columns,
+    row_columns,
+)
+from services.impact_rating_v3 import (
+    _compute_raw,
+    _sorted_events,
+    _trade_window_ticks,
+    compute_impact_breakdown_v3,
+)
+from services.rating_engines import EventStream, live_breakdown
+
+
+WINDOW = _trade_window_ticks()
+
+
+def ev(event_type, round_number=1, tick=100, **fields):
+    row = dict.fromkeys(EVENT_COLUMNS)
+    row.update(
+        match_id=1, map_name="de_mirage", round_number=round_number, tick=tick, event_type=event_type,
+        weapon="ak47", is_headshot=False, damage=0.0, alive_t=5, alive_ct=5, eco_t=False, eco_ct=False,
+        score_t=0, score_ct=0, has_defuse_kit=False, bomb_planted=False,
+    )
+    row.update(fields)
+    return EventRow(**row)
+
+
+def kill(attacker, victim, tick, a_side="T", v_side="CT", round_number=1, **fields):
+    return ev("kill", round_number, tick, attacker_id=attacker, victim_id=victim,
+              attacker_side=a_side, victim_side=v_side, **fields)
+
+
+def assert_same(rows, total_rounds=None):
+    ref_raw = _compute_raw(_sorted_events(rows))
+    for cols in (event_columns(rows), row_columns([tuple(r) for r in rows])):
+        raw = compute_raw_columnar(cols)
+        assert sorted(raw) == sorted(ref_raw)
+        for pid, ps in ref_raw.items():
+            for f in dataclasses.fields(ps):
+                assert getattr(raw[pid], f.name) == getattr(ps, f.name), (pid, f.name)
+
+    ref = compute_impact_breakdown_v3(rows, total_rounds=total_rounds)
+    for got in (
+        compute_impact_breakdown_columnar(rows, total_rounds=total_rounds),
+        compute_impact_breakdown_columnar(columns=row_columns(rows), total_rounds=total_rounds),
+    ):
+        assert sorted(got) == sorted(ref)
+        for pid, fields in ref.items():
+            assert sorted(got[pid]) == sorted(fields)
+            for name, value in fields.items():
+                assert got[pid][name] == value, (pid, name)
+    return ref_raw
+
+
+def test_no_events():
+    assert compute_impact_breakdown_v3([], total_rounds=30) == {}
+    assert compute_impact_breakdown_columnar([], total_rounds=30) == {}
+    assert compute_impact_breakdown_columnar(columns=row_columns([]), total_rounds=30) == {}
+    assert live_breakdown(EventStream.from_rows([]), 30) == {}
+
+
+def test_one_round():
+    rows = [
+        ev("damage", tick=90, attacker_id=1, victim_id=6, attacker_side="T", victim_side="CT", damage=27.0),
+        kill(1, 6, 100),
+        ev("assist", tick=100, attacker_id=2, victim_id=6, attacker_side="T", victim_side="CT"),
+        kill(1, 7, 150, is_headshot=True),
+        kill(8, 1, 400, a_side="CT", v_side="T"),
+        ev("round_end", tick=900, winner_side="T", win_reason="elimination"),
+    ]
+    raw = assert_same(rows)
+    assert raw[1].multikill_2 == 1 and raw[1].entry_kills == 1
+    assert_same(rows, total_rounds=1)
+
+
+@pytest.mark.parametrize("gap, traded", [(WINDOW, True), (WINDOW + 1, False), (0, True)])
+def test_trade_at_window_boundary(gap, traded):
+    rows = [
+        kill(1, 6, 1000),                                 # T 1 kills CT 6
+        kill(7, 1, 1000 + gap, a_side="CT", v_side="T"),  # CT 7 avenges 6
+    ]
+    raw = assert_same(rows)
+    assert raw[7].trade_kills == int(traded)
+    assert raw[6].traded_deaths == int(traded)
+
+
+def test_trades_across_rounds_do_not_count():
+    rows = [kill(1, 6, 1000, round_number=1), kill(7, 1, 1010, a_side="CT", v_side="T", round_number=2)]
+    raw = assert_same(rows)
+    assert raw[7].trade_kills == 0
+
+
+def test_suicide_team_kill_and_world_kill():
+    rows = [
+        kill(1, 1, 100, a_side="T", v_side="T", weapon="hegrenade"),  # suicide
+        kill(2, 3, 200, a_side="T", v_side="T"),                      # team kill
+        kill(None, 6, 300, a_side=None, v_side="CT", weapon="world"),  # fall damage
+        kill(7, 2, 350, a_side="CT", v_side="T"),
+        kill(4, 7, 400),
+    ]
+    assert_same(rows)
+
+
+def test_missing_and_odd_sides():
+    rows = [
+        kill(1, 6, 100, a_side=None, v_side=None),
+        kill(7, 1, 120, a_side="counter-terrorist", v_side="terrorist"),
+        kill(2, 7, 130, a_side="t", v_side=""),
+        kill(8, 2, 140, a_side="CT", v_side=None),
+    ]
+    assert_same(rows)
+
+
+def test_bomb_events_credit_planter_and_defuser():
+    rows = [
+        kill(1, 6, 100),
+        ev("bomb_planted", tick=500, planter_id=2, bombsite="A", bomb_planted=True),
+        ev("bomb_defused", tick=900, defuser_id=7, has_defuse_kit=True, bomb_planted=True),
+        ev("bomb_exploded", round_number=2, tick=900, bomb_planted=True),
+    ]
+    raw = assert_same(rows)
+    assert raw[2].bomb_swing_sum > 0 and raw[7].bomb_swing_sum > 0
+
+
+def test_loose_values_from_old_rows():
+    # stored rows can hold strings / None where the parser writes ints and floats
+    rows = [
+        kill("1", "6", "100"),
+        kill(7, 1, None, a_side="CT", v_side="T"),
+        ev("damage", tick=90, attacker_id=1, victim_id=6, damage=None),
+        ev("damage", tick=95, attacker_id=1, victim_id=6, damage="13.5"),
+        ev("KILL", round_number=2, tick=50, attacker_id=2, victim_id=8, attacker_side="T", victim_side="CT",
+           time_in_round=12.5, eco_t=None),
+    ]
+    assert_same(rows)
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_synthetic_matches(seed):
+    steam_to_pid = {sid: i + 1 for i, sid in enumerate(STEAMIDS)}
+    rounds = 16 + seed * 2
+    rows = build_event_rows(synthetic_buffer(rounds, seed), 1, "de_mirage", steam_to_pid)
+    assert_same(rows)
+    assert_same(rows, total_rounds=rounds)
@@ -0,0 +1,74 @@
+"""
+The swing_logit model (vectorized swing_engine.win_probability_t) must match the
+per-event analytic function on every state, including the ones outside 0..5 alive.
+"""
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from services.swing_engine import _phase_array, _round_phase, _win_probability_t_array, win_probability_t
+from services.win_probability import WinProbBatch, get_model
+
+
+MAX_ERR = 1e-12
+
+
+def random_states(n, seed=1):
+    rnd = random.Random(seed)
+    states = []
+    for _ in range(n):
+        t_ir = rnd.choice([None, rnd.uniform(-5.0, 130.0)])
+        tick = rnd.choice([None, rnd.randint(0, 140_000)])
+        states.append((
+            rnd.randint(-1, 7), rnd.randint(-1, 7),      # alive counts, a few out of range
+            rnd.randint(0, 20), rnd.randint(0, 20),      # score_t, score_ct (diff beyond +-15 too)
+            rnd.random() < 0.3, t_ir, tick,
+        ))
+    return states
+
+
+def reference(states):
+    return np.array([
+        win_probability_t(at, act, score_t=st, score_ct=sct, bomb_planted=b, time_in_round=t, tick=tk)
+        for at, act, st, sct, b, t, tk in states
+    ])
+
+
+def test_phase_array_matches_round_phase():
+    cases = list(itertools.product([None, -3.0, 0.0, 57.5, 115.0, 200.0], [None, 0, 64_000, 115_000, 300_000]))
+    phase = _phase_array(
+        [np.nan if t is None else t for t, _ in cases],
+        [np.nan if tk is None else tk for _, tk in cases],
+    )
+    assert phase.tolist() == [_round_phase(t, tk) for t, tk in cases]
+
+
+def test_vectorized_matches_analytic():
+    states = random_states(20_000)
+    a_t, a_ct, s_t, s_ct, bomb, t_ir, tick = zip(*states)
+    phase = _phase_array(
+        [np.nan if x is None else x for x in t_ir],
+        [np.nan if x is None else x for x in tick],
+    )
+    got = _win_probability_t_array(
+        np.asarray(a_t), np.asarray(a_ct), np.asarray(s_t) - np.asarray(s_ct), np.asarray(bomb), phase,
+    )
+    assert np.abs(got - reference(states)).max() <= MAX_ERR
+
+
+def test_swing_logit_model_matches_analytic():
+    states = random_states(5_000, seed=2)
+    a_t, a_ct, s_t, s_ct, bomb, t_ir, tick = (list(c) for c in zip(*states))
+    got = get_model("swing_logit").predict(WinProbBatch.from_lists(
+        alive_t=a_t, alive_ct=a_ct, score_t=s_t, score_ct=s_ct,
+        bomb_planted=bomb, time_in_round=t_ir, tick=tick,
+    ))
+    assert np.abs(got - reference(states)).max() <= MAX_ERR
+
+
+@pytest.mark.parametrize("alive_t, alive_ct", [(5, 5), (0, 5), (5, 0), (1, 1)])
+def test_clipped_to_model_range(alive_t, alive_ct):
+    p = _win_probability_t_array(np.array([alive_t]), np.array([alive_ct]), np.array([0]), np.array([True]), np.array([1.0]))
+    assert 0.02 <= p[0] <= 0.98